@@ -0,0 +1,75 @@
+"""
+Benchmark the vectorized panel screener against the per-file screener.
+
+Writes a synthetic universe of random-walk bars to a temporary processed
+directory, screens it with `StockScreener.screen_by_indicators` and
+`StockScreener.screen_panel`, checks that both produce the same signal rows
+and reports the timings.
+
+Usage:
+    python benchmarks/bench_panel.py --symbols 1000 --bars 252 --backend parquet
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pipeline'))
+
+from stock_storage import get_bar_store  # noqa: E402
+from stock_indicators import StockIndicators, StockScreener  # noqa: E402
+
+
+def make_universe(store, symbols, bars, seed=0):
+    """Write `symbols` random-walk series of `bars` daily bars to the store."""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=bars, name='Datetime')
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (bars, symbols)), axis=0))
+    frames = (
+        (f"SYM{number:05d}", pd.DataFrame({
+            'Open': close[:, number], 'High': close[:, number] * 1.01, 'Low': close[:, number] * 0.99,
+            'Close': close[:, number], 'Volume': np.full(bars, 1e6),
+        }, index=index))
+        for number in range(symbols)
+    )
+    store.write_many(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--bars', type=int, default=252)
+    parser.add_argument('--backend', default='csv')
+    args = parser.parse_args()
+
+    indicators = [StockIndicators.calculate_macd, StockIndicators.calculate_rsi, StockIndicators.calculate_tema]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stock_dir = os.path.join(tmp, 'processed')
+        make_universe(get_bar_store(stock_dir, args.backend), args.symbols, args.bars)
+        screener = StockScreener(stock_dir, backend=args.backend, use_cache=False)
+
+        timings = {}
+        for name, method in [('per_file', screener.screen_by_indicators), ('panel', screener.screen_panel)]:
+            output_file = os.path.join(tmp, f"{name}.csv")
+            start = time.perf_counter()
+            method(indicators=indicators, output_file=output_file)
+            timings[name] = time.perf_counter() - start
+
+        per_file = pd.read_csv(os.path.join(tmp, 'per_file.csv'))
+        panel = pd.read_csv(os.path.join(tmp, 'panel.csv'))
+        matches = per_file.equals(panel)
+
+    print(f"{args.symbols} symbols x {args.bars} bars ({args.backend}):")
+    for name, seconds in timings.items():
+        print(f"  {name:<9} {seconds:8.3f}s")
+    print(f"  speedup   {timings['per_file'] / timings['panel']:8.1f}x")
+    print(f"  identical signals: {matches} ({len(per_file)} rows)")
+    return 0 if matches else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
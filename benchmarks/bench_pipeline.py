@@ -0,0 +1,332 @@
+"""
+Benchmark each pipeline stage and the full `run_pipeline.main` on synthetic universes.
+
+For every scale (symbols x bars) a reproducible universe is generated with
+`synthetic.SyntheticUniverse`; `yf.download` is served from it, so no
+network access or Telegram credentials are needed. Every stage runs on fresh
+data in a temporary directory and is timed over `--repeat` runs:
+
+    prep               StockPrep.preprocess_all on raw yfinance CSV files
+    fetch              StockFetch.download_stock_data into an empty store
+    fetch_incremental  the same fetch again (only bars newer than the manifest)
+    screen             StockScreener.screen_by_indicators over the signal lookback window
+    screen_full        the same over the full history
+    screen_panel       StockScreener.screen_panel over the full history
+    filter             StockFilter.tally_signals on the full-history signals
+    main               run_pipeline.main, files mode
+    main_memory        run_pipeline.main, memory mode
+
+Results are saved as JSON (default: benchmarks/results/pipeline_<timestamp>.json)
+and compared with a baseline (default: the most recent earlier result file);
+stages slower than the baseline by more than `--threshold` are flagged.
+
+Usage:
+    python benchmarks/bench_pipeline.py --scales 100x252 1000x252 1000x1260
+    python benchmarks/bench_pipeline.py --scales 200x500 --interval 1h --backend sqlite
+    python benchmarks/bench_pipeline.py --baseline benchmarks/results/pipeline_20260101_120000.json --fail-on-regression
+"""
+import io
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+from contextlib import redirect_stdout, redirect_stderr, nullcontext, ExitStack
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'pipeline'))
+
+import config  # noqa: E402
+from synthetic import SyntheticUniverse  # noqa: E402
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+STAGES = ['prep', 'fetch', 'fetch_incremental', 'screen', 'screen_full', 'screen_panel', 'filter', 'main', 'main_memory']
+
+
+def isolate_config(root, args):
+    """
+    Point every data path of the config at `root` and apply the benchmark settings.
+
+    Must run before the pipeline modules are imported, since several of them
+    copy config values at import time.
+    """
+    paths = {
+        'DATA_DIR': 'data',
+        'LOGS_DIR': 'logs',
+        'STOCK_PRE_DIR': 'data/raw_stock_data',
+        'STOCK_POST_DIR': 'data/processed_stock_data',
+        'SIGNALS_DIR': 'data/signals',
+        'BACKUP_FOLDER': 'data/signals_backup',
+        'INDICATOR_CACHE_DIR': 'data/indicator_cache',
+    }
+    for name, relative in paths.items():
+        setattr(config, name, os.path.join(root, relative))
+    config.SYMBOLS_FILE = os.path.join(root, 'data', 'symbols', 'symbols.csv')
+    config.FETCH_MANIFEST_FILE = os.path.join(config.STOCK_PRE_DIR, 'manifest.json')
+    config.CONSOLIDATED_OUTPUT_FILE = os.path.join(config.SIGNALS_DIR, 'consolidated_signals.csv')
+    config.SIGNAL_DB_FILE = os.path.join(config.DATA_DIR, 'signals.sqlite')
+    config.OUTBOX_DB_FILE = os.path.join(config.DATA_DIR, 'outbox.sqlite')
+    config.SHARD_DB_FILE = os.path.join(config.DATA_DIR, 'shards.sqlite')
+    config.SHARD_DIR = os.path.join(config.DATA_DIR, 'shards')
+    config.INDICATOR_STATE_FILE = os.path.join(config.DATA_DIR, 'indicator_state.json')
+    config.LOG_FILE = os.path.join(config.LOGS_DIR, 'bench_log.txt')
+
+    config.INTERVAL = args.interval
+    config.STORAGE_BACKEND = args.backend
+    config.FETCH_RATE_LIMIT = args.rate_limit  # 0 = unlimited, the stub has no quota
+    config.PIPELINE_MODE = 'files'
+
+    # Without credentials the notifier fails fast instead of reaching the network
+    for name in ('TELEGRAM_BOT_TOKEN', 'TELEGRAM_CHAT_ID'):
+        os.environ.pop(name, None)
+
+
+def reset_data(universe):
+    """Start from an empty data directory holding only the symbols file."""
+    shutil.rmtree(config.DATA_DIR, ignore_errors=True)
+    shutil.rmtree(config.LOGS_DIR, ignore_errors=True)
+    for directory in (config.STOCK_PRE_DIR, config.STOCK_POST_DIR, config.SIGNALS_DIR,
+                      config.BACKUP_FOLDER, config.LOGS_DIR, os.path.dirname(config.SYMBOLS_FILE)):
+        os.makedirs(directory, exist_ok=True)
+    universe.write_symbols_file(config.SYMBOLS_FILE)
+
+
+def git_revision():
+    """Commit the benchmark ran on, or None outside a git checkout."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def silenced():
+    """Swallow the pipeline's prints, progress bars and log messages."""
+    stack = ExitStack()
+    stack.enter_context(redirect_stdout(io.StringIO()))
+    stack.enter_context(redirect_stderr(io.StringIO()))
+    return stack
+
+
+def time_stage(setup, run, repeat, quiet=True):
+    """Run `setup` then time `run`, `repeat` times; returns the durations and the last result."""
+    durations, result = [], None
+    for _ in range(repeat):
+        setup()
+        with silenced() if quiet else nullcontext():
+            start = time.perf_counter()
+            result = run()
+            durations.append(time.perf_counter() - start)
+    return durations, result
+
+
+def bench_scale(universe, args):
+    """Time every stage on one universe; returns (rows, per-stage metrics of the files-mode main run)."""
+    # Imported here, after isolate_config (see there)
+    from stock_fetch import StockFetch
+    from stock_prep import StockPrep, StockFilter
+    from stock_indicators import StockIndicators, StockScreener
+    from stock_metrics import metrics
+    import run_pipeline
+
+    indicators = [StockIndicators.calculate_macd, StockIndicators.calculate_rsi]
+
+    def fresh():
+        reset_data(universe)
+
+    def fetched():
+        fresh()
+        with silenced():
+            StockFetch(normalize=True).download_stock_data()
+
+    def raw():
+        fresh()
+        universe.write_raw_csv(config.STOCK_PRE_DIR)
+
+    def screen(**kwargs):
+        screener = StockScreener(config.STOCK_POST_DIR, use_cache=False)
+        return screener.screen_by_indicators(indicators, None, **kwargs)
+
+    def main(mode):
+        def run():
+            run_pipeline.PIPELINE_MODE = mode
+            metrics.stages = []
+            run_pipeline.main()
+            return metrics.report()['stages']
+        return run
+
+    signals = {}
+
+    def screened():
+        if 'full' not in signals:  # Reuse the screen_full output when it ran
+            fetched()
+            signals['full'] = screen()
+
+    def tally():
+        stock_filter = StockFilter(signals['full'], lookback_days=args.lookback)
+        stock_filter.tally_signals()
+        return stock_filter.filtered_data
+
+    def screen_full():
+        signals['full'] = screen()
+        return signals['full']
+
+    plan = {
+        'prep': (raw, lambda: StockPrep().preprocess_all()),
+        'fetch': (fresh, lambda: StockFetch(normalize=True).download_stock_data()),
+        'fetch_incremental': (fetched, lambda: StockFetch(normalize=True).download_stock_data()),
+        'screen': (fetched, lambda: screen(lookback_days=args.lookback)),
+        'screen_full': (fetched, screen_full),
+        'screen_panel': (fetched, lambda: StockScreener(config.STOCK_POST_DIR, use_cache=False).screen_panel(indicators, None)),
+        'filter': (screened, tally),
+        'main': (fresh, main('files')),
+        'main_memory': (fresh, main('memory')),
+    }
+
+    rows, main_stages = [], None
+    scale = f"{len(universe.symbols)}x{universe.bars}"
+    for stage in args.stages:
+        setup, run = plan[stage]
+        durations, result = time_stage(setup, run, args.repeat, quiet=not args.verbose)
+        if stage == 'main':
+            main_stages = result
+        best = min(durations)
+        rows.append({
+            'scale': scale,
+            'symbols': len(universe.symbols),
+            'bars': universe.bars,
+            'interval': universe.interval,
+            'stage': stage,
+            'seconds': round(best, 4),
+            'median_seconds': round(statistics.median(durations), 4),
+            'runs': [round(seconds, 4) for seconds in durations],
+            'symbols_per_s': round(len(universe.symbols) / best, 1) if best > 0 else None,
+        })
+        print(f"  {scale:>12} {stage:<18} {best:9.3f}s  {rows[-1]['symbols_per_s']:>10} symbols/s")
+    return rows, main_stages
+
+
+def latest_result(exclude=None):
+    """Most recent result file in RESULTS_DIR, other than `exclude`."""
+    files = sorted(glob.glob(os.path.join(RESULTS_DIR, 'pipeline_*.json')))
+    files = [path for path in files if os.path.abspath(path) != os.path.abspath(exclude or '')]
+    return files[-1] if files else None
+
+
+def compare(rows, baseline, threshold, min_delta):
+    """
+    Flag stages slower than the baseline.
+
+    A stage regressed when it took more than `threshold` times its baseline
+    time and at least `min_delta` seconds longer (to ignore noise on tiny stages).
+    """
+    previous = {(row['scale'], row['interval'], row['stage']): row['seconds'] for row in baseline['results']}
+    regressions = []
+    for row in rows:
+        before = previous.get((row['scale'], row['interval'], row['stage']))
+        if before is None:
+            continue
+        row['baseline_seconds'] = before
+        row['ratio'] = round(row['seconds'] / before, 3) if before > 0 else None
+        if row['seconds'] > before * threshold and row['seconds'] - before >= min_delta:
+            regressions.append({key: row[key] for key in ('scale', 'interval', 'stage', 'seconds', 'baseline_seconds', 'ratio')})
+    return regressions
+
+
+def parse_scale(text):
+    symbols, _, bars = text.lower().partition('x')
+    return int(symbols), int(bars)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', nargs='+', default=['100x252', '500x252', '500x1260'],
+                        help="SYMBOLSxBARS universes to run (default: %(default)s)")
+    parser.add_argument('--interval', default='1d', help="Bar interval of the synthetic data (yfinance notation)")
+    parser.add_argument('--backend', default=config.STORAGE_BACKEND, help="Bar storage backend")
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES)
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage (the fastest is reported)")
+    parser.add_argument('--lookback', type=int, default=config.SIGNAL_LOOKBACK_DAYS, help="Signal lookback in days")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds each stubbed download request takes")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="Download requests per second (0 = unlimited)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Result file (default: benchmarks/results/pipeline_<timestamp>.json)")
+    parser.add_argument('--baseline', help="Result file to compare with (default: the latest in benchmarks/results)")
+    parser.add_argument('--threshold', type=float, default=1.2, help="Slowdown ratio flagged as a regression")
+    parser.add_argument('--min-delta', type=float, default=0.05, help="Smallest slowdown in seconds flagged")
+    parser.add_argument('--fail-on-regression', action='store_true', help="Exit with status 1 on regressions")
+    parser.add_argument('--verbose', action='store_true', help="Show the pipeline's own output")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='stocktools_bench_')
+    isolate_config(root, args)
+
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'git': git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'config': {name: getattr(config, name) for name in (
+            'STORAGE_BACKEND', 'SIGNAL_BACKEND', 'FETCH_BATCH_SIZE', 'FETCH_WORKERS',
+            'PREP_WORKERS', 'SCREEN_WORKERS', 'SCREEN_CHUNK_SIZE', 'FETCH_NORMALIZE',
+        )},
+        'args': vars(args),
+        'results': [],
+        'main_stages': {},
+    }
+
+    try:
+        print(f"Benchmarking {', '.join(args.scales)} ({args.interval}, {args.backend}, best of {args.repeat})")
+        for text in args.scales:
+            symbols, bars = parse_scale(text)
+            universe = SyntheticUniverse(symbols, bars, args.interval, seed=args.seed, latency=args.latency)
+            with universe.patch_download():
+                rows, main_stages = bench_scale(universe, args)
+            results['results'].extend(rows)
+            if main_stages is not None:
+                results['main_stages'][text] = main_stages
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    baseline_file = args.baseline or latest_result(exclude=output)
+    regressions = []
+    if baseline_file:
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+        regressions = compare(results['results'], baseline, args.threshold, args.min_delta)
+        results['baseline'] = baseline_file
+        print(f"Compared with {baseline_file}:")
+        flagged = {(row['scale'], row['stage']) for row in regressions}
+        for row in results['results']:
+            if 'ratio' in row:
+                flag = "  REGRESSION" if (row['scale'], row['stage']) in flagged else ""
+                print(f"  {row['scale']:>12} {row['stage']:<18} {row['baseline_seconds']:9.3f}s -> "
+                      f"{row['seconds']:9.3f}s  x{row['ratio']}{flag}")
+    results['regressions'] = regressions
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f"Results saved to {output}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) above x{args.threshold}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Benchmark `StockFilter.tally_signals` on a synthetic signals file.
+
+Writes a consolidated signals CSV with random symbols, dates inside the
+lookback window and signal types, then times the previous groupby/apply
+aggregation against the vectorized one on the same rows and checks that both
+give the same signal combinations.
+
+Usage:
+    python benchmarks/bench_tally.py --rows 5000000 --symbols 5000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pipeline'))
+
+from stock_prep import StockFilter  # noqa: E402
+
+SIGNAL_TYPES = ['MACD', 'RSI', 'TEMA', 'BBANDS', 'STOCH']
+
+
+def make_signals(file_path, rows, symbols, days, seed=0):
+    """Write `rows` random signals spread over the last `days` days to a CSV file."""
+    rng = np.random.default_rng(seed)
+    today = pd.Timestamp.today().normalize()
+    pd.DataFrame({
+        'Datetime': today - pd.to_timedelta(rng.integers(0, days, rows), unit='D'),
+        'symbol': np.char.add('SYM', rng.integers(0, symbols, rows).astype(str)),
+        'signal type': np.asarray(SIGNAL_TYPES)[rng.integers(0, len(SIGNAL_TYPES), rows)],
+    }).to_csv(file_path, index=False)
+
+
+def legacy_tally(data):
+    """The aggregation `tally_signals` used before vectorization."""
+    return (
+        data.groupby(['symbol', 'datetime'])['signal type']
+        .apply(lambda x: ', '.join(set(x)))
+        .reset_index(name='signals')
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--symbols', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = os.path.join(tmp, 'consolidated_signals.csv')
+        make_signals(file_path, args.rows, args.symbols, args.days)
+        print(f"{args.rows} signals, {args.symbols} symbols, {args.days} days")
+
+        start = time.perf_counter()
+        data = pd.read_csv(file_path)
+        data.columns = [col.lower() for col in data.columns]
+        data['datetime'] = pd.to_datetime(data['datetime'])
+        load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        legacy = legacy_tally(data)
+        legacy_time = time.perf_counter() - start
+
+        stock_filter = StockFilter(file_path, lookback_days=args.days)
+        start = time.perf_counter()
+        stock_filter.tally_signals()
+        total = time.perf_counter() - start
+        vectorized = stock_filter.filtered_data
+
+    print(f"  read + parse CSV  {load:8.3f}s")
+    print(f"  legacy tally      {legacy_time:8.3f}s  (aggregation only)")
+    print(f"  tally_signals     {total:8.3f}s  (read + parse + aggregation)")
+    print(f"  aggregation speedup {legacy_time / max(total - load, 1e-9):6.1f}x")
+
+    # Legacy labels are in set order; compare them as sets
+    legacy_sets = legacy['signals'].str.split(', ').map(frozenset)
+    vectorized_sets = vectorized['signals'].str.split(', ').map(frozenset)
+    same = len(legacy) == len(vectorized) and (legacy_sets.to_numpy() == vectorized_sets.to_numpy()).all()
+    print(f"  identical tallies: {same} ({len(vectorized)} symbol-dates)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Synthetic market data for the benchmarks.
+
+Generates reproducible OHLCV universes (random walks, one seed per symbol) in
+the layouts yfinance produces, writes them as raw yfinance CSV files, and
+provides a drop-in replacement for `yf.download` that serves them without a
+network connection.
+
+Example:
+    universe = SyntheticUniverse(symbols=500, bars=252, interval='1d')
+    universe.write_raw_csv(config.STOCK_PRE_DIR)     # Input of StockPrep.preprocess_file
+    with universe.patch_download():                  # StockFetch downloads from the universe
+        StockFetch().download_stock_data()
+"""
+import os
+import time
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from stock_resample import DAY, INTERVAL_MINUTES  # The pipeline directory is on sys.path
+
+# Minutes per bar of the intraday intervals yfinance accepts
+INTRADAY_MINUTES = {interval: minutes for interval, minutes in INTERVAL_MINUTES.items() if minutes < DAY}
+
+# Calendar frequency of the daily and longer intervals
+CALENDAR_FREQ = {'1d': 'B', '5d': '5B', '1wk': 'W-MON', '1mo': 'MS', '3mo': 'QS'}
+
+SESSION_OPEN = pd.Timedelta(hours=9, minutes=30)  # Regular US session, exchange time
+SESSION_MINUTES = 390
+
+
+def bar_index(bars, interval, end=None):
+    """
+    Timestamps of `bars` bars ending at `end` (default: today), as yfinance labels them.
+
+    Daily and longer bars are on a naive 'Date' index; intraday bars are
+    within the regular session on a tz-aware 'Datetime' index.
+    """
+    end = pd.Timestamp(end or pd.Timestamp.today()).normalize()
+    if interval in CALENDAR_FREQ:
+        return pd.date_range(end=end, periods=bars, freq=CALENDAR_FREQ[interval], name='Date')
+    if interval not in INTRADAY_MINUTES:
+        raise ValueError(f"Unsupported interval {interval!r}; expected one of "
+                         f"{sorted(CALENDAR_FREQ) + sorted(INTRADAY_MINUTES)}.")
+
+    minutes = INTRADAY_MINUTES[interval]
+    offsets = SESSION_OPEN + pd.to_timedelta(np.arange(0, SESSION_MINUTES, minutes), unit='min')
+    days = pd.bdate_range(end=end, periods=-(-bars // len(offsets)))
+    stamps = (days.values[:, None] + offsets.values[None, :]).ravel()[-bars:]
+    return pd.DatetimeIndex(stamps, name='Datetime').tz_localize('America/New_York')
+
+
+class SyntheticUniverse:
+    """
+    Reproducible random-walk OHLCV bars for a universe of symbols.
+
+    Attributes:
+        symbols (list): Symbol names (SYM00000, SYM00001, ...).
+        bars (int): Bars per symbol.
+        interval (str): Bar interval, in yfinance notation.
+        latency (float): Seconds each `download` call sleeps, to model the network.
+    """
+
+    def __init__(self, symbols=100, bars=252, interval='1d', seed=0, end=None, latency=0.0):
+        self.symbols = [f"SYM{number:05d}" for number in range(symbols)]
+        self.known = set(self.symbols)
+        self.bars = bars
+        self.interval = interval
+        self.seed = seed
+        self.latency = latency
+        self.index = bar_index(bars, interval, end)
+        self.requests = 0  # download calls served
+
+    def frame(self, symbol):
+        """A symbol's bars in the single-symbol `yf.download` layout (columns Price/Ticker)."""
+        rng = np.random.default_rng([self.seed, int(symbol[3:])])  # Same bars for a symbol at any universe size
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, self.bars)))
+        spread = np.abs(rng.normal(0, 0.01, self.bars))
+        data = pd.DataFrame({
+            'Close': close,
+            'High': close * (1 + spread),
+            'Low': close * (1 - spread),
+            'Open': close * (1 + rng.normal(0, 0.005, self.bars)),
+            'Volume': rng.integers(100_000, 10_000_000, self.bars),
+        }, index=self.index)
+        data.columns = pd.MultiIndex.from_arrays([data.columns, [symbol] * len(data.columns)],
+                                                 names=['Price', 'Ticker'])
+        return data
+
+    def write_raw_csv(self, directory):
+        """Write every symbol as a raw yfinance CSV file (three header rows), as `StockPrep` reads them."""
+        os.makedirs(directory, exist_ok=True)
+        for symbol in self.symbols:
+            self.frame(symbol).to_csv(os.path.join(directory, f"{symbol}.csv"))
+
+    def write_symbols_file(self, file_path):
+        """Write the symbols CSV read by StockFetch."""
+        pd.DataFrame({'Symbol': self.symbols}).to_csv(file_path, index=False)
+
+    def download(self, tickers, start=None, group_by='column', **kwargs):
+        """
+        Stand-in for `yf.download`: the universe's bars, from `start` if given.
+
+        A single ticker gets the (Price, Ticker) layout; a list gets
+        (Ticker, Price) columns with `group_by='ticker'`, like yfinance.
+        Unknown tickers are left out, as yfinance does for failed ones.
+        """
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        single = isinstance(tickers, str)
+        frames = {}
+        for symbol in [tickers] if single else tickers:
+            if symbol not in self.known:
+                continue
+            data = self.frame(symbol)
+            if start is not None:
+                since = pd.Timestamp(start)
+                if data.index.tz is not None and since.tzinfo is None:
+                    since = since.tz_localize(data.index.tz)  # A date, in exchange time as yfinance reads it
+                data = data[data.index >= since]
+            frames[symbol] = data
+
+        if single:
+            return frames.get(tickers, pd.DataFrame())
+        if not frames:
+            return pd.DataFrame()
+        # Wide layout: (Ticker, Price) columns
+        return pd.concat({symbol: data.droplevel('Ticker', axis=1) for symbol, data in frames.items()},
+                         axis=1, names=['Ticker', 'Price'])
+
+    @contextmanager
+    def patch_download(self):
+        """Serve `yf.download` (as used by stock_fetch) from this universe."""
+        import stock_fetch
+        original = stock_fetch.yf.download
+        stock_fetch.yf.download = self.download
+        try:
+            yield self
+        finally:
+            stock_fetch.yf.download = original
@@ -8,6 +8,20 @@ load_dotenv()
 # Telegram Configuration
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')  # Your Telegram Bot Token
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')      # Your Telegram Chat ID
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')      # Bot API base URL, e.g. 'http://127.0.0.1:8081/bot' for scripts/fake_bot_api.py (default: api.telegram.org)
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096  # Bot API limit per message (UTF-16 code units); longer texts are sent in chunks
+TELEGRAM_MESSAGE_INTERVAL = 1.0  # Minimum seconds between two messages to the chat (Telegram allows about one per second)
+TELEGRAM_MAX_RETRIES = 3  # Retries per message for flood control (429) and network errors
+TELEGRAM_BACKOFF_BASE = 1.0  # Initial retry delay after a network error in seconds, doubled per attempt
+NOTIFY_ASYNC = True  # Queue messages in OUTBOX_DB_FILE and deliver them from a background sender (False = send inline)
+OUTBOX_FLUSH_TIMEOUT = 30.0  # Seconds run_pipeline waits at exit for queued messages (the rest go out on the next run)
+OUTBOX_POLL_INTERVAL = 2.0  # Seconds between two outbox scans of the background sender
+OUTBOX_MAX_ATTEMPTS = 10  # Failed deliveries before a message is given up ('dead')
+OUTBOX_BACKOFF_BASE = 5.0  # Delay before the first redelivery in seconds, doubled per failed attempt
+OUTBOX_BACKOFF_MAX = 600.0  # Upper bound on the redelivery delay in seconds
+OUTBOX_LEASE = 120.0  # Seconds a sender owns the messages it claimed (then another sender may retry them)
+OUTBOX_RETENTION_DAYS = 30  # Delivered and dead messages are kept (and deduplicated against) this long
+OUTBOX_PURGE_INTERVAL = 3600.0  # Seconds between two purges of old messages by the background sender
 
 # Define the base directory of the project
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -27,15 +41,35 @@ STOCK_POST_DIR = os.path.join(DATA_DIR, 'processed_stock_data')
 # Define the directory for raw stock data (before processing)
 STOCK_PRE_DIR = os.path.join(DATA_DIR, 'raw_stock_data')
 
+# Define the manifest recording the last stored bar of each raw symbol file
+# (kept in STOCK_POST_DIR under the same name when FETCH_NORMALIZE is on)
+FETCH_MANIFEST_FILE = os.path.join(STOCK_PRE_DIR, 'manifest.json')
+
 # Define the directory for signals (consolidated output files)
 SIGNALS_DIR = os.path.join(DATA_DIR, 'signals')
 
 # Define the consolidated output file path for stock signals
 CONSOLIDATED_OUTPUT_FILE = os.path.join(SIGNALS_DIR, 'consolidated_signals.csv')
 
+# Define the indexed signal store (used instead of the CSV file when SIGNAL_BACKEND is 'sqlite')
+SIGNAL_DB_FILE = os.path.join(DATA_DIR, 'signals.sqlite')
+
+# Define the outbox holding Telegram messages until they are delivered
+OUTBOX_DB_FILE = os.path.join(DATA_DIR, 'outbox.sqlite')
+
+# Define the shard coordination database and the directory receiving each shard's signals
+SHARD_DB_FILE = os.path.join(DATA_DIR, 'shards.sqlite')
+SHARD_DIR = os.path.join(DATA_DIR, 'shards')
+
 # Define the log file path with a timestamp
 LOG_FILE = os.path.join(LOGS_DIR, f"download_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
 
+# Define the file holding per-symbol indicator state for incremental screening
+INDICATOR_STATE_FILE = os.path.join(DATA_DIR, 'indicator_state.json')
+
+# Define the directory caching indicator results between runs
+INDICATOR_CACHE_DIR = os.path.join(DATA_DIR, 'indicator_cache')
+
 # Define the path to the backup folder for signals
 BACKUP_FOLDER = os.path.join(DATA_DIR, 'signals_backup')
 
@@ -62,6 +96,69 @@ for directory in directories:
 # Stock data download configurations
 INTERVAL = '1d'          # Time interval for data ('1m','2m','5m','15m','30m','60m','90m','1h','1d','5d','1wk','1mo','3mo')
 PERIOD = '1y'           # Period for historical data ('1d','5d','1mo','3mo','6mo','1y','2y','5y','10y','ytd','max')
+FETCH_BATCH_SIZE = 50   # Symbols per multi-ticker download request (1 = one request per symbol)
+FETCH_WORKERS = 4       # Concurrent download requests in flight
+FETCH_RATE_LIMIT = 2.0  # Sustained download requests per second (token bucket refill rate)
+FETCH_RATE_BURST = 4    # Token bucket capacity (requests allowed back-to-back)
+FETCH_MAX_RETRIES = 3   # Retries per request for transient errors
+FETCH_BACKOFF_BASE = 1.0  # Initial retry delay in seconds, doubled per attempt (with jitter)
+FETCH_BACKOFF_MAX = 30.0  # Upper bound on a single retry delay in seconds
+FETCH_SOCKET_TIMEOUT = 30  # Socket timeout of the data provider's HTTP requests in seconds
+FETCH_TIMEOUT = 120     # Seconds one download attempt may run before it is abandoned (its symbols are fetched again next run)
+FETCH_INCREMENTAL = True  # Only request bars newer than the last stored bar of each symbol
+FETCH_NORMALIZE = True  # Normalize bars right after download and store them as processed data (no separate preprocess pass)
+
+# Storage backend for raw and processed bars: one file per symbol ('csv', 'parquet', 'feather'; the
+# last two require pyarrow) or one consolidated database per directory keyed by symbol and datetime ('sqlite')
+# Convert existing data with: python stock_storage.py migrate --from csv --to parquet
+STORAGE_BACKEND = 'csv'
+
+# Pipeline mode for run_pipeline.main: 'files' chains the stages through storage, 'memory' streams
+# each symbol's bars from the fetch straight into the screener and its signals into the filter,
+# 'sharded' splits the symbols into shards that worker processes fetch and screen like 'memory' does
+PIPELINE_MODE = 'files'
+PIPELINE_PERSIST = True  # In 'memory' and 'sharded' modes, still write bars and signals once each (as sinks)
+STREAM_QUEUE_SIZE = 64  # 'memory' mode: symbols buffered between two stages (bounds peak memory)
+STREAM_FETCH_PENDING = 8  # 'memory' mode: download batches in flight or waiting for the prep stage
+STREAM_SCREEN_WORKERS = 1  # 'memory' mode: threads running the screen stage
+SHARD_COUNT = 8  # 'sharded' mode: shards the symbols are split into (by a stable hash of the symbol)
+SHARD_WORKERS = os.cpu_count() or 1  # 'sharded' mode: local worker processes (more can join: python stock_shard.py worker)
+SHARD_LEASE = 300.0  # Seconds a worker owns a shard without a heartbeat; then the shard is reassigned
+SHARD_MAX_ATTEMPTS = 3  # Attempts per shard before it is given up (its symbols are kept for the next run)
+SHARD_POLL_INTERVAL = 1.0  # Seconds between two checks of the coordinator and of idle workers
+
+# Exchange session, for the daemon schedule and session-aligned resampling
+MARKET_TIMEZONE = 'America/New_York'  # Exchange time zone of the session below
+MARKET_SESSION_OPEN = '09:30'  # Regular session open, exchange time
+MARKET_SESSION_CLOSE = '16:00'  # Regular session close, exchange time (daily bars are fetched after it)
+
+# Daemon mode (python stock_daemon.py): a long-running process that wakes up after every bar close of
+# INTERVAL, fetches the new bars and screens the symbols that got some, with everything kept warm in memory
+DAEMON_CLOSE_DELAY = 60.0  # Seconds to wait after a bar closes before fetching it, for the data provider to publish it
+DAEMON_DAILY_RESET = True  # Back up the signals (like run_pipeline) when the daemon starts a new trading day
+
+# Preprocessing configurations
+PREP_WORKERS = os.cpu_count() or 1  # Processes used by StockPrep.preprocess_all (1 = sequential)
+PREP_CHUNK_SIZE = 32    # Files handed to a preprocessing worker per task
+
+# Screening configurations
+SCREEN_WORKERS = os.cpu_count() or 1  # Processes used by StockScreener.screen_by_indicators (1 = sequential)
+SCREEN_CHUNK_SIZE = 50  # Symbols per screening shard handed to a worker
+SCREEN_INCREMENTAL = False  # Update persisted indicator state with new bars only (emits signals for new bars only)
+SIGNAL_BACKEND = 'sqlite'  # Where screener signals go: 'sqlite' (SIGNAL_DB_FILE) or 'csv' (CONSOLIDATED_OUTPUT_FILE)
+SIGNAL_ROTATE_DAYS = 7  # Days between two rotations of SIGNAL_DB_FILE's live signals into a snapshot (0 = never)
+SIGNAL_SNAPSHOTS_KEEP = 30  # Rotated signal snapshots kept in SIGNAL_DB_FILE (0 = all)
+SIGNAL_LOOKBACK_DAYS = 3  # Signals older than this are dropped by StockFilter, so the pipeline screens only this window
+SCREEN_WARMUP_TOLERANCE = 1e-4  # Weight an indicator's seed may keep after its warm-up (smaller = longer warm-up, closer to a full-history run)
+INDICATOR_CACHE = True  # Reuse indicator results when neither the bars nor the indicator config changed
+INDICATOR_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Size budget of INDICATOR_CACHE_DIR (least recently used entries are evicted)
+RESAMPLE_TIMEFRAMES = ['1h', '4h', '1D', '1W']  # Steps by which higher timeframes are aggregated from the stored bars, each from the previous one
+RESAMPLE_CACHE_SIZE = 2048  # Resampled series (symbol x timeframe) kept in memory by a screener
+
+# Run instrumentation (a JSON report next to LOG_FILE, see stock_metrics)
+METRICS_SLOW_FACTOR = 3.0  # Items slower than this multiple of the stage median are reported as outliers
+METRICS_SLOW_OUTLIERS = 10  # Outliers listed per stage
+METRICS_LOG_BUFFER = 1000  # Log lines buffered before they are written to the log file
 
 # Configurations for indicators
 TEMA_CONFIG = {
@@ -78,4 +175,5 @@ RSI_CONFIG = {
     'period': 14,        # Period for RSI calculation
     'up_line': 70,        # Upper RSI line for short signal
     'low_line': 30,      # Lower RSI line for long signal
+    'res': '1D',         # Timeframe of the RSI ('4h', '1D', '1W', ...), aggregated from INTERVAL bars; None = INTERVAL
 }
\ No newline at end of file
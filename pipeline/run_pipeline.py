@@ -1,17 +1,89 @@
-import pandas as pd
 import logging
-import os
 
 # Import your custom modules
 from stock_fetch import StockFetch
 from stock_prep import StockPrep, StockFilter
 from stock_indicators import StockIndicators, StockScreener
-from stock_notifier import TelegramNotifier
-from config import CONSOLIDATED_OUTPUT_FILE, STOCK_POST_DIR
+from stock_notifier import TelegramNotifier, split_message
+from stock_outbox import NotificationOutbox, OutboxSender
+from stock_shard import ShardCoordinator
+from config import CONSOLIDATED_OUTPUT_FILE, STOCK_POST_DIR, FETCH_NORMALIZE, SCREEN_INCREMENTAL, SIGNAL_LOOKBACK_DAYS
+from config import SIGNAL_BACKEND, SIGNAL_DB_FILE, PIPELINE_MODE, PIPELINE_PERSIST
+from config import STREAM_FETCH_PENDING, STREAM_SCREEN_WORKERS, NOTIFY_ASYNC
+from stock_signals import SignalStore
+from stock_stream import StreamExecutor
+from stock_metrics import metrics
 from stock_utils import DataUtils  # Assuming DataUtils is saved in data_utils.py
 
 
 
+def stream_pipeline(indicators, signal_output=None):
+    """
+    Fetch, preprocess and screen every symbol as one stream with bounded memory.
+
+    Each stage runs on its own thread(s) and hands symbols to the next one
+    through a queue of STREAM_QUEUE_SIZE items: screening of early symbols
+    overlaps with downloading of later ones, and a slow stage throttles the
+    fetch (at most STREAM_FETCH_PENDING batches are in flight or waiting) so
+    peak memory depends on the queue depth, not on the size of the universe.
+
+    Parameters:
+        indicators (list): Indicator functions to screen with.
+        signal_output (str or SignalStore): Optional sink for the signals.
+
+    Returns:
+        pd.DataFrame: The signals within the SIGNAL_LOOKBACK_DAYS window.
+        list: Symbols that failed to download.
+    """
+    fetcher = StockFetch()
+    screener = StockScreener(stock_dir=STOCK_POST_DIR)
+    window = screener.window(indicators, SIGNAL_LOOKBACK_DAYS)
+
+    def prep_stage(item):
+        symbol, data = item
+        data = StockPrep.prepare(symbol, data)
+        return None if data is None else (symbol, data)
+
+    def screen_stage(item):
+        return screener.screen_symbol(indicators, *item, window=window)
+
+    executor = StreamExecutor([
+        ('prep', prep_stage, 1),
+        ('screen', screen_stage, STREAM_SCREEN_WORKERS),
+    ])
+    bars = fetcher.iter_stock_data(persist=PIPELINE_PERSIST, max_pending=STREAM_FETCH_PENDING)
+
+    all_signals = []
+    with metrics.stage('stream') as stage:
+        # Fetch is reported as its own stage; this one carries the per-symbol screen timings
+        marks = screener._marks()
+        for signals in executor.run(bars, source_name='fetch'):
+            all_signals.extend(signals)
+        screener._record(stage, marks)
+
+    print("Stage throughput and queue occupancy:")
+    print(executor.report())
+    if screener.cache:
+        print(screener.cache.report())
+
+    return screener.save_signals(all_signals, signal_output), fetcher.failed_symbols
+
+
+def start_outbox_sender():
+    """
+    Start delivering queued Telegram messages in the background.
+
+    Returns:
+        OutboxSender: The running sender, or None without Telegram credentials.
+    """
+    try:
+        notifier = TelegramNotifier()
+    except ValueError as e:
+        logging.warning(f"Telegram notifications disabled: {e}")
+        return None
+    return OutboxSender(NotificationOutbox(), notifier).start()
+
+
 def main():
 
     # Initialize DataUtils
@@ -20,52 +92,91 @@ def main():
     # Reset the signal generator at the start of execution
     print("Resetting signal generator...")
     data_utils.reset_signal_generator()
-    
-    # Step 1: Fetch stock data
-    print("Fetching stock data...")
-    fetcher = StockFetch()
-    failed_symbols = fetcher.download_stock_data()
-
-    # Check if any symbols failed
-    if failed_symbols:
-        print(f"Failed to download data for: {failed_symbols}")
-    else:
-        print("All stock data downloaded successfully.")
-
-    # Step 2: Preprocess stock data
-    print("Preprocessing stock data...")
-    prep = StockPrep()
-    preprocessed_files = prep.preprocess_all()
-
-    # Display preprocessed files
-    if preprocessed_files:
-        print("Preprocessed files:")
-        for file in preprocessed_files:
-            print(file)
-    else:
-        print("No files were preprocessed.")
-
-    # Step 3: Process all indicators
-    print("Processing stock indicators...")
-    screener = StockScreener(stock_dir=STOCK_POST_DIR)
 
+    # Messages are queued and sent by a background sender, which starts with any left by earlier runs
+    sender = start_outbox_sender() if NOTIFY_ASYNC else None
+    
     # Define the list of indicators
     indicators = [StockIndicators.calculate_macd, StockIndicators.calculate_rsi]
 
-    # Call screen_by_indicators with the list of indicators and the output file
-    screener.screen_by_indicators(indicators=indicators, output_file=CONSOLIDATED_OUTPUT_FILE)
-
-    # Load and display consolidated signals (optional)
-    consolidated_signals = pd.read_csv(CONSOLIDATED_OUTPUT_FILE)
-    print("Consolidated signals saved to:", CONSOLIDATED_OUTPUT_FILE)
-
-    # Display the first few rows of the saved signals
-    consolidated_signals.head()
+    # Indexed signal store, or the legacy consolidated CSV file
+    signal_output = SignalStore(SIGNAL_DB_FILE) if SIGNAL_BACKEND == 'sqlite' else CONSOLIDATED_OUTPUT_FILE
+
+    if PIPELINE_MODE == 'memory':
+        # Steps 1-3 as one stream: each symbol's bars go from the fetch to the screener
+        # without a round trip through storage, which is only written to as a sink
+        print("Fetching and screening stock data in memory...")
+        consolidated_signals, failed_symbols = stream_pipeline(
+            indicators, signal_output if PIPELINE_PERSIST else None
+        )
+        if failed_symbols:
+            print(f"Failed to download data for: {failed_symbols}")
+        signal_source = consolidated_signals  # Tally the signals in memory
+    elif PIPELINE_MODE == 'sharded':
+        # Steps 1-3 per shard of the symbols, in worker processes; the shards' signals are merged here
+        print("Fetching and screening stock data in shards...")
+        coordinator = ShardCoordinator()
+        consolidated_signals, failed_symbols = coordinator.run(
+            indicators, signal_output if PIPELINE_PERSIST else None
+        )
+        if failed_symbols:
+            print(f"Failed to download data for: {failed_symbols}")
+        if coordinator.incomplete_symbols:
+            print(f"Shards did not complete for (kept for the next run): {coordinator.incomplete_symbols}")
+        signal_source = consolidated_signals  # Tally the merged signals in memory
+    else:
+        # Step 1: Fetch stock data
+        print("Fetching stock data...")
+        fetcher = StockFetch()
+        failed_symbols = fetcher.download_stock_data()
+
+        # Check if any symbols failed
+        if failed_symbols:
+            print(f"Failed to download data for: {failed_symbols}")
+        elif not fetcher.deferred_symbols:
+            print("All stock data downloaded successfully.")
+        if fetcher.deferred_symbols:
+            print(f"Download timed out for (kept for the next run): {fetcher.deferred_symbols}")
+
+        # Step 2: Preprocess stock data (already done at fetch time when FETCH_NORMALIZE is on)
+        if FETCH_NORMALIZE:
+            print("Stock data normalized at fetch time, skipping preprocessing.")
+        else:
+            print("Preprocessing stock data...")
+            prep = StockPrep()
+            preprocessed_files = prep.preprocess_all()
+
+            # Display preprocessed files
+            if preprocessed_files:
+                print("Preprocessed files:")
+                for file in preprocessed_files:
+                    print(file)
+            else:
+                print("No files were preprocessed.")
+
+        # Step 3: Process all indicators
+        print("Processing stock indicators...")
+        screener = StockScreener(stock_dir=STOCK_POST_DIR)
+
+        if SCREEN_INCREMENTAL:
+            # Only feed bars added since the last run to the saved indicator state
+            consolidated_signals = screener.screen_incremental(indicators=indicators, output_file=signal_output)
+        else:
+            # Call screen_by_indicators with the list of indicators and the output file;
+            # only the lookback window is screened since StockFilter drops older signals
+            consolidated_signals = screener.screen_by_indicators(
+                indicators=indicators, output_file=signal_output, lookback_days=SIGNAL_LOOKBACK_DAYS
+            )
+        signal_source = signal_output  # Tally what was persisted
+
+    # The screener returns the signals it wrote, no need to read them back
+    persisted = PIPELINE_MODE == 'files' or PIPELINE_PERSIST
+    print(f"Consolidated signals ({len(consolidated_signals)}) saved to:", signal_output if persisted else "memory only")
 
     print("Filtering and aggregating stock signals...")
 
     # Initialize StockFilter and tally signals
-    stock_filter = StockFilter(CONSOLIDATED_OUTPUT_FILE)
+    stock_filter = StockFilter(signal_source, lookback_days=SIGNAL_LOOKBACK_DAYS)
     stock_filter.tally_signals()  # Tally signals within the lookback period
 
     # Check if there is filtered data
@@ -91,7 +202,7 @@ def main():
     if stock_filter.filtered_data is not None and not stock_filter.filtered_data.empty:
         try:
             # Initialize TelegramNotifier
-            notifier = TelegramNotifier()
+            notifier = sender.notifier if sender is not None else TelegramNotifier()
 
             # Format the filtered signals for the message
             formatted_message = notifier.format_signals(stock_filter.filtered_data)
@@ -100,9 +211,19 @@ def main():
             print("Message to be sent via Telegram:")
             print(formatted_message)
 
-            # Send the message via Telegram
-            notifier.send_message(formatted_message)
-            print("✅ Notification sent successfully.")
+            if sender is not None:
+                # Queue the message (split into several if it is too long); delivery doesn't block the pipeline
+                with metrics.stage('notify') as stage:
+                    queued = sender.outbox.enqueue(split_message(formatted_message), notifier.chat_id,
+                                                   alert='signals')
+                    stage.items = queued
+                sender.notify()
+                print(f"📬 {queued} message(s) queued for delivery (already queued ones are skipped).")
+            # Send the message via Telegram (split into several messages if it is too long)
+            elif notifier.send_message(formatted_message) is False:
+                print("❌ Some Telegram messages could not be delivered, see the log.")
+            else:
+                print("✅ Notification sent successfully.")
 
         except Exception as e:
             # Handle any exceptions during the notification process
@@ -113,5 +234,13 @@ def main():
         # Handle the case where there are no signals to send
         print("🚨 No stock signals to send via Telegram.")
 
+    if sender is not None:
+        # Give the sender a bounded time to deliver; undelivered messages stay in the outbox
+        pending = sender.close()
+        print(f"✅ {sender.sent} Telegram message(s) delivered, {pending} left in the outbox for the next run.")
+
+    # Wall time, throughput, I/O and memory of each stage
+    print("Run report saved to:", metrics.save())
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,109 @@
+import os
+import json
+import pickle
+import hashlib
+import threading
+
+# On-disk memoization of indicator results.
+#
+# Entries are keyed on the symbol, a hash of the bars the indicator reads
+# (datetimes and closes), the indicator name and its configuration, so a
+# re-run over unchanged data with an unchanged config skips the indicator
+# entirely. Each entry is one pickle file; the directory is kept under a size
+# budget by evicting the least recently used entries (file mtime is bumped on
+# every hit).
+
+
+def bars_fingerprint(data):
+    """
+    Content hash of the columns indicators read.
+
+    :param data: Bars with a 'Datetime' column (or datetime index) and a 'Close' column.
+    :return: Hex digest that changes whenever a datetime or close changes.
+    """
+    datetimes = data['Datetime'] if 'Datetime' in data.columns else data.index
+    digest = hashlib.sha1()
+    digest.update(datetimes.to_numpy(dtype='datetime64[ns]').tobytes())
+    digest.update(data['Close'].to_numpy(dtype='float64').tobytes())
+    return digest.hexdigest()
+
+
+class IndicatorCache:
+    """
+    Size-bounded LRU cache of indicator results stored as files in a directory.
+
+    Attributes:
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that had to be computed.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.size = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith('.pkl'))
+
+    @staticmethod
+    def key(symbol, fingerprint, indicator_name, params):
+        """Cache key for one (symbol, data, indicator, configuration) combination."""
+        payload = json.dumps([symbol, fingerprint, indicator_name, params], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        """Return the cached value for a key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path)  # Mark as recently used
+        except (OSError, pickle.PickleError, EOFError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Store a value, then evict least recently used entries if over the size budget."""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            try:
+                previous = os.path.getsize(path)  # Overwritten entry, no longer held
+            except OSError:
+                previous = 0
+            self.size += os.path.getsize(tmp_path) - previous
+            os.replace(tmp_path, path)
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Delete entries, oldest use first, until the cache is at most 90% of its budget."""
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.pkl')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        self.size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self.size <= self.max_bytes * 0.9:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self.size -= size
+            except FileNotFoundError:
+                pass  # Evicted by another process
+
+    def report(self):
+        """One-line summary of cache effectiveness."""
+        lookups = self.hits + self.misses
+        rate = 100 * self.hits / lookups if lookups else 0
+        return f"Indicator cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate)"
@@ -0,0 +1,261 @@
+import time
+import signal
+import logging
+import argparse
+import threading
+from datetime import timedelta
+import pandas as pd
+import config
+from stock_fetch import StockFetch
+from stock_prep import StockPrep, StockFilter
+from stock_resample import DAY, INTERVAL_MINUTES, bar_ends
+from stock_indicators import StockIndicators, StockScreener
+from stock_notifier import split_message
+from stock_signals import SignalStore
+from stock_state import IndicatorStateStore
+from stock_metrics import metrics
+from stock_utils import DataUtils
+from run_pipeline import start_outbox_sender
+
+# Daemon mode.
+#
+# run_pipeline.main pays its whole startup on every run: it resets the signals,
+# reads the universe and the manifest, opens the stores, reads every series back
+# to merge the new bars, and screens everything again. That is fine once a day,
+# not every five minutes. The daemon does the startup work once per trading day
+# and then sleeps until the next bar close of INTERVAL (plus DAEMON_CLOSE_DELAY);
+# each cycle downloads only the bars from the one after the last closed bar on,
+# merges them into the series it holds in memory, leaves out the bar still
+# forming, appends the newly closed bars to the store and feeds them to the
+# streaming indicator state (see StockScreener.update_states), so a cycle costs
+# the download plus a few bars per updated symbol, and signals only fire on
+# closed bars. Signals go to the usual signal output and, when they fall in the
+# SIGNAL_LOOKBACK_DAYS window, to the notification outbox.
+
+
+def session_bounds(day):
+    """(open, close) of the regular session on a date, as timestamps in MARKET_TIMEZONE."""
+    session_open = pd.Timestamp(f"{day} {config.MARKET_SESSION_OPEN}").tz_localize(config.MARKET_TIMEZONE)
+    session_close = pd.Timestamp(f"{day} {config.MARKET_SESSION_CLOSE}").tz_localize(config.MARKET_TIMEZONE)
+    return session_open, session_close
+
+
+def bar_closes(day, interval):
+    """
+    Close times of the bars of `interval` on a trading day.
+
+    :param day: Date (datetime.date).
+    :param interval: Bar interval in yfinance notation.
+    :return: List of timestamps in MARKET_TIMEZONE (only the session close for daily and longer bars).
+    """
+    session_open, session_close = session_bounds(day)
+    minutes = INTERVAL_MINUTES.get(interval)
+    if minutes is None or minutes >= DAY:
+        return [session_close]  # Daily and longer bars are fetched once, after the session close
+    closes = pd.date_range(session_open + pd.Timedelta(minutes=minutes), session_close,
+                           freq=f'{minutes}min').tolist()
+    if not closes or closes[-1] < session_close:
+        closes.append(session_close)  # Shortened last bar, e.g. 15:30-16:00 with '90m'
+    return closes
+
+
+def next_wakeup(now, interval, delay=None):
+    """
+    Time of the next cycle: the first bar close after `now`, plus the publication delay.
+
+    Weekends are skipped. Exchange holidays are not known: the daemon wakes up,
+    finds no new bars and goes back to sleep.
+
+    :param now: Current time, a tz-aware timestamp.
+    :param interval: Bar interval in yfinance notation.
+    :param delay: Seconds after the close; defaults to DAEMON_CLOSE_DELAY.
+    :return: Timestamp in MARKET_TIMEZONE.
+    """
+    delay = pd.Timedelta(seconds=config.DAEMON_CLOSE_DELAY if delay is None else delay)
+    now = pd.Timestamp(now).tz_convert(config.MARKET_TIMEZONE)
+    day = now.date()
+    while True:
+        if day.weekday() < 5:
+            for close in bar_closes(day, interval):
+                if close + delay > now:
+                    return close + delay
+        day += timedelta(days=1)
+
+
+class PipelineDaemon:
+    """
+    Long-running pipeline: one fetch and screen cycle per bar close.
+
+    `start_day` does the startup work (signal backup, universe, stores,
+    indicator state) when a new trading day begins; `run_cycle` fetches the
+    new bars and screens the symbols that got some; `run` alternates cycles
+    and sleeps until `stop` is called.
+    """
+
+    def __init__(self, indicators, interval=None, period=None, sender=None):
+        """
+        Parameters:
+            indicators (list): Indicator functions whose classes implement `update`.
+            interval (str): Bar interval; defaults to INTERVAL.
+            period (str): History downloaded for symbols without stored bars; defaults to PERIOD.
+            sender (OutboxSender): Running outbox sender for notifications, or None.
+        """
+        self.indicators = indicators
+        self.interval = interval or config.INTERVAL
+        self.period = period or config.PERIOD
+        self.sender = sender
+        # Indexed signal store, or the legacy consolidated CSV file
+        self.signal_output = (SignalStore(config.SIGNAL_DB_FILE) if config.SIGNAL_BACKEND == 'sqlite'
+                              else config.CONSOLIDATED_OUTPUT_FILE)
+        self.state_store = IndicatorStateStore(config.INDICATOR_STATE_FILE)
+        self.stopping = threading.Event()
+        self.day = None  # Trading day the warm state was built for
+        self.fetcher = None
+        self.screener = None
+        self.states = None  # Indicator state of every symbol, saved after each cycle
+        self.cycles = 0
+        self.screened = 0  # Symbols screened by the last cycle
+
+    def start_day(self, day):
+        """Pay the startup cost for a trading day and keep everything it loads in memory."""
+        print(f"Starting trading day {day}...")
+        if config.DAEMON_DAILY_RESET:
+            DataUtils().reset_signal_generator()
+
+        self.fetcher = StockFetch(warm=True, closed=True)
+        self.fetcher.interval = self.interval
+        self.fetcher.period = self.period
+        StockFetch.ensure_directory_exists(config.STOCK_POST_DIR)
+        self.screener = StockScreener(stock_dir=config.STOCK_POST_DIR, interval=self.interval)
+        self.states = self.state_store.load()
+        self.day = day
+
+    def closed_series(self, now=None):
+        """
+        Fetch the new bars and yield each symbol's series up to its last closed bar.
+
+        The bar still forming at `now` is left out, and the closed bars newer
+        than the stored ones are appended to the store (the manifest is saved
+        once the fetch is done).
+
+        :param now: Current time as a naive UTC timestamp; defaults to the clock.
+        :return: Generator of (symbol, prepared bars).
+        """
+        now = pd.Timestamp.now(tz='UTC').tz_localize(None) if now is None else now
+        for symbol, bars in self.fetcher.iter_stock_data(persist=False, max_pending=config.STREAM_FETCH_PENDING):
+            forming = int((bar_ends(bars.index[-2:], self.interval) > now).sum())
+            if forming:
+                bars = bars.iloc[:-forming]
+            if bars.empty:
+                continue
+            self.fetcher.append_bars(symbol, bars)
+            bars = StockPrep.prepare(symbol, bars)
+            if bars is not None:
+                yield symbol, bars
+        self.fetcher.save_manifest(self.fetcher.manifest)
+
+    def run_cycle(self, now=None):
+        """
+        Fetch the bars closed since the last cycle, screen the symbols that got some, and queue the signals.
+
+        :param now: Current time as a naive UTC timestamp; defaults to the clock.
+        :return: DataFrame of the signals found on the new bars.
+        """
+        screened = len(self.screener.timings)
+        # Fetch is reported as its own stage; this one carries the per-symbol screen timings
+        all_signals = self.screener.update_states(self.indicators, self.closed_series(now), self.states, stage='cycle')
+        self.screened = len(self.screener.timings) - screened
+
+        self.state_store.save(self.states)
+        signals = self.screener.save_signals(all_signals, self.signal_output)
+        if self.fetcher.failed_symbols:
+            print(f"Failed to download data for: {self.fetcher.failed_symbols}")
+        self.notify(signals)
+        return signals
+
+    def notify(self, signals):
+        """
+        Queue the signals within SIGNAL_LOOKBACK_DAYS for delivery.
+
+        The first cycle after a start feeds whole histories and finds old
+        signals too; only the recent ones are sent, as run_pipeline does.
+
+        Returns:
+            int: Number of messages newly queued.
+        """
+        if self.sender is None or signals.empty:
+            return 0
+        stock_filter = StockFilter(signals, lookback_days=config.SIGNAL_LOOKBACK_DAYS)
+        stock_filter.tally_signals()
+        if stock_filter.filtered_data is None or stock_filter.filtered_data.empty:
+            return 0
+
+        notifier = self.sender.notifier
+        data = stock_filter.filtered_data.sort_values(by=['symbol', 'datetime'], ascending=[True, False])
+        with metrics.stage('notify') as stage:
+            stage.items = self.sender.outbox.enqueue(split_message(notifier.format_signals(data)), notifier.chat_id,
+                                                     alert='signals')
+        self.sender.notify()
+        print(f"📬 {stage.items} message(s) queued for delivery.")
+        return stage.items
+
+    def run(self, once=False):
+        """
+        Run cycles until `stop` is called: one right away, then one after each bar close.
+
+        :param once: Run a single cycle and return.
+        """
+        while not self.stopping.is_set():
+            now = pd.Timestamp.now(tz=config.MARKET_TIMEZONE)
+            if now.date() != self.day:
+                self.start_day(now.date())
+
+            started = time.perf_counter()
+            try:
+                signals = self.run_cycle()
+                self.cycles += 1
+                print(f"Cycle {self.cycles}: {self.screened} symbol(s) with new bars, "
+                      f"{len(signals)} signal(s) in {time.perf_counter() - started:.1f}s")
+            except Exception as e:
+                # Keep the daemon alive, e.g. through a data provider outage; the next cycle catches up
+                print(f"❌ Cycle failed: {e}")
+                logging.error(f"Daemon cycle failed: {e}")
+            finally:
+                # One run report per cycle, instead of stages accumulating all day
+                metrics.save()
+                metrics.reset()
+
+            if once:
+                return
+            wakeup = next_wakeup(pd.Timestamp.now(tz=config.MARKET_TIMEZONE), self.interval)
+            print(f"Next cycle at {wakeup}")
+            self.stopping.wait(max(0.0, (wakeup - pd.Timestamp.now(tz=config.MARKET_TIMEZONE)).total_seconds()))
+
+    def stop(self, *args):
+        """Stop after the running cycle (usable as a signal handler)."""
+        self.stopping.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Screen the universe again after every bar close.")
+    parser.add_argument('--interval', default=config.INTERVAL, help="Bar interval (default: INTERVAL)")
+    parser.add_argument('--period', default=config.PERIOD, help="History for symbols without stored bars (default: PERIOD)")
+    parser.add_argument('--once', action='store_true', help="Run one cycle and exit")
+    args = parser.parse_args()
+
+    # Notifications always go through the outbox: a long-running process shouldn't wait on Telegram
+    sender = start_outbox_sender()
+    daemon = PipelineDaemon([StockIndicators.calculate_macd, StockIndicators.calculate_rsi],
+                            interval=args.interval, period=args.period, sender=sender)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    try:
+        daemon.run(once=args.once)
+    finally:
+        if sender is not None:
+            pending = sender.close()
+            print(f"✅ {sender.sent} Telegram message(s) delivered, {pending} left in the outbox.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,285 @@
 import os
+import json
+import time
+import socket
+import random
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import pandas as pd
 import yfinance as yf
 from tqdm import tqdm
-import config  # Import only the config file, no other project modules
+import config  # Import only the config file, the storage layer and the calendar helpers, no other project modules
+from stock_storage import get_bar_store, normalize_bars, clean_bars
+from stock_resample import PERIOD_DAYS, DAY, interval_minutes
+from stock_metrics import metrics, get_file_logger, flush_logs
+
+try:
+    from yfinance.exceptions import YFRateLimitError
+except ImportError:  # older yfinance releases
+    YFRateLimitError = ConnectionError
+
+# Errors worth retrying: network hiccups, timeouts and provider throttling. Not
+# OSError as a whole, which also covers local errors such as PermissionError.
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError, socket.gaierror, YFRateLimitError)
+try:
+    from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout as RequestsTimeout
+    TRANSIENT_ERRORS += (RequestsConnectionError, RequestsTimeout)
+except ImportError:
+    pass
+try:  # HTTP client of recent yfinance releases
+    from curl_cffi.requests.exceptions import ConnectionError as CurlConnectionError, Timeout as CurlTimeout
+    TRANSIENT_ERRORS += (CurlConnectionError, CurlTimeout)
+except ImportError:
+    pass
+
+
+class Downloader:
+    """
+    Interface for the market-data source used by StockFetch.
+
+    Subclasses return one DataFrame per symbol, either in the layout produced by
+    a single-symbol `yf.download` call (columns MultiIndex of Price/Ticker) or
+    already flat; StockFetch normalizes both before storing them.
+    """
+
+    def download(self, symbols, interval, period, start=None):
+        """
+        Download bars for a list of symbols.
+
+        Parameters:
+            symbols (list): Symbols to download in a single request.
+            interval (str): Bar interval (e.g., '1d').
+            period (str): History period (e.g., '1y'), ignored when `start` is given.
+            start (str or pd.Timestamp): Optional first bar to download (inclusive): a
+                'YYYY-MM-DD' date, or a tz-aware timestamp for intraday bars.
+
+        Returns:
+            dict: Mapping of symbol to DataFrame (empty DataFrame if no data).
+        """
+        raise NotImplementedError
+
+
+class YFinanceDownloader(Downloader):
+    """Downloader backed by yfinance, using one multi-ticker request per call."""
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout or config.FETCH_SOCKET_TIMEOUT  # Socket timeout per request in seconds
+
+    def download(self, symbols, interval, period, start=None):
+        # yfinance takes either a period or a start date, not both
+        window = {'start': start} if start else {'period': period}
+
+        if len(symbols) == 1:
+            # Single symbol: keep the plain yf.download call and its native layout
+            data = yf.download(symbols[0], interval=interval, progress=False, timeout=self.timeout, **window)
+            return {symbols[0]: data}
+
+        data = yf.download(symbols, interval=interval, group_by='ticker',
+                           progress=False, timeout=self.timeout, **window)
+        return split_multi_ticker(data, symbols)
+
+
+def split_multi_ticker(data, symbols):
+    """
+    Split a wide multi-ticker download into per-symbol frames.
+
+    Parameters:
+        data (pd.DataFrame): Result of `yf.download(..., group_by='ticker')`, with
+            columns MultiIndex of (Ticker, Price).
+        symbols (list): Symbols that were requested.
+
+    Returns:
+        dict: Mapping of symbol to DataFrame with columns MultiIndex of (Price, Ticker),
+            matching the single-symbol layout. Symbols without data map to an empty DataFrame.
+    """
+    frames = {}
+    available = set(data.columns.get_level_values(0)) if isinstance(data.columns, pd.MultiIndex) else set()
+
+    for symbol in symbols:
+        if symbol not in available:
+            frames[symbol] = pd.DataFrame()
+            continue
+
+        # Rows where every field is NaN belong to other tickers' trading sessions
+        frame = data[symbol].dropna(how='all')
+        frame.columns = pd.MultiIndex.from_arrays(
+            [frame.columns, [symbol] * len(frame.columns)],
+            names=['Price', 'Ticker']
+        )
+        frame.index.name = data.index.name or 'Date'
+        frames[symbol] = frame
+
+    return frames
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Tokens refill continuously at `rate` per second up to `capacity`; each
+    request takes one token and blocks until one is available.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        if self.rate <= 0:
+            return  # Rate limiting disabled
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+class FetchEngine:
+    """
+    Run download jobs on a bounded thread pool.
+
+    Every attempt goes through a shared token bucket, transient errors are
+    retried with exponential backoff and full jitter, and a job whose current
+    attempt has been running for more than `timeout` seconds is abandoned with
+    a TimeoutError (its thread is left to finish in the background, since
+    Python threads cannot be interrupted). Backoff sleeps and waits for a
+    token don't count against the timeout.
+    """
+
+    def __init__(self, fetch_fn, workers=None, rate_limit=None, burst=None,
+                 max_retries=None, backoff_base=None, backoff_max=None, timeout=None):
+        self.fetch_fn = fetch_fn  # Callable taking one job and returning its result
+        self.workers = max(1, workers or config.FETCH_WORKERS)
+        self.limiter = TokenBucket(
+            config.FETCH_RATE_LIMIT if rate_limit is None else rate_limit,
+            burst or config.FETCH_RATE_BURST
+        )
+        self.max_retries = config.FETCH_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = config.FETCH_BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = config.FETCH_BACKOFF_MAX if backoff_max is None else backoff_max
+        self.timeout = timeout or config.FETCH_TIMEOUT
+
+    def backoff(self, attempt):
+        """Delay before retry number `attempt` (0-based): full jitter over a capped exponential."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _attempt(self, job, started):
+        """Run one job with rate limiting and retries, recording when its current attempt started."""
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            started[id(job)] = time.monotonic()
+            try:
+                return self.fetch_fn(job)
+            except TRANSIENT_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                started.pop(id(job), None)  # Not running while it backs off
+                time.sleep(self.backoff(attempt))
+
+    def run(self, jobs, max_pending=None):
+        """
+        Execute jobs concurrently.
+
+        Parameters:
+            jobs (list): Jobs to pass to `fetch_fn`, one call per job.
+            max_pending (int): Optional cap on jobs submitted but not yet yielded, so
+                results of a slow consumer don't accumulate in memory (default: no cap).
+
+        Yields:
+            tuple: (job, result, error) as each job finishes; exactly one of
+                result/error is None.
+        """
+        started = {}
+        jobs = iter(jobs)
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            pending = {}
+            while True:
+                # Top up the window of submitted jobs
+                for job in islice(jobs, max_pending - len(pending)) if max_pending else jobs:
+                    pending[executor.submit(self._attempt, job, started)] = job
+                if not pending:
+                    break
+
+                done, _ = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = pending.pop(future)
+                    error = future.exception()
+                    yield job, (None if error else future.result()), error
+
+                # Abandon jobs whose current attempt has been running longer than the timeout
+                now = time.monotonic()
+                for future, job in list(pending.items()):
+                    start = started.get(id(job))
+                    if start is not None and now - start > self.timeout and not future.done():
+                        pending.pop(future)
+                        started.pop(id(job), None)
+                        yield job, None, TimeoutError(f"attempt timed out after {self.timeout}s")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
 
 class StockFetch:
-    def __init__(self):
-        """Initialize StockFetch with configurations from the config file."""
+    def __init__(self, downloader=None, batch_size=None, workers=None, incremental=None, normalize=None,
+                 warm=False, symbols=None, manifest_output=None, closed=False, rate_share=1):
+        """
+        Initialize StockFetch with configurations from the config file.
+
+        With `normalize` on (FETCH_NORMALIZE), bars are flattened, typed and sorted in
+        memory right after download and written straight to the processed directory,
+        so StockPrep.preprocess_all does not need to run.
+
+        With `warm` on (daemon mode), the symbol list, the manifest and every
+        series are kept in memory after the first fetch: later fetches only
+        download the new bars and merge them without reading the store back.
+
+        With `closed` on, the store holds closed bars only (the daemon leaves
+        out the bar still forming, see `append_bars`): a download resumes at the
+        bar right after the last stored one instead of at its date.
+
+        With `symbols` (a shard of the universe), only those symbols are
+        fetched instead of SYMBOLS_FILE, and failed ones are reported in
+        `failed_symbols` but not removed from the file: several shards run at
+        once, so the coordinator does it. A shard reads the shared manifest
+        but writes its own entries to `manifest_output`, which the coordinator
+        merges into the shared one (`merge_manifest`).
+
+        With `rate_share`, this fetch is one of that many processes fetching at
+        once and gets that share of FETCH_RATE_LIMIT and FETCH_RATE_BURST, so
+        together they keep to the provider's quota.
+        """
         self.symbols_file = config.SYMBOLS_FILE  # Path to the symbols file
-        self.output_dir = config.STOCK_PRE_DIR  # Directory for raw stock data
+        self.normalize = config.FETCH_NORMALIZE if normalize is None else normalize  # Fused fetch/preprocess
+        self.output_dir = config.STOCK_POST_DIR if self.normalize else config.STOCK_PRE_DIR  # Output directory
+        self.store = get_bar_store(self.output_dir)  # Bar storage backend
         self.log_file = config.LOG_FILE  # Log file path
         self.interval = config.INTERVAL  # Data interval (e.g., '1d')
         self.period = config.PERIOD  # Data period (e.g., '1mo')
+        self.batch_size = max(1, batch_size or config.FETCH_BATCH_SIZE)  # Symbols per download request
+        self.downloader = downloader or YFinanceDownloader()  # Market-data source
+        self.workers = workers or config.FETCH_WORKERS  # Concurrent download requests
+        self.incremental = config.FETCH_INCREMENTAL if incremental is None else incremental  # Fetch only new bars
+        self.manifest_file = os.path.join(self.output_dir, os.path.basename(config.FETCH_MANIFEST_FILE))  # Last stored bar per symbol
+        self.manifest_output = manifest_output  # Shard mode: file receiving the shard's manifest entries
+        self.rate_limit = config.FETCH_RATE_LIMIT / rate_share  # Download requests per second of this process
+        self.burst = config.FETCH_RATE_BURST / rate_share
+        self._stage = None  # StageMetrics of the running fetch
+        self.warm = warm
+        self.closed = closed  # The last stored bar is closed: don't download it again
+        self.shard = symbols is not None  # Fetch a given list instead of SYMBOLS_FILE
+        self.symbols = list(symbols) if self.shard else None  # Warm mode: symbol list, read once
+        self.manifest = None  # Warm mode: manifest, read once
+        self.series = {}  # Warm mode: full series of every symbol fetched
 
     @staticmethod
     def ensure_directory_exists(directory):
@@ -20,51 +288,276 @@ class StockFetch:
             os.makedirs(directory)
 
     def log_to_file(self, message):
-        """Log messages to a specified logfile."""
-        with open(self.log_file, 'a') as f:
-            f.write(message + '\n')
+        """Log messages to a specified logfile (buffered, see `get_file_logger`)."""
+        get_file_logger(self.log_file).info(message)
+
+    def load_manifest(self):
+        """Load the manifest of stored bars ({symbol: {'last', 'rows', 'interval'}})."""
+        if not os.path.exists(self.manifest_file):
+            return {}
+        try:
+            with open(self.manifest_file) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.log_to_file(f"Ignoring unreadable manifest {self.manifest_file}: {e}")
+            return {}
+
+    def save_manifest(self, manifest, manifest_file=None):
+        """Atomically write the manifest of stored bars (to `manifest_file`, by default the shared one)."""
+        manifest_file = manifest_file or self.manifest_file
+        tmp_file = manifest_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_file, manifest_file)
+
+    def merge_manifest(self, entries):
+        """
+        Merge manifest entries (e.g. those of the shards of a run) into the shared manifest.
+
+        Only one process may merge at a time; the shards' own fetches don't write it.
+        """
+        manifest = self.load_manifest()
+        manifest.update(entries)
+        self.save_manifest(manifest)
+
+    def _start_date(self, symbol, manifest):
+        """
+        First bar to request for a symbol, or None for a full `period` download.
+
+        The last stored bar is requested again because it may have been
+        downloaded before the bar closed, unless the store only holds closed
+        bars (`closed`, and the manifest entry was written by `append_bars`):
+        then the download starts at the next bar, a timestamp for intraday
+        intervals (so a cycle doesn't fetch the whole day again).
+        """
+        entry = manifest.get(symbol)
+        if not self.incremental or not entry or entry.get('interval') != self.interval:
+            return None
+        if symbol not in self.series and not self.store.exists(symbol):
+            return None
+
+        last = pd.Timestamp(entry['last'])
+        if last.tzinfo is not None:
+            last = last.tz_convert(None)
+        period_days = PERIOD_DAYS.get(self.period)
+        if period_days is not None and (pd.Timestamp.now() - last).days >= period_days:
+            return None  # Stored data is older than the requested window
+        if not (self.closed and entry.get('closed')):
+            return last.strftime('%Y-%m-%d')
+        minutes = interval_minutes(self.interval)
+        if minutes < DAY:
+            return (last + pd.Timedelta(minutes=minutes)).tz_localize('UTC')  # Stored intraday bars are naive UTC
+        return (last + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+
+    def _chunks(self, symbols, manifest=None):
+        """
+        Yield (batch, start) download jobs of at most `batch_size` symbols.
+
+        Symbols are grouped by their start date so each batch is one request.
+        """
+        by_start = {}
+        for symbol in symbols:
+            by_start.setdefault(self._start_date(symbol, manifest or {}), []).append(symbol)
+
+        for start_date, group in by_start.items():
+            for start in range(0, len(group), self.batch_size):
+                yield group[start:start + self.batch_size], start_date
+
+    def _download_batch(self, job):
+        """
+        Download one (batch, start) job with the configured interval and period.
+
+        Frames are normalized here, on the fetch worker, so the main thread only
+        writes them. A frame that fails to normalize is returned as its exception,
+        so it fails its symbol only, not the whole batch.
+        """
+        batch, start_date = job
+        started = time.perf_counter()
+        frames = self.downloader.download(batch, self.interval, self.period, start=start_date)
+        if self._stage is not None:
+            self._stage.add_timing(f"{batch[0]} (+{len(batch) - 1})", time.perf_counter() - started)
+        for symbol, data in frames.items():
+            if data is not None and not data.empty:
+                try:
+                    frames[symbol] = clean_bars(normalize_bars(data))
+                except Exception as e:
+                    frames[symbol] = e
+        return frames
+
+    def _merge_symbol(self, symbol, data, incremental):
+        """
+        Return a symbol's full series after a download.
+
+        In incremental mode the new bars are merged into the stored series,
+        de-duplicated on datetime with the fresh bar winning, since the last
+        stored bar may have been downloaded before it closed.
+        """
+        if incremental:
+            data = clean_bars(pd.concat([self._stored(symbol), data]))
+        return data
+
+    def _stored(self, symbol):
+        """A symbol's stored series, from memory in warm mode."""
+        data = self.series.get(symbol)
+        return self.store.read(symbol) if data is None else data
+
+    def _save_symbol(self, symbol, data, manifest):
+        """Write a symbol's merged bars to the store and update its manifest entry."""
+        output_file = self.store.write(symbol, data)
+
+        manifest[symbol] = {
+            'last': pd.Timestamp(data.index.max()).isoformat(),
+            'rows': len(data),
+            'interval': self.interval,
+        }
+        return output_file
+
+    def append_bars(self, symbol, data):
+        """
+        Store the bars of a symbol's series newer than its last stored bar, and update its manifest entry.
+
+        For callers that persist part of what `iter_stock_data(persist=False)`
+        yields, e.g. the daemon, which leaves out the bar still forming: only
+        the new rows are written, not the whole series. Save the manifest
+        (`save_manifest(self.manifest)`) afterwards.
+
+        :return: Path of the written file, or None if there was nothing new.
+        """
+        entry = self.manifest.get(symbol)
+        new_bars = data[data.index > pd.Timestamp(entry['last'])] if entry else data
+        if (not entry or not entry.get('closed') or entry.get('interval') != self.interval
+                or len(data) - len(new_bars) != entry.get('rows')):
+            # The stored bars may include one that was still forming, or the series doesn't
+            # extend them (e.g., a full download): replace them
+            output_file = self._save_symbol(symbol, data, self.manifest)
+            self.manifest[symbol]['closed'] = True
+            return output_file
+        if new_bars.empty:
+            return None
+        output_file = self.store.append(symbol, new_bars)
+        self.manifest[symbol] = dict(entry, last=pd.Timestamp(new_bars.index[-1]).isoformat(),
+                                     rows=entry.get('rows', 0) + len(new_bars))
+        return output_file
 
     def download_stock_data(self):
-        """Download stock data from yfinance for symbols in the symbols file."""
+        """Download stock data for symbols in the symbols file, one request per batch, concurrently."""
+        for _ in self.iter_stock_data():
+            pass
+        return self.failed_symbols
+
+    def iter_stock_data(self, persist=True, max_pending=None):
+        """
+        Download stock data and yield each symbol's bars as soon as its batch arrives.
+
+        Yields the full, normalized series (new bars merged into the stored ones
+        in incremental mode; the stored series when nothing newer exists), so
+        the next stage can consume it without reading it back from disk. With
+        `persist`, each series is also written to the store once, and the
+        manifest is saved when the generator is exhausted. Symbols that failed
+        on their own (no data, bars that don't normalize) are in
+        `self.failed_symbols` afterwards (and removed from the symbols file);
+        symbols whose batch request failed (timed out, ran out of network
+        retries or raised) are in `self.deferred_symbols` and kept.
+
+        Parameters:
+            persist (bool): Write bars and the manifest (the storage sink).
+            max_pending (int): Optional cap on download batches in flight or waiting to be
+                consumed, which bounds memory when the consumer is slower than the downloads.
+
+        Yields:
+            tuple: (symbol, DataFrame) for each symbol with bars.
+        """
+        self.failed_symbols = []
+        self.deferred_symbols = []
+
         # Ensure the output directory exists
         self.ensure_directory_exists(self.output_dir)
 
-        try:
-            # Load symbols from the CSV file
-            symbols_df = pd.read_csv(self.symbols_file)
-            symbols = symbols_df['Symbol'].tolist()
-            failed_symbols = []
-
-            # Progress bar for all symbols
-            with tqdm(total=len(symbols), desc="Downloading stock data", unit="symbol", leave=False) as pbar:
-                for symbol in symbols:
-                    try:
-                        # Download stock data with the configured interval and period
-                        data = yf.download(symbol, interval=self.interval, period=self.period, progress=False)
-                        if not data.empty:
-                            output_file = os.path.join(self.output_dir, f"{symbol}.csv")
-                            data.to_csv(output_file)
-                            self.log_to_file(f"Data for {symbol} saved to {output_file}")
-                        else:
-                            self.log_to_file(f"No data for {symbol}")
-                            failed_symbols.append(symbol)
-                    except Exception as e:
-                        self.log_to_file(f"Failed to download data for {symbol}: {e}")
-                        failed_symbols.append(symbol)
-                    finally:
-                        pbar.update(1)
-
-            # Handle failed symbols
-            if failed_symbols:
-                self.log_to_file(f"Symbols that failed to download: {', '.join(failed_symbols)}")
-
-                # Remove failed symbols from the CSV file
-                symbols_df = symbols_df[~symbols_df['Symbol'].isin(failed_symbols)]
-                symbols_df.to_csv(self.symbols_file, index=False)
-                self.log_to_file("Failed symbols removed from the symbols CSV file.")
-
-            return failed_symbols
-
-        except Exception as e:
-            self.log_to_file(f"Error: {e}")
-            return []
+        with metrics.stage('fetch') as stage:
+            self._stage = stage
+            read_before, written_before = self.store.bytes_read, self.store.bytes_written
+            try:
+                # Load symbols from the CSV file
+                if self.symbols is None or not (self.warm or self.shard):
+                    self.symbols = pd.read_csv(self.symbols_file)['Symbol'].tolist()
+                if self.manifest is None or not self.warm:
+                    self.manifest = self.load_manifest()
+                symbols = self.symbols
+                failed_symbols = self.failed_symbols
+                manifest = self.manifest
+
+                engine = FetchEngine(self._download_batch, workers=self.workers, rate_limit=self.rate_limit,
+                                     burst=self.burst)
+
+                # Progress bar for all symbols
+                with tqdm(total=len(symbols), desc="Downloading stock data", unit="symbol", leave=False) as pbar:
+                    for (batch, start_date), frames, error in engine.run(list(self._chunks(symbols, manifest)), max_pending):
+                        if error is not None:
+                            # A failed request says nothing about each of its symbols (timeouts,
+                            # exhausted network retries, a provider error): keep them in the
+                            # symbols file, the next run fetches them again
+                            kind = "deferred to the next run" if isinstance(error, TRANSIENT_ERRORS) else "failed"
+                            self.log_to_file(f"Download of {', '.join(batch)} {kind}: {error}")
+                            self.deferred_symbols.extend(batch)
+                            pbar.update(len(batch))
+                            continue
+
+                        for symbol in batch:
+                            data = None
+                            try:
+                                data = frames.get(symbol)
+                                if isinstance(data, Exception):
+                                    raise data
+                                if data is not None and not data.empty:
+                                    data = self._merge_symbol(symbol, data, start_date is not None)
+                                    if persist:
+                                        output_file = self._save_symbol(symbol, data, manifest)
+                                        self.log_to_file(f"Data for {symbol} saved to {output_file}")
+                                elif start_date is not None:
+                                    # Nothing newer than what is stored (e.g., market closed)
+                                    self.log_to_file(f"No new data for {symbol} since {start_date}")
+                                    data = self._stored(symbol)
+                                else:
+                                    self.log_to_file(f"No data for {symbol}")
+                                    failed_symbols.append(symbol)
+                            except Exception as e:
+                                self.log_to_file(f"Failed to process data for {symbol}: {e}")
+                                failed_symbols.append(symbol)
+                                data = None
+                            finally:
+                                pbar.update(1)
+
+                            if data is not None and not data.empty:
+                                if self.warm:
+                                    self.series[symbol] = data
+                                stage.items += 1
+                                yield symbol, data
+
+                if persist and not self.shard:
+                    self.save_manifest(manifest)
+                elif persist and self.manifest_output:
+                    # Concurrent shards don't write the shared manifest: only this shard's entries
+                    self.save_manifest({symbol: manifest[symbol] for symbol in symbols if symbol in manifest},
+                                       self.manifest_output)
+
+                # Handle failed symbols
+                if failed_symbols and not self.shard:
+                    self.log_to_file(f"Symbols that failed to download: {', '.join(failed_symbols)}")
+
+                    # Remove failed symbols from the CSV file
+                    symbols_df = pd.read_csv(self.symbols_file)
+                    symbols_df = symbols_df[~symbols_df['Symbol'].isin(failed_symbols)]
+                    symbols_df.to_csv(self.symbols_file, index=False)
+                    failed = set(failed_symbols)
+                    self.symbols = [symbol for symbol in symbols if symbol not in failed]
+                    self.log_to_file("Failed symbols removed from the symbols CSV file.")
+
+            except Exception as e:
+                self.log_to_file(f"Error: {e}")
+                self.failed_symbols = []
+            finally:
+                self._stage = None
+                stage.bytes_read = self.store.bytes_read - read_before
+                stage.bytes_written = self.store.bytes_written - written_before
+                flush_logs()
+
@@ -1,7 +1,23 @@
 import os
+import math
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
-import talib
-import config  # Import only the config file, no other project modules
+import config  # Import only the config file, the storage layer, the panel kernels and resampling, no other project modules
+import stock_panel
+import stock_state
+import stock_resample
+from stock_storage import get_bar_store, tail_bars
+from stock_panel import PricePanel
+from stock_state import IndicatorStateStore
+from stock_cache import IndicatorCache, bars_fingerprint
+from stock_signals import SignalStore
+from stock_metrics import metrics
+from stock_intermediates import Intermediates, PANEL_KERNELS, validate_spec
+from stock_resample import Resampler, resample_bars
 
 
 class StockIndicator:
@@ -16,12 +32,102 @@ class StockIndicator:
         # magic: create `calculate_{indicator} property` - preserve `calculate_macd`, `calculate_rsi` when those classes are made.
         setattr(StockIndicator, f'calculate_{cls.__name__.lower()}', cls.calculate)
         cls.calculate.__name__ = cls.__name__
+        # Declared intermediates must exist, so a typo fails at import rather than mid-run
+        if cls.requires is not StockIndicator.requires:
+            for spec in cls.requires().values():
+                validate_spec(spec)
 
     @staticmethod
-    def calculate(data, *args, **kwargs):
-        "Interface example method for subclasses of StockIndicator"
+    def calculate(data, *args, intermediates=None, **kwargs):
+        "Interface example method for subclasses of StockIndicator; legacy DataFrame adapter around `compute`"
         raise NotImplementedError
 
+    @staticmethod
+    def compute(close, intermediates=None):
+        "Signals for a close array: (boolean buy mask, {column name: series}); never touches a DataFrame"
+        raise NotImplementedError
+
+    @staticmethod
+    def calculate_panel(close, intermediates=None):
+        "Optional vectorized variant: boolean signal mask for a (bars x symbols) close array"
+        raise NotImplementedError
+
+    @staticmethod
+    def requires():
+        "Shared intermediates the indicator reads, as {name: spec} (see stock_intermediates)"
+        return {}
+
+    @staticmethod
+    def params():
+        "Configuration values the indicator depends on; a change invalidates its saved state"
+        raise NotImplementedError
+
+    @staticmethod
+    def warmup():
+        "Bars needed before the first signal bar for signals to match a full-history run (see SCREEN_WARMUP_TOLERANCE)"
+        raise NotImplementedError
+
+    @staticmethod
+    def convergence(alpha):
+        """
+        Bars after its seed for a recursive average with smoothing factor `alpha` to forget the seed.
+
+        The seed's weight decays as (1 - alpha) ** bars; this is the first
+        count of bars where it is at most SCREEN_WARMUP_TOLERANCE.
+        """
+        return math.ceil(math.log(config.SCREEN_WARMUP_TOLERANCE) / math.log(1 - alpha))
+
+    @staticmethod
+    def timeframe():
+        "Timeframe the indicator runs on ('4h', '1D', '1W', ...), aggregated from the stored bars; None for the stored bars"
+        return None
+
+    @staticmethod
+    def initial_state():
+        "Optional incremental mode: streaming state before the first bar"
+        raise NotImplementedError
+
+    @staticmethod
+    def update(state, closes):
+        "Optional incremental mode: feed new closes to `state` (in place), return one buy flag per close"
+        raise NotImplementedError
+
+    @staticmethod
+    def resolve(indicator):
+        """Return the StockIndicator subclass behind an indicator function such as `calculate_macd`."""
+        for cls in StockIndicator.all_indicators:
+            if cls.calculate is indicator or cls.__name__ == indicator.__name__:
+                return cls
+        raise ValueError(f"{indicator.__name__} is not a StockIndicator calculation.")
+
+    @staticmethod
+    def native_class(indicator):
+        """The StockIndicator subclass whose `calculate` is `indicator`, or None for a plain function."""
+        for cls in StockIndicator.all_indicators:
+            if cls.calculate is indicator:
+                return cls
+        return None
+
+    @staticmethod
+    def to_frame(data, mask, columns):
+        """
+        Legacy output of `calculate`: write the series and the mask into `data`.
+
+        Parameters:
+            data (pd.DataFrame): Input DataFrame (with a 'Datetime' column), modified in place.
+            mask (np.ndarray): Boolean buy mask from `compute`.
+            columns (dict): Series to add, by column name.
+
+        Returns:
+            pd.DataFrame: `data` with the series and a 'Buy Signal' column.
+            pd.Timestamp: Last buy signal date (None if there is none).
+        """
+        for name, values in columns.items():
+            data[name] = values
+        data['Buy Signal'] = mask
+        last_buy_signal = data.loc[data['Buy Signal'], 'Datetime'].max() if mask.any() else None
+        return data, last_buy_signal
+
 StockIndicators = StockIndicator # TODO: deprecate plural name
 
 ##
@@ -30,12 +136,13 @@ StockIndicators = StockIndicator # TODO: deprecate plural name
 
 class MACD(StockIndicator):
     @staticmethod
-    def calculate(data):
+    def calculate(data, intermediates=None):
         """
         Calculate MACD and Signal Line from stock data, using MACD_CONFIG.
 
         Parameters:
             data (pd.DataFrame): DataFrame containing stock data with 'Close' column.
+            intermediates (Intermediates): Optional intermediates shared with other indicators on the same data.
 
         Returns:
             pd.DataFrame: DataFrame with MACD, Signal Line, Histogram, and crossovers.
@@ -44,45 +151,117 @@ class MACD(StockIndicator):
         if 'Close' not in data.columns:
             raise ValueError("The input data must contain a 'Close' column.")
 
-        # Use MACD_CONFIG for parameter values
-        fast_length = config.MACD_CONFIG['fast_length']
+        cross_up, columns = MACD.compute(data['Close'].to_numpy(dtype='float64'), intermediates)
+        return StockIndicator.to_frame(data, cross_up, columns)
+
+    @staticmethod
+    def compute(close, intermediates=None):
+        """
+        MACD cross-up signals for a close array, using MACD_CONFIG.
+
+        Parameters:
+            close (np.ndarray): Closing prices.
+            intermediates (Intermediates): Optional intermediates shared with other indicators on the same closes.
+
+        Returns:
+            np.ndarray: Boolean mask of bars where MACD crosses above the Signal Line.
+            dict: MACD, Signal Line and Histogram arrays.
+        """
+        if intermediates is None:
+            intermediates = Intermediates(close)
+
+        # Calculate MACD and Signal Line (parameters from MACD_CONFIG)
+        macd, signal, hist = intermediates.get(MACD.requires()['macd'])
+
+        # Detect Crossovers (MACD crossing above Signal Line)
+        cross_up = (stock_panel.lagged(macd) <= stock_panel.lagged(signal)) & (macd > signal)
+        #cross_down = (stock_panel.lagged(macd) >= stock_panel.lagged(signal)) & (macd < signal)
+
+        return cross_up, {'MACD': macd, 'Signal Line': signal, 'Histogram': hist}
+
+    @staticmethod
+    def calculate_panel(close, intermediates=None):
+        """
+        Vectorized MACD cross-up signals for every column of a close array, using MACD_CONFIG.
+
+        Parameters:
+            close (np.ndarray): (bars x symbols) closing prices.
+            intermediates (Intermediates): Optional panel intermediates shared with other indicators.
+
+        Returns:
+            np.ndarray: Boolean mask of bars where MACD crosses above the Signal Line.
+        """
+        if intermediates is None:
+            intermediates = Intermediates(close, PANEL_KERNELS)
+        return MACD.compute(close, intermediates)[0]
+
+    @staticmethod
+    def requires():
+        return {'macd': (
+            'macd',
+            config.MACD_CONFIG['fast_length'],
+            config.MACD_CONFIG['slow_length'],
+            config.MACD_CONFIG['signal_length']
+        )}
+
+    @staticmethod
+    def params():
+        return dict(config.MACD_CONFIG)
+
+    @staticmethod
+    def warmup():
+        # First signal line value after slow + signal - 2 bars, one more for the crossover,
+        # then until the slowest EMA has forgotten its seed
         slow_length = config.MACD_CONFIG['slow_length']
         signal_length = config.MACD_CONFIG['signal_length']
+        longest = max(config.MACD_CONFIG['fast_length'], slow_length, signal_length)
+        return slow_length + signal_length - 1 + StockIndicator.convergence(2 / (longest + 1))
 
-        # Calculate MACD and Signal Line
-        macd, signal, hist = talib.MACD(
-            data['Close'],
-            fastperiod=fast_length,
-            slowperiod=slow_length,
-            signalperiod=signal_length
+    @staticmethod
+    def initial_state():
+        state = stock_state.macd_state(
+            config.MACD_CONFIG['fast_length'],
+            config.MACD_CONFIG['slow_length'],
+            config.MACD_CONFIG['signal_length']
         )
+        state.update(previous_macd=stock_state.NAN, previous_signal=stock_state.NAN)
+        return state
 
-        # Detect Crossovers (MACD crossing above Signal Line)
-        cross_up = (macd.shift(1) <= signal.shift(1)) & (macd > signal)
-        #cross_down = (macd.shift(1) >= signal.shift(1)) & (macd < signal)
-
-        # Add calculated columns to the DataFrame
-        data['MACD'] = macd
-        data['Signal Line'] = signal
-        data['Histogram'] = hist
-        data['Buy Signal'] = cross_up  # Rename to match generic signal terminology
+    @staticmethod
+    def update(state, closes):
+        """
+        Feed new closes to a streaming MACD and flag cross-ups, as `calculate` would on the full series.
 
-        # Find the last "cross-up" position
-        last_cross_up = data.loc[data['Buy Signal'], 'Datetime'].max() if not data.loc[data['Buy Signal']].empty else None
-        #last_cross_up = data.loc[data['Sell Signal'], 'Datetime'].max() if not data.loc[data['Sell Signal']].empty else None
+        Parameters:
+            state (dict): State from `initial_state` or a previous run, updated in place.
+            closes (list): Closes newer than the last one fed.
 
-        return data, last_cross_up #last_cross_down
+        Returns:
+            list: One bool per close, True where MACD crosses above the Signal Line.
+        """
+        flags = []
+        for close in closes:
+            macd, signal = stock_state.macd_update(state, close)
+            flags.append(state['previous_macd'] <= state['previous_signal'] and macd > signal)
+            state['previous_macd'], state['previous_signal'] = macd, signal
+        return flags
 
 
 class RSI(StockIndicator):
     @staticmethod
-    def calculate(data, res='1D'):
+    def calculate(data, res=None, intermediates=None):
         """
         Calculate Multi-Timeframe RSI with optional upper and lower line signals using TA-Lib.
 
+        When `res` is coarser than INTERVAL, the bars are aggregated into that
+        timeframe first. Each resampled bar's RSI and signal are written on the
+        row of its last bar, when they become known; rows in between keep the
+        RSI of the last completed bar.
+
         Parameters:
-            data (pd.DataFrame): DataFrame containing stock data with 'Close' column.
-            res (str): Resolution for multi-timeframe analysis (e.g., '1D', '1H').
+            data (pd.DataFrame): DataFrame containing stock data with 'Datetime' and 'Close' columns.
+            res (str): Resolution for multi-timeframe analysis (e.g., '1D', '4h'); defaults to RSI_CONFIG['res'].
+            intermediates (Intermediates): Optional intermediates shared with other indicators on the same data.
 
         Returns:
             pd.DataFrame: DataFrame with RSI values and buy/sell signals.
@@ -91,78 +270,227 @@ class RSI(StockIndicator):
         if 'Close' not in data.columns:
             raise ValueError("The input data must contain a 'Close' column.")
 
+        res = config.RSI_CONFIG.get('res') if res is None else res
+        column = f'RSI_{res}' if res else 'RSI'
+        if not res or not stock_resample.is_coarser(res, config.INTERVAL):
+            buy_signal, columns = RSI.compute(data['Close'].to_numpy(dtype='float64'), intermediates)
+            return StockIndicator.to_frame(data, buy_signal, {column: columns['RSI']})
+
+        # The intermediates are for the rows' closes, not the resampled ones
+        bars = data.set_index(pd.DatetimeIndex(data['Datetime']))
+        resampled, ends = resample_bars(bars, res)
+        buy_signal, columns = RSI.compute(resampled['Close'].to_numpy(dtype='float64'))
+        rows = bars.index.get_indexer(ends)  # Row of the last bar of each resampled bar
+        mask = np.zeros(len(data), dtype=bool)
+        mask[rows] = buy_signal
+        rsi = np.full(len(data), np.nan)
+        rsi[rows] = columns['RSI']
+        return StockIndicator.to_frame(data, mask, {column: pd.Series(rsi).ffill().to_numpy()})
+
+    @staticmethod
+    def compute(close, intermediates=None):
+        """
+        RSI buy signals for a close array, using RSI_CONFIG.
+
+        Parameters:
+            close (np.ndarray): Closing prices.
+            intermediates (Intermediates): Optional intermediates shared with other indicators on the same closes.
+
+        Returns:
+            np.ndarray: Boolean mask of bars where RSI crosses below the lower line.
+            dict: RSI array.
+        """
+        if intermediates is None:
+            intermediates = Intermediates(close)
+
         # Extract RSI configuration parameters
-        period = config.RSI_CONFIG['period']
         up_line = config.RSI_CONFIG['up_line']
         low_line = config.RSI_CONFIG['low_line']
 
         # Calculate RSI using TA-Lib
-        rsi = talib.RSI(data['Close'], timeperiod=period)
+        rsi = intermediates.get(RSI.requires()['rsi'])
+
+        # Signals based on RSI crossing below the lower line (buy signal)
+        buy_signal = (rsi < low_line) & (stock_panel.lagged(rsi) >= low_line)
+        #sell_signal = (stock_panel.lagged(rsi) <= up_line) & (rsi > up_line)
+
+        return buy_signal, {'RSI': rsi}
+
+    @staticmethod
+    def calculate_panel(close, intermediates=None):
+        """
+        Vectorized RSI buy signals for every column of a close array, using RSI_CONFIG.
+
+        Parameters:
+            close (np.ndarray): (bars x symbols) closing prices.
+            intermediates (Intermediates): Optional panel intermediates shared with other indicators.
+
+        Returns:
+            np.ndarray: Boolean mask of bars where RSI crosses below the lower line.
+        """
+        if intermediates is None:
+            intermediates = Intermediates(close, PANEL_KERNELS)
+        return RSI.compute(close, intermediates)[0]
+
+    @staticmethod
+    def requires():
+        return {'rsi': ('rsi', config.RSI_CONFIG['period'])}
+
+    @staticmethod
+    def params():
+        return dict(config.RSI_CONFIG)
+
+    @staticmethod
+    def timeframe():
+        return config.RSI_CONFIG.get('res')
 
-        # Add the RSI values to the DataFrame
-        data[f'RSI_{res}'] = rsi
+    @staticmethod
+    def warmup():
+        # First RSI value after `period` bars, one more for the crossover; Wilder's smoothing is an EMA with alpha 1 / period
+        period = config.RSI_CONFIG['period']
+        return period + 1 + StockIndicator.convergence(1 / period)
 
-        # Add signals based on RSI crossing below the lower line (buy signal)
-        data['Buy Signal'] = (rsi < low_line) & (rsi.shift(1) >= low_line)
-        #data['Sell Signal'] = ((rsi.shift(1) <= up_line) & (rsi > up_line)).astype(int)
+    @staticmethod
+    def initial_state():
+        state = stock_state.rsi_state(config.RSI_CONFIG['period'])
+        state['previous_rsi'] = stock_state.NAN
+        return state
 
-        # Find the last "Buy Signal" position
-        last_buy_signal = data.loc[data['Buy Signal'], 'Datetime'].max() if not data.loc[data['Buy Signal']].empty else None
-        #last_sell_signal = data.loc[data['Sell Signal'], 'Datetime'].max() if not data.loc[data['Sell Signal']].empty else None
+    @staticmethod
+    def update(state, closes):
+        """
+        Feed new closes to a streaming RSI and flag buy signals, as `calculate` would on the full series.
 
-        return data, last_buy_signal #last_sell_signal
+        Parameters:
+            state (dict): State from `initial_state` or a previous run, updated in place.
+            closes (list): Closes newer than the last one fed.
+
+        Returns:
+            list: One bool per close, True where RSI crosses below the lower line.
+        """
+        low_line = config.RSI_CONFIG['low_line']
+        flags = []
+        for close in closes:
+            rsi = stock_state.rsi_update(state, close)
+            flags.append(rsi < low_line and state['previous_rsi'] >= low_line)
+            state['previous_rsi'] = rsi
+        return flags
 
 class TEMA(StockIndicator):
     @staticmethod
-    def calculate(data):
+    def calculate(data, intermediates=None):
         """
         Calculate TEMA from stock data and generate buy signals, using TEMA_CONFIG.
 
         Parameters:
             data (pd.DataFrame): DataFrame containing stock data with a 'Close' column.
+            intermediates (Intermediates): Optional intermediates shared with other indicators on the same data.
 
         Returns:
             pd.DataFrame: DataFrame with TEMA and Buy Signal columns.
             pd.Timestamp: Last Buy Signal Date (TEMA Cross Up).
         """
-        #debug - TEMA_CONFIG examples
-        TEMA_CONFIG = {
-                "period": 14
-                }
-        from config import MACD_CONFIG
-
         # Validate input
         if 'Close' not in data.columns:
             raise ValueError("The input data must contain a 'Close' column.")
 
-        if len(data) < max(TEMA_CONFIG['period'], MACD_CONFIG['slow_length']):
+        buy_signal, columns = TEMA.compute(data['Close'].to_numpy(dtype='float64'), intermediates)
+        return StockIndicator.to_frame(data, buy_signal, columns)
+
+    @staticmethod
+    def compute(close, intermediates=None):
+        """
+        TEMA buy signals for a close array, using TEMA_CONFIG.
+
+        Parameters:
+            close (np.ndarray): Closing prices (a 2-D panel is accepted; see `calculate_panel`).
+            intermediates (Intermediates): Optional intermediates shared with other indicators on the same closes.
+
+        Returns:
+            np.ndarray: Boolean mask of bars where TEMA rises and Close is above it.
+            dict: TEMA array.
+        """
+        if close.ndim == 1 and len(close) < TEMA.min_length():
             raise ValueError("Close prices array is too short for the given configuration.")
 
-        # Extract configuration parameters
-        tema_period = TEMA_CONFIG['period']
-        fast_length = MACD_CONFIG['fast_length']
-        slow_length = MACD_CONFIG['slow_length']
-        signal_length = MACD_CONFIG['signal_length']
+        if intermediates is None:
+            intermediates = Intermediates(close)
 
-        # Calculate TEMA
-        ema1 = talib.EMA(data['Close'], timeperiod=tema_period)
-        ema2 = talib.EMA(ema1, timeperiod=tema_period)
-        ema3 = talib.EMA(ema2, timeperiod=tema_period)
-        data['TEMA'] = 3 * (ema1 - ema2) + ema3
+        # Calculate TEMA from the chained EMAs of TEMA_CONFIG['length']
+        ema = {name: intermediates.get(spec) for name, spec in TEMA.requires().items()}
+        tema = 3 * (ema['ema1'] - ema['ema2']) + ema['ema3']
 
-        # Calculate MACD
-        macd, macd_signal, _ = talib.MACD(data['Close'],
-                                          fastperiod=fast_length,
-                                          slowperiod=slow_length,
-                                          signalperiod=signal_length)
+        buy_signal = (tema > stock_panel.lagged(tema)) & (close > tema)
+        return buy_signal, {'TEMA': tema}
 
-        data['Buy Signal'] = (data['TEMA'] > data['TEMA'].shift(1)) & \
-                             (data['Close'] > data['TEMA'])
+    @staticmethod
+    def min_length():
+        """Fewest bars TEMA accepts with the current configuration."""
+        return max(config.TEMA_CONFIG['length'], config.MACD_CONFIG['slow_length'])
 
-        # Find the last buy signal date
-        last_buy_signal_date = data.loc[data['Buy Signal'], 'Datetime'].max() if not data.loc[data['Buy Signal']].empty else None
+    @staticmethod
+    def calculate_panel(close, intermediates=None):
+        """
+        Vectorized TEMA buy signals for every column of a close array, using TEMA_CONFIG.
 
-        return data, last_buy_signal_date
+        Columns shorter than `min_length()` bars get no signals (the per-symbol
+        `calculate` raises for them).
+
+        Parameters:
+            close (np.ndarray): (bars x symbols) closing prices.
+            intermediates (Intermediates): Optional panel intermediates shared with other indicators.
+
+        Returns:
+            np.ndarray: Boolean mask of bars where TEMA rises and Close is above it.
+        """
+        if intermediates is None:
+            intermediates = Intermediates(close, PANEL_KERNELS)
+        signals = TEMA.compute(close, intermediates)[0]
+        long_enough = (~np.isnan(close)).sum(axis=0) >= TEMA.min_length()
+        return signals & long_enough
+
+    @staticmethod
+    def requires():
+        length = config.TEMA_CONFIG['length']
+        return {'ema1': ('ema', length, 1), 'ema2': ('ema', length, 2), 'ema3': ('ema', length, 3)}
+
+    @staticmethod
+    def params():
+        return {'length': config.TEMA_CONFIG['length'], 'slow_length': config.MACD_CONFIG['slow_length']}
+
+    @staticmethod
+    def warmup():
+        # First TEMA value after 3 * (length - 1) bars, one more for the rise
+        length = config.TEMA_CONFIG['length']
+        return max(3 * (length - 1) + 1 + StockIndicator.convergence(2 / (length + 1)), TEMA.min_length())
+
+    @staticmethod
+    def initial_state():
+        state = stock_state.tema_state(config.TEMA_CONFIG['length'])
+        state['previous_tema'] = stock_state.NAN
+        return state
+
+    @staticmethod
+    def update(state, closes):
+        """
+        Feed new closes to a streaming TEMA and flag buy signals, as `calculate` would on the full series.
+
+        The first signal can only come after 3 * length - 2 bars, past `min_length()`,
+        so series too short for `calculate` never produce one here either.
+
+        Parameters:
+            state (dict): State from `initial_state` or a previous run, updated in place.
+            closes (list): Closes newer than the last one fed.
+
+        Returns:
+            list: One bool per close, True where TEMA rises and Close is above it.
+        """
+        flags = []
+        for close in closes:
+            tema = stock_state.tema_update(state, close)
+            flags.append(tema > state['previous_tema'] and close > tema)
+            state['previous_tema'] = tema
+        return flags
 
 
         # Generate buy and sell signals
@@ -175,57 +503,543 @@ class TEMA(StockIndicator):
         #    #"Sell Signals": sell_signals
         #}
 
+def _screen_shard(stock_dir, backend, use_cache, indicators, symbols, start, end, warmup, since, interval=None):
+    """
+    Screen one shard of symbols in a worker process.
+
+    Returns its signal frames, the cache (hits, misses), and the per-symbol
+    timings and bytes read for the run report.
+    """
+    screener = StockScreener(stock_dir, backend=backend, use_cache=use_cache, interval=interval)
+    bars_by_symbol = screener._load_bars(symbols, start, end, warmup, since)
+    signals = screener._screen_symbols(indicators, bars_by_symbol, since)
+    cache = screener.cache
+    return signals, (cache.hits, cache.misses) if cache else (0, 0), screener.timings, screener.store.bytes_read
+
+
 class StockScreener:
     """
     A class to handle stock screening based on multiple technical indicators.
     """
-    def __init__(self, stock_dir):
+    def __init__(self, stock_dir, backend=None, use_cache=config.INDICATOR_CACHE, interval=None):
         if not os.path.exists(stock_dir):
             raise FileNotFoundError(f"The directory {stock_dir} does not exist.")
         self.stock_dir = stock_dir
+        self.backend = backend or config.STORAGE_BACKEND  # Storage backend name
+        self.store = get_bar_store(stock_dir, self.backend)  # Processed bar storage
+        self.use_cache = use_cache
+        # Indicator results keyed on (symbol, bars hash, indicator, config)
+        self.cache = IndicatorCache(config.INDICATOR_CACHE_DIR, config.INDICATOR_CACHE_MAX_BYTES) if use_cache else None
+        self.timings = []  # (symbol, seconds) of every symbol screened, for the run report
+        self.interval = interval or config.INTERVAL  # Interval of the stored bars
+        self.resampler = Resampler(self.interval)  # Higher timeframes requested by indicators, cached in memory
 
-    def screen_by_indicators(self, indicators, output_file):
+    def screen_by_indicators(self, indicators, output_file, symbols=None, start=None, end=None,
+                             workers=config.SCREEN_WORKERS, chunk_size=config.SCREEN_CHUNK_SIZE,
+                             lookback_days=None):
         """
         Process all stock data and find signals based on the given indicator functions.
 
+        With several workers, the sorted symbol list is cut into shards of
+        `chunk_size` symbols that are screened on a process pool; the shards'
+        signals are collected in symbol order and written once, so the output
+        is identical to a sequential run. With the indicator cache enabled,
+        indicators whose bars and configuration are unchanged since a previous
+        run are not recomputed; hits and misses are reported at the end.
+
+        With `lookback_days`, only signals from the last `lookback_days` days
+        are emitted, and only the bars needed to produce them are loaded: the
+        window plus the longest indicator `warmup()`. Warm-up bars include a
+        convergence margin (see SCREEN_WARMUP_TOLERANCE) so the recursive
+        indicators settle on the values a full-history run computes; it is
+        capped at the history a fresh download of PERIOD holds. Plain indicator
+        functions have no known warm-up; with one of them, full series are
+        loaded and only the output is restricted to the window.
+
         Parameters:
             indicators (list): List of indicator functions to apply to the stock data.
-            output_file (str): File path to save the signals.
+            output_file (str or SignalStore): CSV file to append the signals to, or a signal store.
+            symbols (list): Optional subset of symbols to screen (default: all stored symbols).
+            start: Optional first bar to load (pushed down to consolidated stores).
+            end: Optional last bar to load.
+            workers (int): Number of worker processes (1 = sequential).
+            chunk_size (int): Number of symbols per shard.
+            lookback_days (int): Optional signal window in days, counted back from now (excludes start/end).
+
+        Returns:
+            pd.DataFrame: The signals written (Datetime, symbol, signal type).
         """
-        all_signals = []
+        if lookback_days is not None and (start is not None or end is not None):
+            raise ValueError("lookback_days cannot be combined with start or end.")
+        warmup, since = self.window(indicators, lookback_days)
 
-        for file_name in os.listdir(self.stock_dir):
-            if file_name.endswith(".csv"):
-                stock_symbol = os.path.splitext(file_name)[0]
-                file_path = os.path.join(self.stock_dir, file_name)
+        with metrics.stage('screen') as stage:
+            marks = self._marks()
+            symbols = self.store.symbols() if symbols is None else sorted(symbols)
+
+            if workers > 1 and len(symbols) > chunk_size:
+                shards = [symbols[i:i + chunk_size] for i in range(0, len(symbols), chunk_size)]
+                all_signals = []
+                with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as executor:
+                    # map() yields results in submission order, keeping the output deterministic
+                    screen = partial(
+                        _screen_shard, self.stock_dir, self.backend, self.use_cache, indicators,
+                        start=start, end=end, warmup=warmup, since=since, interval=self.interval
+                    )
+                    for shard_signals, (hits, misses), timings, bytes_read in executor.map(screen, shards):
+                        all_signals.extend(shard_signals)
+                        self.timings.extend(timings)
+                        self.store.bytes_read += bytes_read
+                        if self.cache:
+                            self.cache.hits += hits
+                            self.cache.misses += misses
+            else:
+                all_signals = self._screen_symbols(
+                    indicators, self._load_bars(symbols, start, end, warmup, since), since
+                )
+
+            signals = self.save_signals(all_signals, output_file)
+            self._record(stage, marks)
+        if self.cache:
+            print(self.cache.report())
+        return signals
+
+    def _marks(self):
+        """Current (timings, bytes read) positions, to attribute what follows to a run-report stage."""
+        return len(self.timings), self.store.bytes_read
+
+    def _record(self, stage, marks):
+        """Add the symbols screened and the bytes read since `marks` to a run-report stage."""
+        timings_from, read_from = marks
+        for symbol, seconds in self.timings[timings_from:]:
+            stage.add_timing(symbol, seconds)
+        stage.items += len(self.timings) - timings_from
+        stage.bytes_read += self.store.bytes_read - read_from
+
+    def window(self, indicators, lookback_days):
+        """
+        (warm-up bars, window start) for a lookback in days, or (None, None) without one.
+
+        The warm-up is capped at the bars of a PERIOD download: signals then
+        match a run over freshly downloaded history, even when the store has
+        accumulated more (older bars have no weight left anyway).
+        """
+        if lookback_days is None:
+            return None, None
+        warmup = self.warmup(indicators, self.interval)
+        history = stock_resample.period_bars(config.PERIOD, self.interval)
+        if warmup is not None and history is not None:
+            warmup = min(warmup, history)
+        # Same cutoff as StockFilter
+        return warmup, pd.Timestamp(datetime.now() - timedelta(days=lookback_days))
+
+    def screen_symbol(self, indicators, symbol, bars, window=(None, None)):
+        """
+        Screen one symbol's in-memory bars (a stage of the streaming pipeline).
+
+        Parameters:
+            indicators (list): List of indicator functions.
+            symbol (str): Symbol of the bars.
+            bars (pd.DataFrame): Bars with a datetime index.
+            window (tuple): (warm-up, window start) from `window`, or (None, None) for all signals.
+
+        Returns:
+            list: Signal DataFrames (Datetime, symbol, signal type).
+        """
+        warmup, since = window
+        if since is not None:
+            return self._screen_symbols(indicators, self._tails([(symbol, bars)], warmup, since), since)
+        return self._screen_symbols(indicators, [(symbol, bars)])
+
+    @staticmethod
+    def _tails(bars_by_symbol, warmup, since):
+        """In-memory counterpart of `BarStore.iter_tail` (full series when the warm-up is unknown)."""
+        for symbol, bars in bars_by_symbol:
+            tail = tail_bars(bars, len(bars) if warmup is None else warmup, since)
+            if tail is not None:
+                yield symbol, tail
+
+    @staticmethod
+    def warmup(indicators, interval=None):
+        """
+        Longest warm-up of the indicators in bars of `interval` (default INTERVAL), or None if one of them doesn't declare it.
+
+        The warm-up of an indicator on a higher timeframe is converted to
+        stored bars, plus one resampled bar since the first one loaded may be partial.
+        """
+        interval = interval or config.INTERVAL
+        warmups = []
+        for indicator in indicators:
+            indicator_class = StockIndicator.native_class(indicator)
+            try:
+                warmup = indicator_class.warmup()
+            except (AttributeError, NotImplementedError):
+                return None
+            timeframe = StockScreener.timeframe(indicator_class, interval)
+            if timeframe is not None:
+                warmup = (warmup + 1) * stock_resample.bars_per(timeframe, interval)
+            warmups.append(warmup)
+        return max(warmups, default=0)
+
+    @staticmethod
+    def timeframe(indicator_class, interval=None):
+        """Timeframe an indicator class runs on when it is coarser than `interval` (default INTERVAL), else None."""
+        timeframe = indicator_class.timeframe() if indicator_class is not None else None
+        if timeframe is None or not stock_resample.is_coarser(timeframe, interval or config.INTERVAL):
+            return None
+        return timeframe
+
+    def _load_bars(self, symbols, start, end, warmup, since):
+        """Bars to screen: the tail after `since` plus `warmup` bars, or the start/end window."""
+        if since is not None and warmup is not None:
+            return self.store.iter_tail(symbols=symbols, bars=warmup, since=since)
+        return self.store.iter_bars(symbols=symbols, start=start, end=end)
+
+    def _screen_symbols(self, indicators, bars_by_symbol, since=None):
+        """
+        Apply the indicator functions to each symbol's bars.
+
+        Parameters:
+            indicators (list): List of indicator functions.
+            bars_by_symbol (iterable): (symbol, bars) pairs as yielded by `BarStore.iter_bars`.
+            since (pd.Timestamp): Optional start of the signal window; earlier signals are dropped.
+
+        Returns:
+            list: Signal DataFrames (Datetime, symbol, signal type), in input order.
+        """
+        all_signals = []
+        native_classes = [StockIndicator.native_class(indicator) for indicator in indicators]
+        timeframes = [self.timeframe(indicator_class, self.interval) for indicator_class in native_classes]
 
-                # Load stock data
-                data = pd.read_csv(file_path)
-                if 'Datetime' not in data.columns:
-                    raise ValueError(f"The file {file_name} must contain a 'Datetime' column.")
-                data['Datetime'] = pd.to_datetime(data['Datetime'])
+        for stock_symbol, bars in bars_by_symbol:
+            started = time.perf_counter()
+            datetimes = bars.index.to_numpy()
+            close = bars['Close'].to_numpy(dtype='float64')
+            fingerprint = bars_fingerprint(bars) if self.cache else None
+            # EMAs, MACD, RSI, ... computed once for this symbol and shared by the indicators
+            intermediates = Intermediates(close)
+            resampled = {}  # Timeframe: (signal times, closes, intermediates), built on first use
+            data = None  # DataFrame for plain indicator functions, built on first use
 
-                for indicator in indicators:
-                    # Apply the indicator function
-                    result = indicator(data)
+            for indicator, indicator_class, timeframe in zip(indicators, native_classes, timeframes):
+                key = self._cache_key(stock_symbol, fingerprint, indicator)
+                signal_dates = self.cache.get(key) if key else None
 
-                    # Handle the result as a tuple
-                    if isinstance(result, tuple):
-                        data = result[0]  # Extract the modified DataFrame
+                if signal_dates is None:
+                    if indicator_class is not None and timeframe is not None:
+                        # Higher timeframe: signals are known when the last bar of the resampled bar is
+                        if timeframe not in resampled:
+                            frame, ends = self.resampler.get(stock_symbol, bars, timeframe)
+                            frame_close = frame['Close'].to_numpy(dtype='float64')
+                            resampled[timeframe] = ends.to_numpy(), frame_close, Intermediates(frame_close)
+                        ends, frame_close, frame_intermediates = resampled[timeframe]
+                        buy_signal, _ = indicator_class.compute(frame_close, frame_intermediates)
+                        signal_dates = ends[buy_signal]
+                    elif indicator_class is not None:
+                        # StockIndicator: index the bar dates with the signal mask directly
+                        buy_signal, _ = indicator_class.compute(close, intermediates)
+                        signal_dates = datetimes[buy_signal]
                     else:
-                        data = result  # Use result directly if it's not a tuple
+                        # Plain function using the legacy DataFrame contract
+                        if data is None:
+                            data = bars.reset_index()  # Use 'Datetime' as a regular column
+                        result = indicator(data)
+
+                        # Handle the result as a tuple
+                        if isinstance(result, tuple):
+                            data = result[0]  # Extract the modified DataFrame
+                        else:
+                            data = result  # Use result directly if it's not a tuple
+
+                        # Check for buy signals
+                        if 'Buy Signal' not in data.columns:
+                            continue
+                        signal_dates = data.loc[data['Buy Signal'], 'Datetime'].to_numpy()
+                    if key:
+                        self.cache.put(key, signal_dates)
+
+                if since is not None:
+                    signal_dates = signal_dates[signal_dates >= since.to_datetime64()]
+
+                # Add indicator name to signal type
+                all_signals.append(pd.DataFrame({
+                    'Datetime': signal_dates,
+                    'symbol': stock_symbol,
+                    'signal type': self.signal_type(indicator),
+                }))
+
+            self.timings.append((stock_symbol, time.perf_counter() - started))
+
+        return all_signals
+
+    def _cache_key(self, stock_symbol, fingerprint, indicator):
+        """Cache key for an indicator on a symbol's bars, or None if the result can't be cached."""
+        if not self.cache:
+            return None
+        try:
+            indicator_class = StockIndicator.resolve(indicator)
+            params = indicator_class.params()
+        except (ValueError, NotImplementedError):
+            return None  # Not a configured StockIndicator: always compute
+        return IndicatorCache.key(stock_symbol, fingerprint, indicator_class.__name__, params)
+
+    def screen_incremental(self, indicators, output_file, state_file=None, symbols=None):
+        """
+        Screen only the bars added since the previous run, using persisted indicator state.
+
+        Each indicator's streaming state (EMA values, average gain/loss, last
+        MACD/signal, ...) is saved per symbol after the run and fed only the
+        newer bars next time, which gives the same signals as recomputing over
+        the full history. A symbol is replayed from its first bar when it has
+        no state, when an indicator's configuration changed, or when the last
+        bar fed was revised or is no longer stored.
+
+        Only the bars from each symbol's saved last bar on are read (that bar
+        included, to check it wasn't revised); the full history is read only
+        for such a replay and for indicators on a higher timeframe.
+
+        Parameters:
+            indicators (list): Indicator functions whose classes implement `update`.
+            output_file (str or SignalStore): CSV file or signal store receiving the signals found on the new bars.
+            state_file (str): State file; defaults to INDICATOR_STATE_FILE.
+            symbols (list): Optional subset of symbols to screen.
+        """
+        state_store = IndicatorStateStore(state_file or config.INDICATOR_STATE_FILE)
+        states = state_store.load()
+        all_signals = self.update_states(indicators, self._incremental_bars(symbols, states), states,
+                                         history=self.store.read)
+        state_store.save(states)
+        return self.save_signals(all_signals, output_file)
+
+    def _incremental_bars(self, symbols, states):
+        """
+        (symbol, bars) pairs for `update_states`: each series from the last bar of its saved state on.
+
+        Symbols are read in one pass per saved last bar (usually the same for
+        all of them). Symbols without state, or without any bar from their
+        saved last bar on, are read in full.
+        """
+        symbols = self.store.symbols() if symbols is None else symbols
+        by_last, full = {}, []
+        for symbol in symbols:
+            entry = states.get(symbol)
+            if entry is None:
+                full.append(symbol)
+            else:
+                by_last.setdefault(entry['last'], []).append(symbol)
+
+        for last, group in by_last.items():
+            found = set()
+            for symbol, bars in self.store.iter_bars(symbols=group, start=last):
+                found.add(symbol)
+                yield symbol, bars
+            full.extend(symbol for symbol in group if symbol not in found)
+        if full:
+            yield from self.store.iter_bars(symbols=full)
+
+    def update_states(self, indicators, bars_by_symbol, states, stage='screen', history=None):
+        """
+        Feed the bars added to each series since its state was saved to the streaming indicator state.
+
+        The building block of `screen_incremental`, for callers that hold the
+        series in memory (the daemon). A symbol whose last bar is the one its
+        state was saved at, with the same close, is skipped; one whose history
+        changed under its state is replayed. Bars should be closed: a bar still
+        forming changes its close on every call, which forces a replay.
+
+        Parameters:
+            indicators (list): Indicator functions whose classes implement `update`.
+            bars_by_symbol (iterable): (symbol, bars) pairs, each the symbol's full series, or
+                with `history` the series from the last bar of its state on.
+            states (dict): Indicator state per symbol (see IndicatorStateStore), updated in place.
+            stage (str): Run-report stage the symbols screened are recorded in.
+            history (callable): Returns a symbol's full series, read when a symbol given by its
+                tail is replayed or screened on a higher timeframe.
+
+        Returns:
+            list: Signal DataFrames (Datetime, symbol, signal type) found on the new bars.
+        """
+        indicator_classes = [StockIndicator.resolve(indicator) for indicator in indicators]
+        params = {indicator_class.__name__: indicator_class.params() for indicator_class in indicator_classes}
+        all_signals = []
+        with metrics.stage(stage) as run_stage:
+            marks = self._marks()
+            for stock_symbol, bars in bars_by_symbol:
+                entry = states.get(stock_symbol)
+                if (entry is not None and entry['last'] == bars.index[-1].isoformat()
+                        and entry['last_close'] == float(bars['Close'].iloc[-1])
+                        and all((entry['indicators'].get(name) or {}).get('params') == value
+                                for name, value in params.items())):
+                    continue  # No new bar since the state was saved
+                started = time.perf_counter()
+                self._update_symbol(indicators, indicator_classes, states, stock_symbol, bars, all_signals, history)
+                self.timings.append((stock_symbol, time.perf_counter() - started))
+            self._record(run_stage, marks)
+        return all_signals
+
+    def _update_symbol(self, indicators, indicator_classes, states, stock_symbol, bars, all_signals, history=None):
+        """Feed one symbol's new bars to its saved indicator states (see `screen_incremental`)."""
+        entry = states.get(stock_symbol)
+        full = bars
+        if entry is not None:
+            last = pd.Timestamp(entry['last'])
+            if history is not None and bars.index[0] >= last:
+                full = None  # Only the tail was read: the full series is read if needed
 
-                    # Check for buy signals and add indicator name to signal type
-                    for signal_col in [col for col in data.columns if col == 'Buy Signal']:
-                        signals = data.loc[data[signal_col], ['Datetime']].copy()
-                        signals['symbol'] = stock_symbol
-                        signals['signal type'] = indicator.__name__.replace('calculate_', '').upper()
-                        all_signals.append(signals)
+        def full_bars():
+            nonlocal full
+            if full is None:
+                full = history(stock_symbol)
+            return full
 
+        if entry is not None and (last not in bars.index or bars.at[last, 'Close'] != entry['last_close']):
+            entry = None  # History changed under the saved state
+        if entry is None:
+            entry = {'indicators': {}}
+            new_bars = full_bars()
+        else:
+            new_bars = bars[bars.index > last]
+
+        for indicator, indicator_class in zip(indicators, indicator_classes):
+            name = indicator_class.__name__
+            state = entry['indicators'].get(name)
+            timeframe = self.timeframe(indicator_class, self.interval)
+            if timeframe is not None:
+                entry['indicators'][name] = self._update_resampled(
+                    indicator, indicator_class, timeframe, state, stock_symbol, full_bars(), new_bars, all_signals
+                )
+                continue
+            feed = new_bars
+            if state is None or state.get('params') != indicator_class.params():
+                # New or reconfigured indicator: replay the whole history
+                state = dict(indicator_class.initial_state(), params=indicator_class.params())
+                feed = full_bars()
+
+            flags = np.asarray(indicator_class.update(state, feed['Close'].tolist()), dtype=bool)
+            entry['indicators'][name] = state
+            if flags.any():
+                all_signals.append(pd.DataFrame({
+                    'Datetime': feed.index[flags],
+                    'symbol': stock_symbol,
+                    'signal type': self.signal_type(indicator),
+                }))
+
+        entry['last'] = bars.index[-1].isoformat()
+        entry['last_close'] = float(bars['Close'].iloc[-1])
+        states[stock_symbol] = entry
+
+    def _update_resampled(self, indicator, indicator_class, timeframe, state, stock_symbol, bars, new_bars,
+                          all_signals):
+        """
+        Incremental screening of an indicator on a higher timeframe.
+
+        A resampled bar changes with every new bar of the period, so there is
+        no streaming state: the indicator is recomputed on the resampled
+        history and the signals known since the last run are reported. A bar
+        still forming is reported the first time it signals, at the time it
+        did; the state remembers it so it is not reported again.
+
+        Returns:
+            dict: The indicator's new state.
+        """
+        if state is None or state.get('params') != indicator_class.params():
+            new_bars = bars  # New or reconfigured indicator: report the whole history
+            state = {'params': indicator_class.params(), 'reported': None}
+        if new_bars.empty:
+            return state
+
+        frame, ends = self.resampler.get(stock_symbol, bars, timeframe)
+        buy_signal, _ = indicator_class.compute(frame['Close'].to_numpy(dtype='float64'))
+        buy_signal &= ends >= new_bars.index[0]  # Known only since the last run
+        if state['reported'] is not None:
+            buy_signal &= frame.index > pd.Timestamp(state['reported'])
+        if buy_signal.any():
+            all_signals.append(pd.DataFrame({
+                'Datetime': ends[buy_signal],
+                'symbol': stock_symbol,
+                'signal type': self.signal_type(indicator),
+            }))
+            state['reported'] = frame.index[buy_signal][-1].isoformat()
+        return state
+
+    def screen_panel(self, indicators, output_file, symbols=None, start=None, end=None):
+        """
+        Vectorized variant of `screen_by_indicators`.
+
+        Loads every symbol's closes into one (bars x symbols) array and computes
+        each indicator for all symbols in a single pass, using the indicator
+        classes' `calculate_panel`. Produces the same rows, in the same order,
+        as `screen_by_indicators`.
+
+        Parameters:
+            indicators (list): Indicator functions (e.g., `StockIndicators.calculate_macd`).
+            output_file (str or SignalStore): CSV file to append the signals to, or a signal store.
+            symbols (list): Optional subset of symbols to screen (default: all stored symbols).
+            start: Optional first bar to load.
+            end: Optional last bar to load.
+        """
+        with metrics.stage('screen') as stage:
+            read_from = self.store.bytes_read
+            panel = PricePanel.from_store(self.store, symbols=symbols, start=start, end=end)
+            intermediates = Intermediates(panel.close, PANEL_KERNELS)  # Shared across the indicators
+
+            all_signals = []
+            for rank, indicator in enumerate(indicators):
+                started = time.perf_counter()
+                indicator_class = StockIndicator.resolve(indicator)
+                if self.timeframe(indicator_class, self.interval) is not None:
+                    # Resampled bars differ per symbol: screen them one symbol at a time
+                    timings_from = len(self.timings)
+                    frames = self._screen_symbols(
+                        [indicator], self.store.iter_bars(symbols=panel.symbols, start=start, end=end)
+                    )
+                    del self.timings[timings_from:]  # Reported per indicator below
+                    signals = (pd.concat(frames, ignore_index=True) if frames
+                               else pd.DataFrame(columns=['Datetime', 'symbol', 'signal type']))
+                else:
+                    mask = indicator_class.calculate_panel(panel.close, intermediates)
+                    signals = panel.signal_rows(mask, self.signal_type(indicator))
+                signals['rank'] = rank
+                all_signals.append(signals)
+                stage.add_timing(self.signal_type(indicator), time.perf_counter() - started)  # Per indicator, not per symbol
+
+            if all_signals:
+                # Per-file order: symbol, then indicator, then bar (stable sorts keep the bar order)
+                combined = pd.concat(all_signals, ignore_index=True)
+                combined = combined.sort_values(['symbol', 'rank'], kind='stable').drop(columns='rank')
+                all_signals = [combined] if not combined.empty else []
+
+            signals = self.save_signals(all_signals, output_file)
+            stage.items = len(panel.symbols)
+            stage.bytes_read = self.store.bytes_read - read_from
+        return signals
+
+    @staticmethod
+    def signal_type(indicator):
+        """Label written to the 'signal type' column for an indicator function."""
+        return indicator.__name__.replace('calculate_', '').upper()
+
+    @staticmethod
+    def save_signals(all_signals, output_file):
+        """
+        Append the collected signal frames to the output file, or upsert them into a SignalStore.
+
+        :param output_file: CSV path, SignalStore, or None to only combine the frames.
+        :return: The combined signals DataFrame.
+        """
         if all_signals:
             # Combine all signals into a single DataFrame
             combined_signals = pd.concat(all_signals, ignore_index=True)
 
+            if output_file is None:
+                return combined_signals
+
+            if isinstance(output_file, SignalStore):
+                # Rows already stored (e.g. from a re-run) are skipped
+                new_rows = output_file.upsert(combined_signals)
+                print(f"Signals upserted into {output_file} ({new_rows} new)")
+                return combined_signals
+
             # Save to the output file, appending if it exists
             combined_signals.to_csv(
                 output_file,
@@ -235,8 +1049,10 @@ class StockScreener:
                 columns=['Datetime', 'symbol', 'signal type']  # Ensure proper column order
             )
             print(f"Signals appended to {output_file}")
-        else:
-            print("No signals detected.")
+            return combined_signals
+
+        print("No signals detected.")
+        return pd.DataFrame(columns=['Datetime', 'symbol', 'signal type'])
 
 
 # Main Execution
@@ -0,0 +1,106 @@
+import numpy as np
+import talib
+import stock_panel
+
+# Named intermediate results shared by the indicators.
+#
+# An intermediate is identified by a spec tuple (kind, *params):
+#   ('ema', period, depth)   EMA of Close (depth 1), EMA of that EMA (depth 2), ...
+#   ('macd', fast, slow, signal)   (macd, signal, histogram) as talib.MACD computes
+#                            them: the ('ema', slow, 1) node minus a fast EMA seeded on
+#                            the slow EMA's first bar, and the EMA of that line
+#   ('rsi', period)          Wilder's RSI of Close
+# Indicators declare the specs they read in `requires()`; an `Intermediates`
+# object computes each spec at most once for the closes it wraps, and composite
+# specs reuse the EMA nodes they really contain, so indicators reading the same
+# EMA (e.g. a MACD and a TEMA of its slow length, or two MACDs sharing a slow
+# length) over the same symbol pay for one pass only. The fast EMA of a MACD is
+# not the ('ema', fast, 1) node: talib.MACD seeds it later, on the slow EMA's bar.
+
+# Parameters of each intermediate kind, used to validate declarations
+INTERMEDIATE_PARAMS = {
+    'ema': ('period', 'depth'),
+    'macd': ('fast_length', 'slow_length', 'signal_length'),
+    'rsi': ('period',),
+}
+
+
+
+def ema_from(values, period, seed_offset):
+    """
+    talib.EMA of a series seeded `seed_offset` values after its first valid one
+    (instead of `period - 1`), as talib.MACD seeds its fast EMA on the slow EMA's bar.
+    """
+    out = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid):
+        start = valid[0] + seed_offset - period + 1
+        out[start:] = talib.EMA(values[start:], timeperiod=period)
+    return out
+
+
+# Kernels for a single symbol's closes (np.ndarray); 'macd' is composed from EMAs
+SERIES_KERNELS = {
+    'ema': lambda values, period: talib.EMA(values, timeperiod=period),
+    'ema_from': ema_from,
+    'rsi': lambda close, period: talib.RSI(close, timeperiod=period),
+}
+
+# Kernels for a (bars x symbols) close array, see stock_panel
+PANEL_KERNELS = {
+    'ema': stock_panel.ema,
+    'ema_from': stock_panel.ema_from,
+    'rsi': stock_panel.rsi,
+}
+
+
+def validate_spec(spec):
+    """
+    Check that a spec names a known intermediate with the right number of parameters.
+
+    :raises TypeError: If the spec is malformed.
+    """
+    if not isinstance(spec, tuple) or not spec or spec[0] not in INTERMEDIATE_PARAMS:
+        raise TypeError(f"Unknown intermediate {spec!r}; expected one of {sorted(INTERMEDIATE_PARAMS)}.")
+    params = INTERMEDIATE_PARAMS[spec[0]]
+    if len(spec) - 1 != len(params):
+        raise TypeError(f"Intermediate {spec!r} takes parameters {params}.")
+    if spec[0] == 'ema' and spec[2] < 1:
+        raise TypeError(f"Intermediate {spec!r} must have a depth of at least 1.")
+
+
+class Intermediates:
+    """
+    Memoized intermediates over one set of closes.
+
+    Attributes:
+        close: Closing prices (pd.Series for one symbol, np.ndarray for a panel).
+        kernels (dict): Functions computing each intermediate kind.
+        values (dict): Computed intermediates, keyed by spec.
+    """
+
+    def __init__(self, close, kernels=SERIES_KERNELS):
+        self.close = close
+        self.kernels = kernels
+        self.values = {}
+
+    def get(self, spec):
+        """Return the intermediate for a spec, computing it (and what it builds on) on first use."""
+        if spec not in self.values:
+            kind, *params = spec
+            if kind == 'ema':
+                # Chained EMAs reuse the shallower ones
+                period, depth = params
+                source = self.close if depth == 1 else self.get(('ema', period, depth - 1))
+                self.values[spec] = self.kernels['ema'](source, period)
+            elif kind == 'macd':
+                # The slow EMA is the shared node; the signal EMA skips the line's leading NaNs
+                fast_length, slow_length, signal_length = params
+                fast = self.kernels['ema_from'](self.close, fast_length, slow_length - 1)
+                line = fast - self.get(('ema', slow_length, 1))
+                signal = self.kernels['ema'](line, signal_length)
+                line = np.where(np.isnan(signal), np.nan, line)  # Both start on the signal's first bar
+                self.values[spec] = (line, signal, line - signal)
+            else:
+                self.values[spec] = self.kernels[kind](self.close, *params)
+        return self.values[spec]
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import logging
+import logging.handlers
+import statistics
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+import config  # Import only the config file, no other project modules
+
+try:
+    import resource  # Unix only; peak RSS is omitted elsewhere
+except ImportError:
+    resource = None
+
+# Lightweight run instrumentation.
+#
+# Each pipeline stage is wrapped in `metrics.stage(name)`, which records its
+# wall time and the peak RSS at its end; the stage adds item counts, bytes
+# read/written and per-item durations. `metrics.save()` writes everything as
+# a JSON run report next to LOG_FILE.
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of its finished children, in MB (None if unknown)."""
+    if resource is None:
+        return None, None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    unit = 1024 * 1024 if os.uname().sysname == 'Darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit
+    return round(own, 1), round(children, 1)
+
+
+class StageMetrics:
+    """
+    Measurements of one run of a pipeline stage.
+
+    Attributes:
+        items (int): Symbols (or signals, messages) the stage processed.
+        bytes_read (int): Bytes loaded from storage.
+        bytes_written (int): Bytes written to storage.
+        timings (list): (item, seconds) of individually timed items.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.timings = []
+        self.wall = 0.0
+        self.peak_rss_mb = None
+        self.children_peak_rss_mb = None
+        self.lock = threading.Lock()
+
+    def add_timing(self, item, seconds):
+        """Record how long one item took (thread-safe)."""
+        with self.lock:
+            self.timings.append((item, seconds))
+
+    def slow_items(self):
+        """Items slower than METRICS_SLOW_FACTOR times the median, slowest first."""
+        if len(self.timings) < 2:
+            return []
+        median = statistics.median(seconds for _, seconds in self.timings)
+        slow = [(item, seconds) for item, seconds in self.timings if seconds > median * config.METRICS_SLOW_FACTOR]
+        slow.sort(key=lambda timing: timing[1], reverse=True)
+        return [{'item': str(item), 'seconds': round(seconds, 4)} for item, seconds in slow[:config.METRICS_SLOW_OUTLIERS]]
+
+    def to_dict(self):
+        timings = [seconds for _, seconds in self.timings]
+        return {
+            'name': self.name,
+            'wall_s': round(self.wall, 4),
+            'items': self.items,
+            'items_per_s': round(self.items / self.wall, 2) if self.wall > 0 else None,
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'peak_rss_mb': self.peak_rss_mb,
+            'children_peak_rss_mb': self.children_peak_rss_mb,
+            'median_item_s': round(statistics.median(timings), 4) if timings else None,
+            'slow_items': self.slow_items(),
+        }
+
+
+class RunMetrics:
+    """Collects the StageMetrics of a run and writes the run report."""
+
+    def __init__(self):
+        self.started = datetime.now()
+        self.stages = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time a stage; yields its StageMetrics for the caller to fill in.
+
+        Example:
+            with metrics.stage('prep') as stage:
+                stage.items += 1
+        """
+        stage = StageMetrics(name)
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.wall = time.perf_counter() - start
+            stage.peak_rss_mb, stage.children_peak_rss_mb = peak_rss_mb()
+            with self.lock:
+                self.stages.append(stage)
+
+    def report(self):
+        """The run report as a dict."""
+        own, children = peak_rss_mb()
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            'wall_s': round((datetime.now() - self.started).total_seconds(), 4),
+            'peak_rss_mb': own,
+            'children_peak_rss_mb': children,
+            'stages': [stage.to_dict() for stage in self.stages],
+        }
+
+    def save(self, file_path=None):
+        """
+        Write the run report as JSON, by default next to LOG_FILE.
+
+        :return: Path of the report.
+        """
+        file_path = file_path or os.path.splitext(config.LOG_FILE)[0] + '_report.json'
+        with open(file_path, 'w') as f:
+            json.dump(self.report(), f, indent=1)
+        return file_path
+
+    def reset(self):
+        """Start a new report (the daemon writes one per cycle instead of accumulating stages)."""
+        with self.lock:
+            self.started = datetime.now()
+            self.stages = []
+
+
+# Report of the current run, shared by the pipeline classes
+metrics = RunMetrics()
+
+_loggers = {}
+
+
+def get_file_logger(file_path=None):
+    """
+    Logger writing plain messages to `file_path` (default: LOG_FILE) through a buffer.
+
+    Records are held in a MemoryHandler and written in blocks of
+    METRICS_LOG_BUFFER lines (immediately for errors, and at exit), so the
+    file is opened once instead of once per message.
+    """
+    file_path = file_path or config.LOG_FILE
+    if file_path not in _loggers:
+        logger = logging.getLogger(f"stocktools.{file_path}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False  # File only, as before
+        target = logging.FileHandler(file_path, delay=True)
+        target.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(logging.handlers.MemoryHandler(
+            config.METRICS_LOG_BUFFER, flushLevel=logging.ERROR, target=target
+        ))
+        _loggers[file_path] = logger
+    return _loggers[file_path]
+
+
+def flush_logs():
+    """Write out buffered log lines (e.g., before reading the log file)."""
+    for logger in _loggers.values():
+        for handler in logger.handlers:
+            handler.flush()
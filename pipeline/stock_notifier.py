@@ -1,10 +1,158 @@
 import os
+import re
+import time
+import bisect
 import asyncio
 import logging
-from telegram.ext import ApplicationBuilder
+import itertools
+import contextlib
+from datetime import timedelta
+import pandas as pd
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+import config
+from stock_metrics import metrics
+
+
+def message_length(text):
+    """Length of a text as the Bot API counts it (UTF-16 code units)."""
+    return len(text.encode('utf-16-le')) // 2
+
+
+# Legacy Markdown (parse_mode "Markdown"): entity delimiters, links and escapes
+MARKDOWN_ENTITIES = '*_`'
+MARKDOWN_ESCAPED = ('_', '*', '`', '[')
+MARKDOWN_LINK = re.compile(r'\[[^\]\n]*\]\([^)\n]*\)')
+
+
+def _cut_points(line, markdown):
+    """
+    Positions a line can be cut at without breaking its Markdown.
+
+    Escape sequences and links are never cut, nor an entity right after it opens
+    or right before it closes; an entity cut elsewhere must be closed before the
+    cut and reopened after it.
+
+    :return: List of (position, delimiter of the entity open there or '', whether the cut follows whitespace).
+    """
+    points, entity, opened, i = [], '', 0, 0
+    while i < len(line):
+        empty = entity and (i == opened or line.startswith(entity, i))  # The cut would leave an empty entity
+        if i and not empty:
+            points.append((i, entity, line[i - 1].isspace()))
+        if not markdown:
+            i += 1
+        elif entity in ('`', '```'):
+            # Code: nothing is parsed until the closing delimiter
+            if line.startswith(entity, i):
+                i, entity = i + len(entity), ''
+            else:
+                i += 1
+        elif line[i] == '\\' and line[i + 1:i + 2] in MARKDOWN_ESCAPED:
+            i += 2
+        elif entity and line.startswith(entity, i):
+            i, entity = i + 1, ''
+        elif not entity and line[i] in MARKDOWN_ENTITIES:
+            entity = '```' if line.startswith('```', i) else line[i]
+            i += len(entity)
+            opened = i
+        elif not entity and line[i] == '[' and (link := MARKDOWN_LINK.match(line, i)):
+            i = link.end()
+        else:
+            i += 1
+    return points
+
+
+def _split_line(line, limit, markdown):
+    """
+    Cut a line longer than `limit` into pieces that fit, at whitespace outside
+    entities where possible, else at whitespace (or anywhere) inside one, closing
+    the entity at the end of the piece and reopening it at the start of the next.
+    """
+    # UTF-16 length of line[:k] for every k
+    offsets = [0, *itertools.accumulate(2 if ord(char) > 0xFFFF else 1 for char in line)]
+    points = _cut_points(line, markdown)
+    pieces, start, reopen = [], 0, ''
+    while len(reopen) + offsets[-1] - offsets[start] > limit:
+        budget = limit - len(reopen) + offsets[start]
+        fitting = [point for point in points if start < point[0] and offsets[point[0]] + len(point[1]) <= budget]
+        best = (next((point for point in reversed(fitting) if point[2] and not point[1]), None)
+                or next((point for point in reversed(fitting) if point[2]), None)
+                or (fitting[-1] if fitting else None))
+        if best is None:
+            # A link or code span longer than a whole message: cut it anyway
+            position = max(start + 1, bisect.bisect_right(offsets, budget) - 1)
+            best = (position, '', False)
+        position, entity, _ = best
+        pieces.append(reopen + line[start:position] + entity)
+        start, reopen = position, entity
+    pieces.append(reopen + line[start:])
+    return pieces
+
+
+def split_message(text, limit=None, parse_mode="Markdown"):
+    """
+    Split a text into messages of at most `limit` UTF-16 code units.
+
+    Splits happen on line boundaries, so a formatted signal line (and its
+    Markdown entities) is never cut in two; a single line longer than a whole
+    message is cut at whitespace, and never inside an escape sequence or a
+    link (see `_split_line`).
+
+    :param text: Message text.
+    :param limit: Maximum message length; defaults to TELEGRAM_MAX_MESSAGE_LENGTH.
+    :param parse_mode: Telegram parse mode of the text; entities are kept intact for "Markdown".
+    :return: List of message texts.
+    """
+    limit = limit or config.TELEGRAM_MAX_MESSAGE_LENGTH
+    if message_length(text) <= limit:
+        return [text]
+
+    chunks, current, current_length = [], '', 0
+    for line in text.splitlines(keepends=True):
+        if message_length(line) > limit:
+            if current:
+                chunks.append(current)
+            *pieces, current = _split_line(line, limit, parse_mode == "Markdown")
+            chunks.extend(pieces)
+            current_length = message_length(current)
+            continue
+        length = message_length(line)
+        if current_length + length > limit:
+            chunks.append(current)
+            current, current_length = '', 0
+        current += line
+        current_length += length
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# Sends scheduled on an already running event loop, referenced until they complete
+_background_tasks = set()
+
+
+def _running_loop():
+    """The event loop running in this thread, or None (get_event_loop() fails once asyncio.run has closed its loop)."""
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
 
 class TelegramNotifier:
-    def __init__(self, token=None, chat_id=None):
+    """
+    Deliver messages to a Telegram chat through the Bot API.
+
+    All messages of a delivery go over one Bot session (a single pooled HTTP
+    connection), paced at TELEGRAM_MESSAGE_INTERVAL. Flood-control replies
+    (HTTP 429) are retried after the delay Telegram asks for, network errors
+    with exponential backoff; texts over the message limit are split first.
+    """
+    # Rejections retrying won't fix: malformed message, bot blocked or removed from the chat
+    PERMANENT_ERRORS = (BadRequest, Forbidden)
+
+    def __init__(self, token=None, chat_id=None, base_url=None):
         # Load token and chat ID from environment variables or arguments
         self.token = token or os.getenv("TELEGRAM_BOT_TOKEN")
         self.chat_id = chat_id or os.getenv("TELEGRAM_CHAT_ID")
@@ -12,34 +160,130 @@ class TelegramNotifier:
         if not self.token or not self.chat_id:
             raise ValueError("Telegram bot token and chat ID must be provided.")
 
-        self.application = ApplicationBuilder().token(self.token).build()
+        # Bot API endpoint, e.g. a local fake server (scripts/fake_bot_api.py) instead of api.telegram.org
+        self.base_url = base_url or os.getenv("TELEGRAM_API_URL") or config.TELEGRAM_API_URL
+        self.bot = Bot(self.token, **({'base_url': self.base_url} if self.base_url else {}))
+        self.next_send = 0.0  # Earliest time.monotonic() for the next message
+        self.sessions = 0  # Batches currently sending over the Bot session
+        self.session_lock = None  # (event loop, asyncio.Lock) guarding its initialize/shutdown
+
+    def _session_lock(self):
+        loop = asyncio.get_running_loop()
+        if self.session_lock is None or self.session_lock[0] is not loop:
+            self.session_lock = (loop, asyncio.Lock())
+        return self.session_lock[1]
+
+    @contextlib.asynccontextmanager
+    async def session(self):
+        """
+        Keep the Bot session (its pooled HTTP connection) open for a batch of sends.
+
+        Concurrent batches, e.g. sends scheduled on a running loop, share the
+        session: the first one opens it and the last one to finish closes it.
+        """
+        async with self._session_lock():
+            if not self.sessions:
+                await self.bot.initialize()
+            self.sessions += 1
+        try:
+            yield self.bot
+        finally:
+            async with self._session_lock():
+                self.sessions -= 1
+                if not self.sessions:
+                    await self.bot.shutdown()
+
+    async def _pace(self):
+        """Wait until the next message is allowed."""
+        delay = self.next_send - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def send_one(self, text, parse_mode="Markdown", chat_id=None):
+        """
+        Send one message with pacing and retries, inside an open session (`async with notifier.session()`).
+
+        :param chat_id: Chat to send to; defaults to the notifier's chat.
+        :return: True if it was delivered, False if it ran out of retries.
+        :raises PERMANENT_ERRORS: The Bot API rejected the message.
+        """
+        for attempt in range(config.TELEGRAM_MAX_RETRIES + 1):
+            await self._pace()
+            try:
+                await self.bot.send_message(chat_id=chat_id or self.chat_id, text=text, parse_mode=parse_mode)
+                self.next_send = time.monotonic() + config.TELEGRAM_MESSAGE_INTERVAL
+                return True
+            except RetryAfter as e:
+                # Flood control: Telegram says how long to wait
+                retry_after = e.retry_after
+                delay = retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+                logging.warning(f"Telegram flood control, retrying in {delay:g}s")
+            except self.PERMANENT_ERRORS as e:
+                # Rejected message (e.g., malformed Markdown, bot blocked): retrying won't help
+                logging.error(f"❌ Telegram rejected the message: {e}")
+                raise
+            except NetworkError as e:
+                delay = config.TELEGRAM_BACKOFF_BASE * 2 ** attempt
+                logging.warning(f"Telegram network error ({e}), retrying in {delay:g}s")
+            self.next_send = time.monotonic() + delay
+
+        logging.error(f"❌ Failed to send message after {config.TELEGRAM_MAX_RETRIES} retries.")
+        return False
+
+    async def async_send_messages(self, texts, parse_mode="Markdown"):
+        """
+        Send several messages in order over one Bot session.
+
+        :return: Number of messages delivered.
+        """
+        sent = 0
+        async with self.session():  # Opens the HTTP session once and closes it after the last message
+            for text in texts:
+                try:
+                    sent += await self.send_one(text, parse_mode)
+                except self.PERMANENT_ERRORS:
+                    pass  # Logged by send_one
+        if sent == len(texts):
+            logging.info(f"✅ {sent} message(s) sent successfully via Telegram.")
+        return sent
 
     async def async_send_message(self, text, parse_mode="Markdown"):
         try:
-            await self.application.bot.send_message(chat_id=self.chat_id, text=text, parse_mode=parse_mode)
-            logging.info("✅ Message sent successfully via Telegram.")
+            return await self.async_send_messages(split_message(text), parse_mode)
         except Exception as e:
             logging.error(f"❌ Failed to send message: {e}")
-        finally:
-            await self.application.shutdown()
+            return 0
 
     def send_message(self, text, parse_mode="Markdown"):
-        try:
-            if asyncio.get_event_loop().is_running():
-                asyncio.create_task(self.async_send_message(text, parse_mode))
-            else:
-                asyncio.run(self.async_send_message(text, parse_mode))
-        except RuntimeError as e:
-            logging.error(f"❌ Runtime error during message send: {e}")
-        except Exception as e:
-            logging.error(f"❌ Unexpected error during Telegram message send: {e}")
+        """
+        Send a text, split into as many messages as the length limit requires.
+
+        :return: True if every message was delivered (None when scheduled on a running event loop).
+        """
+        chunks = split_message(text)
+        with metrics.stage('notify') as stage:
+            stage.items = len(chunks)
+            stage.bytes_written = len(text.encode('utf-8'))  # Message payload
+            try:
+                if _running_loop() is not None:
+                    # The loop only keeps a weak reference to tasks: hold one until it is done
+                    task = asyncio.create_task(self.async_send_messages(chunks, parse_mode))
+                    _background_tasks.add(task)
+                    task.add_done_callback(_background_tasks.discard)
+                    return None
+                return asyncio.run(self.async_send_messages(chunks, parse_mode)) == len(chunks)
+            except RuntimeError as e:
+                logging.error(f"❌ Runtime error during message send: {e}")
+            except Exception as e:
+                logging.error(f"❌ Unexpected error during Telegram message send: {e}")
+            return False
 
     @staticmethod
     def format_signals(data):
         """
         Format stock signals for messaging.
         :param data: DataFrame containing stock symbols and their signal dates.
-        :return: Formatted string message for Telegram.
+        :return: Formatted string message for Telegram (split by `send_message` if too long).
         """
         if data.empty:
             return "🚨 *No stock signals generated in the past 3 days.* 🚨"
@@ -47,11 +291,18 @@ class TelegramNotifier:
         # Build the message header
         message = "🚨 *Stock Signals from the Last 3 Days* 🚨\n\n"
 
-        # Iterate through the data and format each signal
-        for _, row in data.iterrows():
-            symbol = row.get('symbol', 'Unknown Symbol')  # Use lowercase column names
-            date = row.get('datetime', 'Unknown Date')
-            signals = row.get('signals', 'Unknown Signals')
-            message += f"🔹 `{symbol}`: {date} - *{signals}*\n"
+        def column(name, default):
+            # Use lowercase column names
+            if name not in data.columns:
+                return pd.Series(default, index=data.index)
+            values = data[name]
+            if pd.api.types.is_datetime64_any_dtype(values) and values.dt.tz is None:
+                return values.dt.strftime('%Y-%m-%d %H:%M:%S').fillna('NaT')  # Same text as str(Timestamp)
+            return values.astype(str)
 
-        return message
+        # One line per signal, built column-wise
+        lines = (
+            "🔹 `" + column('symbol', 'Unknown Symbol') + "`: " + column('datetime', 'Unknown Date')
+            + " - *" + column('signals', 'Unknown Signals') + "*\n"
+        )
+        return message + ''.join(lines.tolist())
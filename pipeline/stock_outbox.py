@@ -0,0 +1,344 @@
+import os
+import time
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import argparse
+import threading
+from contextlib import closing
+import config  # Import only the config file, no other project modules
+
+# Durable notification outbox.
+#
+# The pipeline enqueues messages into a local SQLite table, which takes a few
+# milliseconds and never touches the network; an OutboxSender drains the
+# table in the background, on its own thread and event loop, with retries and
+# backoff. Messages survive the process: whatever was not delivered before
+# exit is sent by the next sender (the next run, the daemon, or
+# `python stock_outbox.py drain`). A message split into several chunks is
+# deduplicated as a whole, on its alert id and the hash of its full text: a
+# re-run producing the same alert doesn't send it twice, and one whose text
+# changed sends all its chunks again, never a fragment. Chunks go out in order:
+# a chunk waits while an earlier one of its message awaits a retry, and when
+# one is given up (after OUTBOX_MAX_ATTEMPTS, or at once when the Bot API
+# rejects it) the rest of its message is given up too. Claims carry a lease so
+# two senders never send the same row at once; the sender purges old rows
+# every OUTBOX_PURGE_INTERVAL.
+
+
+class NotificationOutbox:
+    """
+    SQLite-backed queue of outgoing messages.
+
+    A row is pending until it is sent, or until it failed OUTBOX_MAX_ATTEMPTS
+    times ('dead', kept for inspection). Delivered and dead rows are purged
+    after OUTBOX_RETENTION_DAYS, which is also the deduplication horizon.
+    """
+    table = 'outbox'
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or config.OUTBOX_DB_FILE
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, dedupe_key TEXT NOT NULL UNIQUE, "
+                "chat_id TEXT NOT NULL, text TEXT NOT NULL, parse_mode TEXT, "
+                "created REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "next_attempt REAL NOT NULL, claimed_until REAL NOT NULL DEFAULT 0, "
+                "sent REAL, dead INTEGER NOT NULL DEFAULT 0, error TEXT, message_key TEXT)"
+            )
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({self.table})")]
+            if 'message_key' not in columns:  # Outbox created before chunks were deduplicated together
+                conn.execute(f"ALTER TABLE {self.table} ADD COLUMN message_key TEXT")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_pending ON {self.table} (sent, dead, next_attempt)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_message ON {self.table} (message_key)")
+
+    def __str__(self):
+        return self.db_path
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL")  # The sender reads while the pipeline enqueues
+        return conn
+
+    @staticmethod
+    def message_key(chat_id, texts, alert=None):
+        """Dedupe key of a message: the same alert with the same full text to the same chat is one message."""
+        return hashlib.sha256(f"{chat_id}\n{alert or ''}\n{''.join(texts)}".encode('utf-8')).hexdigest()
+
+    def enqueue(self, texts, chat_id, parse_mode="Markdown", alert=None):
+        """
+        Queue the chunks of one message for delivery, unless the message was already queued or sent.
+
+        Parameters:
+            texts (list): Chunks of the message (see `split_message`), delivered in this order.
+            chat_id (str): Chat to deliver to.
+            parse_mode (str): Telegram parse mode of the texts.
+            alert (str): Id of the alert the message carries, e.g. 'signals'.
+
+        Returns:
+            int: Number of chunks newly queued (all of them or none).
+        """
+        now = time.time()
+        key = self.message_key(chat_id, texts, alert)
+        with closing(self._connect()) as conn:
+            conn.isolation_level = None
+            conn.execute("BEGIN IMMEDIATE")  # Check and insert atomically against concurrent enqueues
+            try:
+                if conn.execute(f"SELECT 1 FROM {self.table} WHERE message_key = ? LIMIT 1", (key,)).fetchone():
+                    conn.execute("COMMIT")
+                    return 0
+                conn.executemany(
+                    f"INSERT INTO {self.table} (dedupe_key, message_key, chat_id, text, parse_mode, created, "
+                    "next_attempt) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(f"{key}:{part}", key, str(chat_id), text, parse_mode, now, now)
+                     for part, text in enumerate(texts)]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return len(texts)
+
+    def claim(self, limit=100, lease=None):
+        """
+        Reserve due messages for one sender for `lease` seconds (default OUTBOX_LEASE).
+
+        A chunk is left out while an earlier chunk of its message is unsent and
+        not claimed along with it (waiting for a retry, or held by another sender).
+
+        Returns:
+            list: (id, chat_id, text, parse_mode, attempts, message_key) tuples, oldest first.
+        """
+        now = time.time()
+        lease = config.OUTBOX_LEASE if lease is None else lease
+        with closing(self._connect()) as conn:
+            conn.isolation_level = None
+            conn.execute("BEGIN IMMEDIATE")  # Claims by concurrent senders are serialized
+            try:
+                rows = conn.execute(
+                    f"SELECT id, chat_id, text, parse_mode, attempts, message_key FROM {self.table} AS chunk "
+                    "WHERE sent IS NULL AND dead = 0 AND next_attempt <= ? AND claimed_until <= ? "
+                    f"AND NOT EXISTS (SELECT 1 FROM {self.table} AS earlier WHERE earlier.message_key = chunk.message_key "
+                    "AND earlier.id < chunk.id AND earlier.sent IS NULL "
+                    "AND (earlier.dead = 1 OR earlier.next_attempt > ? OR earlier.claimed_until > ?)) "
+                    "ORDER BY id LIMIT ?",
+                    (now, now, now, now, limit)
+                ).fetchall()
+                conn.executemany(
+                    f"UPDATE {self.table} SET claimed_until = ? WHERE id = ?",
+                    [(now + lease, row[0]) for row in rows]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return rows
+
+    def mark_sent(self, message_id):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"UPDATE {self.table} SET sent = ?, claimed_until = 0 WHERE id = ?",
+                         (time.time(), message_id))
+
+    def mark_failed(self, message_id, attempts, error, permanent=False):
+        """
+        Schedule a retry with exponential backoff, or give up after OUTBOX_MAX_ATTEMPTS.
+
+        A `permanent` failure (the Bot API rejected the message) is given up at
+        once. Giving up a chunk gives up the later chunks of its message.
+        """
+        attempts += 1
+        delay = min(config.OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), config.OUTBOX_BACKOFF_MAX)
+        dead = permanent or attempts >= config.OUTBOX_MAX_ATTEMPTS
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"UPDATE {self.table} SET attempts = ?, next_attempt = ?, claimed_until = 0, dead = ?, error = ? "
+                "WHERE id = ?",
+                (attempts, time.time() + delay, int(dead), error, message_id)
+            )
+            if dead:
+                conn.execute(
+                    f"UPDATE {self.table} SET dead = 1, claimed_until = 0, error = 'an earlier chunk was given up' "
+                    f"WHERE message_key = (SELECT message_key FROM {self.table} WHERE id = ?) AND id > ? AND sent IS NULL",
+                    (message_id, message_id)
+                )
+
+    def release(self, message_ids):
+        """Give claimed messages back unsent, without counting an attempt."""
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(f"UPDATE {self.table} SET claimed_until = 0 WHERE id = ?",
+                             [(message_id,) for message_id in message_ids])
+
+    def pending(self):
+        """Number of messages still to deliver (due now or later)."""
+        with closing(self._connect()) as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {self.table} WHERE sent IS NULL AND dead = 0").fetchone()[0]
+
+    def status(self):
+        """Counts of pending, sent and dead messages."""
+        with closing(self._connect()) as conn:
+            pending, sent, dead = conn.execute(
+                f"SELECT COALESCE(SUM(sent IS NULL AND dead = 0), 0), COALESCE(SUM(sent IS NOT NULL), 0), "
+                f"COALESCE(SUM(dead), 0) FROM {self.table}"
+            ).fetchone()
+        return {'pending': pending, 'sent': sent, 'dead': dead}
+
+    def purge(self, days=None):
+        """Delete delivered and dead messages older than `days` (default OUTBOX_RETENTION_DAYS)."""
+        days = config.OUTBOX_RETENTION_DAYS if days is None else days
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                f"DELETE FROM {self.table} WHERE (sent IS NOT NULL OR dead = 1) AND created < ?",
+                (time.time() - days * 86400,)
+            ).rowcount
+
+
+class OutboxSender:
+    """
+    Drain a NotificationOutbox through a TelegramNotifier, in the background.
+
+    `start()` runs the sender on a daemon thread with its own event loop: it
+    sends whatever is due, then polls every OUTBOX_POLL_INTERVAL seconds.
+    `close(timeout)` lets it finish the messages already due and stops it;
+    anything left stays in the outbox for the next sender. Delivered and dead
+    messages are purged when the sender starts and every `purge_interval`.
+    """
+
+    def __init__(self, outbox, notifier, poll_interval=None, purge_interval=None):
+        self.outbox = outbox
+        self.notifier = notifier
+        self.poll_interval = config.OUTBOX_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.purge_interval = config.OUTBOX_PURGE_INTERVAL if purge_interval is None else purge_interval
+        self.next_purge = 0.0  # time.monotonic() of the next purge
+        self.purged = 0
+        self.sent = 0
+        self.failed = 0
+        self.closing = threading.Event()  # Finish what is due, then stop
+        self.wakeup = threading.Event()  # New messages were enqueued
+        self.thread = None
+
+    async def drain(self):
+        """
+        Send every message that is due over one Bot session.
+
+        A message stops at its first chunk that fails: its later chunks are
+        given back and wait for that one's retry. Messages the Bot API rejects
+        (`notifier.PERMANENT_ERRORS`) are not retried.
+
+        Returns:
+            int: Number of messages delivered.
+        """
+        sent = 0
+        rows = self.outbox.claim()
+        if not rows:
+            return 0
+        permanent_errors = getattr(self.notifier, 'PERMANENT_ERRORS', ())
+        stopped = set()  # Messages with a failed chunk in this claim
+        try:
+            async with self.notifier.session():  # One HTTP session for the whole batch
+                while rows:
+                    message_id, chat_id, text, parse_mode, attempts, message_key = rows[0]
+                    if message_key is not None and message_key in stopped:
+                        self.outbox.release([message_id])
+                    else:
+                        permanent = False
+                        try:
+                            delivered = await self.notifier.send_one(text, parse_mode, chat_id=chat_id)
+                            error = None if delivered else "not delivered, see the log"
+                        except Exception as e:
+                            delivered, error, permanent = False, str(e), isinstance(e, permanent_errors)
+                        if delivered:
+                            self.outbox.mark_sent(message_id)
+                            sent += 1
+                        else:
+                            self.outbox.mark_failed(message_id, attempts, error, permanent)
+                            self.failed += 1
+                            stopped.add(message_key)
+                    rows.pop(0)
+                    if not rows:
+                        rows = self.outbox.claim()  # Messages enqueued meanwhile, retries due already
+                        stopped.clear()
+        except Exception as e:
+            # The session itself failed (e.g., the Bot API is unreachable): retry the claimed rows later
+            for message_id, _, _, _, attempts, _ in rows:
+                self.outbox.mark_failed(message_id, attempts, str(e))
+            raise
+        finally:
+            self.sent += sent
+        return sent
+
+    def purge_if_due(self):
+        """
+        Purge old delivered and dead messages if `purge_interval` has elapsed since the last purge.
+
+        Returns:
+            int: Number of messages deleted.
+        """
+        now = time.monotonic()
+        if now < self.next_purge:
+            return 0
+        self.next_purge = now + self.purge_interval
+        purged = self.outbox.purge()
+        self.purged += purged
+        return purged
+
+    async def _run(self):
+        while True:
+            try:
+                self.purge_if_due()
+                await self.drain()
+            except Exception as e:
+                # e.g. the Bot API is unreachable: claimed rows are retried once their lease expires
+                logging.error(f"❌ Outbox sender error: {e}")
+                if self.closing.is_set():
+                    return
+            if self.closing.is_set():
+                return
+            # Sleep until the next poll, a wake-up or close
+            await asyncio.get_running_loop().run_in_executor(None, self.wakeup.wait, self.poll_interval)
+            self.wakeup.clear()
+
+    def start(self):
+        """Run the sender on a background thread; returns self."""
+        self.thread = threading.Thread(target=asyncio.run, args=(self._run(),), name='outbox-sender', daemon=True)
+        self.thread.start()
+        return self
+
+    def notify(self):
+        """Wake the sender up after enqueueing, instead of waiting for the next poll."""
+        self.wakeup.set()
+
+    def close(self, timeout=None):
+        """
+        Deliver what is due within `timeout` seconds (default OUTBOX_FLUSH_TIMEOUT), then stop.
+
+        Returns:
+            int: Messages still pending in the outbox (sent by the next sender).
+        """
+        timeout = config.OUTBOX_FLUSH_TIMEOUT if timeout is None else timeout
+        self.closing.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        return self.outbox.pending()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or drain the notification outbox.")
+    parser.add_argument('command', choices=['status', 'drain', 'purge'])
+    parser.add_argument('--db', default=config.OUTBOX_DB_FILE, help="Outbox database")
+    args = parser.parse_args()
+
+    outbox = NotificationOutbox(args.db)
+    if args.command == 'status':
+        print(outbox.status())
+    elif args.command == 'purge':
+        print(f"Purged {outbox.purge()} messages")
+    else:
+        from stock_notifier import TelegramNotifier
+        sender = OutboxSender(outbox, TelegramNotifier())
+        print(f"Sent {asyncio.run(sender.drain())} messages, {outbox.pending()} pending")
@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+
+# Vectorized indicator kernels over a 2-D (bars x symbols) panel.
+#
+# Each kernel walks the bar axis once and updates every symbol at the same time,
+# reproducing TA-Lib's seeding rules (SMA seed, leading NaNs skipped) so results
+# match the per-symbol talib calls used by the StockIndicator classes.
+
+
+class PricePanel:
+    """
+    Closing prices of many symbols aligned in a single NumPy array.
+
+    Series are right-aligned by bar position: row -1 holds each symbol's most
+    recent bar, and shorter histories are padded with NaN at the top. For a
+    universe sharing one trading calendar this is the usual (dates x symbols)
+    alignment; unlike a date join it never inserts gaps into a series, so the
+    recursions see exactly the bars a per-symbol calculation sees.
+
+    Attributes:
+        symbols (list): Column labels.
+        close (np.ndarray): float64 array of shape (bars, symbols).
+        datetimes (np.ndarray): datetime64 array of the same shape (NaT for padding), in the
+            resolution of the frames' indexes, so signal rows match the per-symbol screener's.
+    """
+
+    def __init__(self, symbols, close, datetimes):
+        self.symbols = symbols
+        self.close = close
+        self.datetimes = datetimes
+
+    @classmethod
+    def from_frames(cls, frames):
+        """
+        Build a panel from per-symbol bars.
+
+        Parameters:
+            frames (iterable): (symbol, DataFrame) pairs with a 'Close' column on a datetime index.
+
+        Returns:
+            PricePanel: Panel holding every symbol's closes.
+        """
+        symbols, closes, stamps = [], [], []
+        for symbol, data in frames:
+            symbols.append(symbol)
+            closes.append(data['Close'].to_numpy(dtype='float64'))
+            stamps.append(data.index.to_numpy())
+
+        rows = max((len(values) for values in closes), default=0)
+        unit = np.result_type(*(index.dtype for index in stamps)) if stamps else np.dtype('datetime64[ns]')
+        close = np.full((rows, len(symbols)), np.nan)
+        datetimes = np.full((rows, len(symbols)), np.datetime64('NaT'), dtype=unit)
+        for column, (values, index) in enumerate(zip(closes, stamps)):
+            if len(values):
+                close[rows - len(values):, column] = values
+                datetimes[rows - len(values):, column] = index
+        return cls(symbols, close, datetimes)
+
+    @classmethod
+    def from_store(cls, store, symbols=None, start=None, end=None):
+        """Load a panel from a BarStore (see `BarStore.iter_bars` for the filters)."""
+        return cls.from_frames(store.iter_bars(symbols=symbols, start=start, end=end))
+
+    def signal_rows(self, mask, signal_type):
+        """
+        Convert a boolean signal mask into screener rows.
+
+        Parameters:
+            mask (np.ndarray): Boolean array shaped like `close`.
+            signal_type (str): Value for the 'signal type' column.
+
+        Returns:
+            pd.DataFrame: Columns Datetime, symbol, signal type, ordered by symbol then bar.
+        """
+        symbol_index, bar_index = np.nonzero(mask.T)  # Transposed so hits come out symbol-major
+        return pd.DataFrame({
+            'Datetime': self.datetimes[bar_index, symbol_index],
+            'symbol': np.asarray(self.symbols, dtype=object)[symbol_index],
+            'signal type': signal_type,
+        })
+
+
+def _first_valid(values):
+    """Index of the first non-NaN row of every column (number of rows if none)."""
+    valid = ~np.isnan(values)
+    return np.where(valid.any(axis=0), valid.argmax(axis=0), values.shape[0])
+
+
+def ema(values, period, seed_index=None):
+    """
+    Exponential moving average of every column, as computed by talib.EMA.
+
+    The first output of each column is the simple average of the `period`
+    values ending at `seed_index` (by default: the first `period` valid values),
+    summed in order like TA-Lib does; later values use k = 2 / (period + 1).
+
+    Parameters:
+        values (np.ndarray): (bars, symbols) array; leading NaNs are skipped.
+        period (int): EMA period.
+        seed_index (np.ndarray): Optional per-column row of the first output.
+
+    Returns:
+        np.ndarray: EMA values, NaN before each column's seed row.
+    """
+    rows, columns = values.shape
+    k = 2.0 / (period + 1)
+    if seed_index is None:
+        seed_index = _first_valid(values) + period - 1
+    window_start = seed_index - period + 1
+
+    out = np.full((rows, columns), np.nan)
+    total = np.zeros(columns)
+    previous = np.full(columns, np.nan)
+    for row in range(rows):
+        current = values[row]
+        # Accumulate the seed window, then switch to the recursive update
+        total = np.where((row >= window_start) & (row <= seed_index), total + current, total)
+        previous = np.where(row == seed_index, total / period, previous)
+        previous = np.where(row > seed_index, (current - previous) * k + previous, previous)
+        out[row] = np.where(row >= seed_index, previous, np.nan)
+    return out
+
+
+def ema_from(values, period, seed_offset):
+    """
+    EMA of every column seeded `seed_offset` rows after its first valid value
+    (instead of `period - 1`), as talib.MACD seeds its fast EMA on the slow EMA's bar.
+    """
+    return ema(values, period, seed_index=_first_valid(values) + seed_offset)
+
+
+def rsi(close, period):
+    """
+    Wilder's RSI of every column, as computed by talib.RSI.
+
+    Returns:
+        np.ndarray: RSI values, NaN for the first `period` bars of each column.
+    """
+    rows, columns = close.shape
+    first = _first_valid(close)
+    seed_index = first + period
+
+    out = np.full((rows, columns), np.nan)
+    gain = np.zeros(columns)
+    loss = np.zeros(columns)
+    for row in range(1, rows):
+        change = close[row] - close[row - 1]
+        up = np.where(change < 0, 0.0, change)
+        down = np.where(change < 0, -change, 0.0)
+
+        # Sum the first `period` changes, then apply Wilder's smoothing
+        warming = (row > first) & (row <= seed_index)
+        smoothing = row > seed_index
+        gain = np.where(warming, gain + up, np.where(smoothing, (gain * (period - 1) + up) / period, gain))
+        loss = np.where(warming, loss + down, np.where(smoothing, (loss * (period - 1) + down) / period, loss))
+        gain = np.where(row == seed_index, gain / period, gain)
+        loss = np.where(row == seed_index, loss / period, loss)
+
+        total = gain + loss
+        value = np.where(np.abs(total) < 1e-14, 0.0, 100 * (gain / np.where(total == 0, 1, total)))
+        out[row] = np.where(row >= seed_index, value, np.nan)
+    return out
+
+
+def lagged(values):
+    """Shift every column down by one bar (the panel equivalent of `Series.shift(1)`)."""
+    shifted = np.full_like(values, np.nan)
+    shifted[1:] = values[:-1]
+    return shifted
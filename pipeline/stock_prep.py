@@ -1,24 +1,72 @@
 import os
+import time
+import numpy as np
 import pandas as pd
 import logging
-from config import STOCK_PRE_DIR, STOCK_POST_DIR
+from concurrent.futures import ProcessPoolExecutor
+from config import STOCK_PRE_DIR, STOCK_POST_DIR, STORAGE_BACKEND, PREP_WORKERS, PREP_CHUNK_SIZE
+from stock_storage import get_bar_store, read_bar_file, clean_bars, normalize_bars
+from stock_signals import SignalStore
+from stock_metrics import metrics
 from datetime import datetime, timedelta
 
+
+class _LogCollector(logging.Handler):
+    """Buffer log records in a worker process so they can be replayed in the parent."""
+
+    def __init__(self):
+        super().__init__(level=logging.INFO)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.levelno, record.getMessage()))
+
+
+# Per-process state of preprocessing workers, set up by _init_prep_worker
+_worker_prep = None
+_worker_logs = None
+
+
+def _init_prep_worker(raw_data_dir, processed_data_dir, backend):
+    """Create the worker's StockPrep and route its log records into a collector."""
+    global _worker_prep, _worker_logs
+    _worker_prep = StockPrep(raw_data_dir, processed_data_dir, backend=backend)
+    _worker_logs = _LogCollector()
+    # Replace inherited handlers so forked workers don't write to the parent's log directly
+    root = logging.getLogger()
+    root.handlers = [_worker_logs]
+    root.setLevel(logging.INFO)
+
+
+def _preprocess_in_worker(csv_file_path):
+    """Preprocess one file in a worker; returns (processed path or None, log records, seconds)."""
+    _worker_logs.records = []
+    started = time.perf_counter()
+    processed_file = _worker_prep.preprocess_file(csv_file_path)
+    return processed_file, _worker_logs.records, time.perf_counter() - started
+
+
 class StockPrep:
     """
     A class to handle the preprocessing of stock data.
     """
 
-    def __init__(self, raw_data_dir=STOCK_PRE_DIR, processed_data_dir=STOCK_POST_DIR):
+    def __init__(self, raw_data_dir=STOCK_PRE_DIR, processed_data_dir=STOCK_POST_DIR, backend=None):
         """
         Initialize the StockPrep class with configurations.
+
+        :param backend: Storage backend name; defaults to STORAGE_BACKEND from the config.
         """
         self.raw_data_dir = raw_data_dir  # Directory for raw stock data
         self.processed_data_dir = processed_data_dir  # Directory for processed stock data
+        self.backend = backend or STORAGE_BACKEND  # Storage backend name
 
         # Ensure required directories exist
         self._ensure_directory_exists(self.processed_data_dir)
 
+        self.raw_store = get_bar_store(self.raw_data_dir, backend)  # Raw bar storage
+        self.processed_store = get_bar_store(self.processed_data_dir, backend)  # Processed bar storage
+
     @staticmethod
     def _ensure_directory_exists(directory):
         """
@@ -28,38 +76,53 @@ class StockPrep:
             os.makedirs(directory)
             logging.info(f"Created directory: {directory}")
 
-    def preprocess_file(self, csv_file_path):
+    @staticmethod
+    def _clean(data, source):
         """
-        Preprocess a single raw stock data file.
+        Drop rows with invalid dates (with a warning) and duplicates, and sort by datetime.
 
-        :param csv_file_path: Path to the raw stock data file.
-        :return: Path to the preprocessed file or None if an error occurs.
+        :param data: Normalized bars.
+        :param source: File or store path the bars came from, used in the warning.
+        :return: Cleaned bars.
         """
-        try:
-            # Read the raw CSV file
-            data = pd.read_csv(csv_file_path, header=0)
-
-            # Rename the 'Price' column to 'Datetime'
-            data.rename(columns={"Price": "Datetime"}, inplace=True)
+        invalid_dates = data.index.isna().sum()
+        if invalid_dates > 0:
+            logging.warning(f"File {source} contains {invalid_dates} invalid dates. Dropping those rows.")
+        return clean_bars(data)
 
-            # Drop rows 1 and 2 (Ticker and Date rows)
-            data = data.iloc[2:].reset_index(drop=True)
+    @staticmethod
+    def prepare(symbol, data):
+        """
+        Preprocess bars already in memory (the prep stage of the streaming pipeline).
 
-            # Ensure the 'Datetime' column exists and convert to datetime format
-            data["Datetime"] = pd.to_datetime(data["Datetime"], format="%Y-%m-%d", errors="coerce")
+        :param symbol: Symbol of the bars, used in warnings.
+        :param data: Bars in the yfinance or the flat layout.
+        :return: Cleaned bars, or None if no valid rows remain.
+        """
+        data = StockPrep._clean(normalize_bars(data), symbol)
+        if data.empty:
+            logging.warning(f"Bars of {symbol} contain no valid rows. Skipping.")
+            return None
+        return data
 
-            # Drop rows with invalid dates
-            invalid_dates = data["Datetime"].isnull().sum()
-            if invalid_dates > 0:
-                logging.warning(f"File {csv_file_path} contains {invalid_dates} invalid dates. Dropping those rows.")
-                data = data[~data["Datetime"].isnull()]
+    def preprocess_file(self, csv_file_path):
+        """
+        Preprocess a single raw stock data file.
 
-            # Sort by 'Datetime'
-            data.sort_values("Datetime", inplace=True)
+        :param csv_file_path: Path to the raw stock data file (CSV in either the yfinance
+            or the flat layout, Parquet or Feather).
+        :return: Path to the preprocessed file or None if an error occurs.
+        """
+        try:
+            # Read the raw file into typed columns on a datetime index
+            data = self._clean(read_bar_file(csv_file_path), csv_file_path)
+            if data.empty:
+                logging.warning(f"File {csv_file_path} contains no valid rows. Skipping.")
+                return None
 
-            # Save the preprocessed file to the processed data directory
-            processed_file_path = os.path.join(self.processed_data_dir, os.path.basename(csv_file_path))
-            data.to_csv(processed_file_path, index=False)
+            # Save the preprocessed data to the processed store
+            symbol = os.path.splitext(os.path.basename(csv_file_path))[0]
+            processed_file_path = self.processed_store.write(symbol, data)
 
             logging.info(f"Preprocessed data saved to {processed_file_path}")
             return processed_file_path
@@ -67,19 +130,68 @@ class StockPrep:
             logging.error(f"Error preprocessing file {csv_file_path}: {e}")
             return None
 
-    def preprocess_all(self):
+    def preprocess_all(self, workers=PREP_WORKERS, chunk_size=PREP_CHUNK_SIZE):
         """
-        Preprocess all raw stock data files in the raw data directory.
+        Preprocess all raw stock data in the raw data directory.
 
-        :return: List of paths to preprocessed files.
+        With several workers, files are spread over a process pool in chunks of
+        `chunk_size`; warnings and errors logged by the workers are replayed in
+        this process's log. A consolidated store is always processed in bulk
+        (one query and one transaction), since its writes cannot run in parallel.
+
+        :param workers: Number of worker processes (1 = sequential).
+        :param chunk_size: Number of files sent to a worker per task.
+        :return: List of paths to preprocessed files, in symbol order.
         """
+        with metrics.stage('prep') as stage:
+            if workers > 1 and not self.raw_store.consolidated and not self.processed_store.consolidated:
+                preprocessed_files = self._preprocess_parallel(workers, chunk_size, stage)
+            else:
+                read_before, written_before = self.raw_store.bytes_read, self.processed_store.bytes_written
+                preprocessed_files = self.processed_store.write_many(self._iter_cleaned(stage))
+                stage.bytes_read = self.raw_store.bytes_read - read_before
+                stage.bytes_written = self.processed_store.bytes_written - written_before
+            stage.items = len(preprocessed_files)
+
+        logging.info(f"Preprocessed {len(preprocessed_files)} symbols into {self.processed_data_dir}")
+        return preprocessed_files
+
+    def _iter_cleaned(self, stage):
+        """Yield (symbol, cleaned bars) for every raw symbol, timing the read and clean of each."""
+        bars = iter(self.raw_store.iter_bars())
+        while True:
+            started = time.perf_counter()
+            try:
+                symbol, data = next(bars)
+            except StopIteration:
+                return
+            data = self._clean(data, self.raw_store.path(symbol))
+            stage.add_timing(symbol, time.perf_counter() - started)
+            yield symbol, data
+
+    def _preprocess_parallel(self, workers, chunk_size, stage):
+        """Run preprocess_file over every raw file on a process pool."""
+        file_paths = [self.raw_store.path(symbol) for symbol in self.raw_store.symbols()]
+        if not file_paths:
+            return []
+
         preprocessed_files = []
-        for file_name in os.listdir(self.raw_data_dir):
-            if file_name.endswith(".csv"):
-                csv_file_path = os.path.join(self.raw_data_dir, file_name)
-                processed_file = self.preprocess_file(csv_file_path)
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(file_paths)),
+            initializer=_init_prep_worker,
+            initargs=(self.raw_data_dir, self.processed_data_dir, self.backend)
+        ) as executor:
+            results = executor.map(_preprocess_in_worker, file_paths, chunksize=chunk_size)
+            for file_path, (processed_file, records, seconds) in zip(file_paths, results):
+                # Replay the worker's log records in the parent's log
+                for levelno, message in records:
+                    logging.log(levelno, message)
+                stage.add_timing(os.path.basename(file_path), seconds)
+                stage.bytes_read += os.path.getsize(file_path)
                 if processed_file:
+                    stage.bytes_written += os.path.getsize(processed_file)
                     preprocessed_files.append(processed_file)
+
         return preprocessed_files
 
 import os
@@ -89,6 +201,10 @@ from datetime import datetime, timedelta
 class StockFilter:
     """
     A class to tally and combine stock signals within a lookback period.
+
+    Signals are read from a consolidated CSV file (`file_path` as a path),
+    from a SignalStore, where only the lookback window is queried, or taken
+    from a signals DataFrame already in memory.
     """
     def __init__(self, file_path, lookback_days=3):
         self.file_path = file_path
@@ -98,12 +214,30 @@ class StockFilter:
     def tally_signals(self):
         """
         Tally and combine stock signals within the lookback period, grouped by symbol and date.
+
+        The result has one row per symbol and date with the distinct signal
+        types joined in alphabetical order ('signals'), their number
+        ('signal_count') and the symbol's total over the window ('score').
         """
-        if not os.path.exists(self.file_path):
-            raise FileNotFoundError(f"The file '{self.file_path}' does not exist.")
+        with metrics.stage('filter') as stage:
+            self._tally(stage)
 
-        # Read data
-        data = pd.read_csv(self.file_path)
+    def _tally(self, stage):
+        """Body of tally_signals, accounting rows and bytes to the run report."""
+        cutoff_date = datetime.now() - timedelta(days=self.lookback_days)
+
+        if isinstance(self.file_path, SignalStore):
+            # Index range scan of the lookback window
+            data = self.file_path.query(start=cutoff_date)
+            stage.bytes_read = int(data.memory_usage(index=False).sum())  # Row payload, as for SqliteBarStore
+        elif isinstance(self.file_path, pd.DataFrame):
+            data = self.file_path.copy()  # In-memory pipeline: signals straight from the screener
+        elif not os.path.exists(self.file_path):
+            raise FileNotFoundError(f"The file '{self.file_path}' does not exist.")
+        else:
+            # Read data
+            data = pd.read_csv(self.file_path)
+            stage.bytes_read = os.path.getsize(self.file_path)
 
         # Ensure column names are consistent (case-insensitive)
         data.columns = [col.lower() for col in data.columns]
@@ -117,8 +251,8 @@ class StockFilter:
         data['datetime'] = pd.to_datetime(data['datetime'], errors='coerce')
 
         # Filter data within the lookback period
-        cutoff_date = datetime.now() - timedelta(days=self.lookback_days)
         recent_data = data[data['datetime'] >= cutoff_date]
+        stage.items = len(recent_data)
 
         if recent_data.empty:
             print("No recent signals found.")
@@ -126,13 +260,31 @@ class StockFilter:
             return
 
         # Group data by symbol and datetime, combining signal types
-        recent_data = recent_data.copy()  # Ensure recent_data is a copy
-        recent_data['signal type'] = recent_data['signal type'].fillna('Unknown')
-        tally = (
-            recent_data.groupby(['symbol', 'datetime'])['signal type']
-            .apply(lambda x: ', '.join(set(x)))  # Combine unique signal types for each symbol-date
-            .reset_index(name='signals')
-        )
+        recent_data = recent_data[['symbol', 'datetime', 'signal type']].copy()  # Ensure recent_data is a copy
+        recent_data['signal type'] = recent_data['signal type'].fillna('Unknown').astype(str)
+        recent_data = recent_data.drop_duplicates()  # Each signal type counts once per symbol-date
+        signal_types = pd.Categorical(recent_data['signal type'])  # Categories are sorted
+
+        if len(signal_types.categories) <= 62:
+            # One bit per signal type; the sum of distinct bits is their bitwise OR
+            recent_data['mask'] = np.left_shift(1, signal_types.codes.astype('int64'))
+            masks = recent_data.groupby(['symbol', 'datetime'])['mask'].sum()
+            # Build the label of each distinct combination once
+            labels = {
+                mask: ', '.join(name for bit, name in enumerate(signal_types.categories) if mask >> bit & 1)
+                for mask in masks.unique()
+            }
+            signals = masks.map(labels)
+        else:
+            # Too many signal types for a 64-bit mask: join the sorted names
+            ordered = recent_data.sort_values('signal type', kind='stable')
+            signals = ordered.groupby(['symbol', 'datetime'])['signal type'].agg(', '.join)
+
+        tally = pd.DataFrame({
+            'signals': signals,
+            'signal_count': recent_data.groupby(['symbol', 'datetime']).size(),  # Distinct signal types
+        }).reset_index()
+        tally['score'] = tally.groupby('symbol')['signal_count'].transform('sum')  # Per-symbol total, for ranking
 
         self.filtered_data = tally
 
@@ -0,0 +1,296 @@
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import config  # Import only the config file, no other project modules
+
+# Multi-timeframe bars.
+#
+# Higher timeframes are aggregated locally from the finest bars stored instead
+# of being downloaded once per interval. Intraday bins are aligned on the
+# exchange session (MARKET_TIMEZONE, MARKET_SESSION_OPEN): '4h' bars run
+# 09:30-13:30 and 13:30-16:00, a '1D' bar is one session and a '1W' bar Monday
+# to Friday, as the data provider builds them. A resampled bar is labelled with
+# its start, like the provider's bars, and also carries the time of the last
+# source bar it contains: that is when a signal on it becomes known, so signals
+# on resampled bars are reported at that time, never ahead of the data.
+
+DAY = 24 * 60  # Minutes
+WEEK = 7 * DAY
+
+# Length in minutes of the provider intervals (INTERVAL), to compare them with timeframes
+INTERVAL_MINUTES = {
+    '1m': 1, '2m': 2, '5m': 5, '15m': 15, '30m': 30, '60m': 60, '90m': 90, '1h': 60,
+    '1d': DAY, '5d': WEEK, '1wk': WEEK, '1mo': 31 * DAY, '3mo': 92 * DAY,
+}
+
+# Approximate length in days of each provider period (PERIOD)
+PERIOD_DAYS = {
+    '1d': 1, '5d': 5, '1mo': 31, '3mo': 92, '6mo': 183,
+    '1y': 366, '2y': 731, '5y': 1827, '10y': 3653,
+}
+
+# Aggregation of the bar columns: first open, highest high, lowest low, last close, total volume
+OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def timeframe_minutes(timeframe):
+    """
+    Nominal length of a timeframe in minutes.
+
+    :param timeframe: Minutes or hours ('30m', '90min', '4h'), '1D' or '1W' (case-insensitive,
+        provider spellings such as '60m', '1d' or '1wk' included).
+    :return: Minutes (DAY for '1D', WEEK for '1W').
+    """
+    match = re.fullmatch(r'(\d+)\s*(min|m|h|d|wk|w)', str(timeframe).strip(), re.IGNORECASE)
+    minutes = None
+    if match:
+        count, unit = int(match[1]), match[2].lower()
+        if unit in ('m', 'min', 'h'):
+            minutes = count * (60 if unit == 'h' else 1)
+            minutes = minutes if 0 < minutes < DAY else None  # Longer bins would cross sessions
+        elif count == 1:
+            minutes = DAY if unit == 'd' else WEEK
+    if minutes is None:
+        raise ValueError(f"Unsupported timeframe {timeframe!r}; expected minutes or hours ('30m', '4h'), '1D' or '1W'.")
+    return minutes
+
+
+def interval_minutes(interval):
+    """Length in minutes of a provider interval (or of a timeframe)."""
+    return INTERVAL_MINUTES.get(interval) or timeframe_minutes(interval)
+
+
+def is_coarser(timeframe, interval):
+    """Whether bars of `timeframe` are aggregates of several `interval` bars (otherwise they are the bars themselves)."""
+    return timeframe_minutes(timeframe) > interval_minutes(interval)
+
+
+def session_minutes():
+    """Length of the regular session in minutes."""
+    return int((pd.Timedelta(config.MARKET_SESSION_CLOSE + ':00')
+                - pd.Timedelta(config.MARKET_SESSION_OPEN + ':00')).total_seconds() // 60)
+
+
+def period_bars(period, interval):
+    """
+    Upper bound on the number of `interval` bars a download of `period` returns.
+
+    :return: Bars (weekdays of the period times bars per session), or None for
+        open-ended periods ('ytd', 'max').
+    """
+    days = PERIOD_DAYS.get(period)
+    if days is None:
+        return None
+    minutes = interval_minutes(interval)
+    if minutes < DAY:
+        return days * 5 // 7 * -(-session_minutes() // minutes)
+    if minutes == DAY:
+        return days * 5 // 7
+    return -(-days * DAY // minutes)
+
+
+def bar_ends(index, interval):
+    """
+    Time each bar of `interval` closes, to tell closed bars from the one still forming.
+
+    Intraday bars end after their length, or at the session close for a
+    shortened last bar; daily bars at the session close of their date, weekly
+    bars at Friday's. Longer bars are approximated by their nominal length.
+
+    :param index: Bar starts in the storage convention (naive UTC for intraday bars, dates otherwise).
+    :return: pd.DatetimeIndex of naive UTC timestamps.
+    """
+    minutes = interval_minutes(interval)
+    session_close = pd.Timedelta(config.MARKET_SESSION_CLOSE + ':00')
+    if minutes < DAY:
+        wall = index.tz_localize('UTC').tz_convert(config.MARKET_TIMEZONE)
+        ends = wall + pd.Timedelta(minutes=minutes)
+        closes = wall.normalize() + session_close
+        ends = ends.where(ends < closes, closes)
+    else:
+        last_day = {DAY: 0, WEEK: 4}.get(minutes, minutes // DAY - 1)  # Days from the bar's start to its last session
+        ends = (index.normalize() + pd.Timedelta(days=last_day) + session_close).tz_localize(
+            config.MARKET_TIMEZONE, ambiguous=True, nonexistent='shift_forward')
+    return ends.tz_convert('UTC').tz_localize(None)
+
+
+def bars_per(timeframe, interval):
+    """
+    Number of `interval` bars in one bar of `timeframe`, to convert a warm-up between them.
+
+    :return: Bars per resampled bar (1 if the timeframe is not coarser than the interval).
+    """
+    if not is_coarser(timeframe, interval):
+        return 1
+    target, source = timeframe_minutes(timeframe), interval_minutes(interval)
+    if source >= DAY:
+        return 5  # Days in a week, the only timeframe coarser than a day
+    per_day = -(-session_minutes() // source)
+    if target >= DAY:
+        return per_day * (5 if target == WEEK else 1)
+    return -(-target // source)
+
+
+def _bin_labels(index, minutes):
+    """
+    Start of the bin each bar belongs to.
+
+    Intraday bars are stored on naive UTC timestamps and binned on the
+    exchange's wall clock; daily bars are labelled with their session date.
+
+    :return: np.ndarray of datetime64[ns], non-decreasing for a sorted index.
+    """
+    intraday = bool((index != index.normalize()).any())
+    if not intraday:
+        days = index.normalize()
+        if minutes == WEEK:
+            days = days - pd.to_timedelta(days.dayofweek, unit='D')  # Monday of the week
+        return days.to_numpy(dtype='datetime64[ns]')
+
+    wall = index.tz_localize('UTC').tz_convert(config.MARKET_TIMEZONE).tz_localize(None)
+    days = wall.normalize()
+    if minutes >= DAY:
+        if minutes == WEEK:
+            days = days - pd.to_timedelta(days.dayofweek, unit='D')
+        return days.to_numpy(dtype='datetime64[ns]')  # Daily and weekly bars are labelled with dates
+
+    session_open = days + pd.Timedelta(config.MARKET_SESSION_OPEN + ':00')
+    width = pd.Timedelta(minutes=minutes)
+    starts = session_open + np.floor((wall - session_open) / width) * width  # Bars before the open fall in earlier bins
+    # Back to the storage convention (naive UTC)
+    starts = starts.tz_localize(config.MARKET_TIMEZONE, ambiguous=True, nonexistent='shift_forward')  # DST changes at night
+    return starts.tz_convert('UTC').tz_localize(None).to_numpy(dtype='datetime64[ns]')
+
+
+def resample_bars(bars, timeframe, ends=None):
+    """
+    Aggregate bars into a higher timeframe in one pass.
+
+    Parameters:
+        bars (pd.DataFrame): Sorted bars on a datetime index (stored layout: naive UTC for
+            intraday bars, dates for daily ones), or bars returned by this function.
+        timeframe (str): Target timeframe, see `timeframe_minutes`.
+        ends (pd.DatetimeIndex): Time of the last source bar of each row of `bars`, when
+            they are resampled bars themselves (defaults to their index).
+
+    Returns:
+        pd.DataFrame: OHLCV bars of the timeframe, labelled with their start. Bars that
+            are not coarser than the timeframe are returned as they are.
+        pd.DatetimeIndex: Time of the last source bar of each resampled bar.
+    """
+    ends = bars.index if ends is None else ends
+    minutes = timeframe_minutes(timeframe)
+    if bars.empty:
+        return bars, ends
+
+    labels = _bin_labels(bars.index, minutes)
+    first = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    last = np.r_[first[1:] - 1, len(labels) - 1]
+    if len(first) == len(bars) and (labels == bars.index.to_numpy(dtype='datetime64[ns]')).all():
+        return bars, ends  # Already at (or finer than) the timeframe
+
+    columns = {}
+    for column in OHLCV:
+        if column not in bars.columns:
+            continue
+        values = bars[column].to_numpy(dtype='float64')
+        if column == 'Open':
+            columns[column] = values[first]
+        elif column == 'Close':
+            columns[column] = values[last]
+        elif column == 'High':
+            columns[column] = np.fmax.reduceat(values, first)  # NaN-skipping
+        elif column == 'Low':
+            columns[column] = np.fmin.reduceat(values, first)
+        else:
+            columns[column] = np.add.reduceat(np.nan_to_num(values), first)
+    index = pd.DatetimeIndex(labels[first], name=bars.index.name)
+    return pd.DataFrame(columns, index=index), ends[last]
+
+
+def bars_digest(bars):
+    """Content hash of a symbol's bars (all OHLCV columns), keying the resampled series."""
+    digest = hashlib.sha1()
+    digest.update(bars.index.to_numpy(dtype='datetime64[ns]').tobytes())
+    for column in OHLCV:
+        if column in bars.columns:
+            digest.update(bars[column].to_numpy(dtype='float64').tobytes())
+    return digest.hexdigest()
+
+
+class Resampler:
+    """
+    Resampled series of many symbols, cached in memory.
+
+    A request for a timeframe aggregates the bars through every
+    RESAMPLE_TIMEFRAMES step that nests in it, each from the previous one
+    (1h -> 4h -> 1D -> 1W), and caches every step: a later request for
+    another timeframe of the same bars only aggregates further. Entries are
+    keyed on the bars' content and evicted least recently used beyond
+    `max_entries`.
+    """
+
+    def __init__(self, interval=None, max_entries=None):
+        """
+        Parameters:
+            interval (str): Interval of the bars to resample; defaults to INTERVAL.
+            max_entries (int): Cached series; defaults to RESAMPLE_CACHE_SIZE.
+        """
+        self.interval = interval or config.INTERVAL
+        self.max_entries = config.RESAMPLE_CACHE_SIZE if max_entries is None else max_entries
+        self.entries = OrderedDict()  # (symbol, digest, minutes) -> (bars, ends)
+        self.lock = threading.Lock()  # The streaming pipeline may screen on several threads
+        self.hits = 0
+        self.misses = 0
+
+    def steps(self, timeframe):
+        """Timeframes to aggregate through, finest first, ending with `timeframe`."""
+        target = timeframe_minutes(timeframe)
+        steps = []
+        for step in config.RESAMPLE_TIMEFRAMES:
+            minutes = timeframe_minutes(step)
+            # A step must be coarser than the bars and its bins must fall entirely within the target's
+            nests = minutes < target and (target >= DAY or target % minutes == 0)
+            if nests and is_coarser(step, self.interval):
+                steps.append(step)
+        return steps + [timeframe]
+
+    def _get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def _put(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get(self, symbol, bars, timeframe):
+        """
+        A symbol's bars in a higher timeframe.
+
+        :return: (resampled bars, time of the last source bar of each), see `resample_bars`.
+        """
+        digest = bars_digest(bars)
+        entry = self._get((symbol, digest, timeframe_minutes(timeframe)))
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        entry = (bars, bars.index)
+        for step in self.steps(timeframe):
+            key = (symbol, digest, timeframe_minutes(step))
+            cached = self._get(key)
+            if cached is None:
+                cached = resample_bars(entry[0], step, entry[1])
+                self._put(key, cached)
+            entry = cached
+        return entry
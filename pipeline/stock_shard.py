@@ -0,0 +1,471 @@
+import os
+import json
+import time
+import zlib
+import shutil
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+import multiprocessing
+from datetime import datetime
+from contextlib import closing
+import pandas as pd
+import config
+from stock_fetch import StockFetch
+from stock_prep import StockPrep
+from stock_indicators import StockIndicators, StockScreener
+from stock_metrics import metrics, get_file_logger, flush_logs
+
+# Sharded pipeline execution.
+#
+# The symbol list is split into SHARD_COUNT shards by a stable hash of the
+# symbol, so a symbol stays in the same shard from run to run. Shards are rows
+# of a coordination table (SHARD_DB_FILE, SQLite in WAL mode, claimed with
+# BEGIN IMMEDIATE like the notification outbox): a worker claims a shard with a
+# lease, renews it with a heartbeat while it fetches, prepares and screens the
+# shard's symbols on its own (as the 'memory' pipeline mode does), writes the
+# shard's signals to SHARD_DIR and marks the shard done. Workers read the
+# shared fetch manifest but don't write it concurrently: each writes its
+# shard's entries next to its signals, and the coordinator merges them into
+# the manifest. A worker that dies stops renewing its lease, and its shard is
+# claimed again by another worker once the lease has expired (at once for
+# local workers, whose exit the coordinator sees). When every shard is done,
+# the coordinator merges the shard signals into the signal output, in shard
+# order, and hands them to StockFilter.
+#
+# Workers on other hosts join a run by sharing DATA_DIR (so the bars, the
+# coordination table and the shard files) and running `python stock_shard.py
+# worker`.
+
+DEFAULT_INDICATORS = ['MACD', 'RSI']
+
+
+def shard_of(symbol, shards):
+    """Shard of a symbol: a stable hash, so assignments survive restarts and universe changes."""
+    return zlib.crc32(symbol.encode('utf-8')) % shards
+
+
+def resolve_indicators(names):
+    """Indicator functions from their names (as stored with a run), e.g. 'MACD' -> calculate_macd."""
+    return [getattr(StockIndicators, f"calculate_{name.lower()}") for name in names]
+
+
+class ShardCoordinator:
+    """
+    Coordination table of sharded runs.
+
+    Each run has one row per shard with its symbols, status ('pending',
+    'running', 'done' or 'failed'), owning worker, lease and results.
+    """
+
+    def __init__(self, db_path=None, shard_dir=None):
+        self.db_path = db_path or config.SHARD_DB_FILE
+        self.shard_dir = shard_dir or config.SHARD_DIR
+        self.incomplete_symbols = []  # Symbols of the shards the last run could not complete
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "run_id TEXT PRIMARY KEY, created REAL NOT NULL, indicators TEXT NOT NULL, "
+                "lookback_days INTEGER, persist INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS shards ("
+                "run_id TEXT NOT NULL, shard INTEGER NOT NULL, symbols TEXT NOT NULL, "
+                "status TEXT NOT NULL DEFAULT 'pending', worker TEXT, lease_until REAL NOT NULL DEFAULT 0, "
+                "attempts INTEGER NOT NULL DEFAULT 0, started REAL, finished REAL, "
+                "signals_file TEXT, failed_symbols TEXT, error TEXT, PRIMARY KEY (run_id, shard))"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL")  # Workers update their shards while the coordinator polls
+        return conn
+
+    def create_run(self, symbols, indicators, shards=None, lookback_days=None, persist=True):
+        """
+        Register a run and its shards.
+
+        Parameters:
+            symbols (list): Symbols of the run.
+            indicators (list): Indicator functions (their names are stored for the workers).
+            shards (int): Number of shards; defaults to SHARD_COUNT.
+            lookback_days (int): Signal window the workers screen, or None for all signals.
+            persist (bool): Whether the workers write the bars they fetch.
+
+        Returns:
+            str: The run ID.
+        """
+        shards = shards or config.SHARD_COUNT
+        by_shard = {}
+        for symbol in symbols:
+            by_shard.setdefault(shard_of(symbol, shards), []).append(symbol)
+
+        run_id = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        names = [StockScreener.signal_type(indicator) for indicator in indicators]
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT INTO runs VALUES (?, ?, ?, ?, ?)",
+                         (run_id, time.time(), json.dumps(names), lookback_days, int(persist)))
+            conn.executemany(
+                "INSERT INTO shards (run_id, shard, symbols) VALUES (?, ?, ?)",
+                [(run_id, shard, json.dumps(group)) for shard, group in sorted(by_shard.items())]
+            )
+        return run_id
+
+    def run_info(self, run_id=None):
+        """(run ID, indicator names, lookback days, persist) of a run, by default the latest one."""
+        with closing(self._connect()) as conn:
+            if run_id is None:
+                row = conn.execute("SELECT run_id, indicators, lookback_days, persist FROM runs "
+                                   "ORDER BY created DESC LIMIT 1").fetchone()
+            else:
+                row = conn.execute("SELECT run_id, indicators, lookback_days, persist FROM runs WHERE run_id = ?",
+                                   (run_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"No sharded run {run_id or ''} in {self.db_path}")
+        return row[0], json.loads(row[1]), row[2], bool(row[3])
+
+    def claim(self, run_id, worker, lease=None):
+        """
+        Give a worker the next shard to run: a pending one, or one whose owner's lease expired.
+
+        Shards that used up SHARD_MAX_ATTEMPTS are marked failed instead.
+
+        Returns:
+            tuple: (shard, symbols), or None if no shard is available right now.
+        """
+        now = time.time()
+        lease = config.SHARD_LEASE if lease is None else lease
+        with closing(self._connect()) as conn:
+            conn.isolation_level = None
+            conn.execute("BEGIN IMMEDIATE")  # Claims by concurrent workers are serialized
+            try:
+                conn.execute(
+                    "UPDATE shards SET status = 'failed', error = COALESCE(error, 'worker lost') "
+                    "WHERE run_id = ? AND attempts >= ? AND (status = 'pending' OR (status = 'running' AND lease_until <= ?))",
+                    (run_id, config.SHARD_MAX_ATTEMPTS, now)
+                )
+                row = conn.execute(
+                    "SELECT shard, symbols FROM shards WHERE run_id = ? "
+                    "AND (status = 'pending' OR (status = 'running' AND lease_until <= ?)) ORDER BY shard LIMIT 1",
+                    (run_id, now)
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE shards SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                        "started = ? WHERE run_id = ? AND shard = ?",
+                        (worker, now + lease, now, run_id, row[0])
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return None if row is None else (row[0], json.loads(row[1]))
+
+    def heartbeat(self, run_id, shard, worker, lease=None):
+        """Extend a worker's lease on its shard; False if the shard was reassigned meanwhile."""
+        lease = config.SHARD_LEASE if lease is None else lease
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "UPDATE shards SET lease_until = ? WHERE run_id = ? AND shard = ? AND worker = ? AND status = 'running'",
+                (time.time() + lease, run_id, shard, worker)
+            ).rowcount == 1
+
+    def complete(self, run_id, shard, worker, signals_file, failed_symbols):
+        """Record a shard's results; ignored if the shard was reassigned meanwhile."""
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "UPDATE shards SET status = 'done', finished = ?, signals_file = ?, failed_symbols = ?, error = NULL "
+                "WHERE run_id = ? AND shard = ? AND worker = ? AND status = 'running'",
+                (time.time(), signals_file, json.dumps(failed_symbols), run_id, shard, worker)
+            ).rowcount == 1
+
+    def fail(self, run_id, shard, worker, error):
+        """Give a shard back after an error, to be retried (by any worker) until SHARD_MAX_ATTEMPTS."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE shards SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "lease_until = 0, error = ? WHERE run_id = ? AND shard = ? AND worker = ? AND status = 'running'",
+                (config.SHARD_MAX_ATTEMPTS, error, run_id, shard, worker)
+            )
+
+    def release(self, run_id, worker):
+        """Expire the leases of a worker known to be dead, so its shards are reassigned at once."""
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "UPDATE shards SET lease_until = 0, error = 'worker exited' "
+                "WHERE run_id = ? AND worker = ? AND status = 'running'",
+                (run_id, worker)
+            ).rowcount
+
+    def status(self, run_id):
+        """Number of shards of a run by status."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM shards WHERE run_id = ? GROUP BY status",
+                                (run_id,)).fetchall()
+        return dict(rows)
+
+    def finished(self, run_id):
+        """Whether every shard of a run is done or failed."""
+        status = self.status(run_id)
+        return not status.get('pending') and not status.get('running')
+
+    def merge(self, run_id, output_file=None):
+        """
+        Combine the shard signals of a finished run, in shard order, and write them to the signal output.
+
+        The shards' fetch manifest entries are merged into the shared manifest.
+
+        Parameters:
+            run_id (str): The run.
+            output_file (str or SignalStore): Signal output, or None to only combine them.
+
+        Returns:
+            pd.DataFrame: The signals of every shard.
+            list: Symbols the workers could not download.
+            list: Symbols of shards that never completed (their worker kept crashing or failing):
+                nothing is known about them, they are run again next time.
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT shard, symbols, status, signals_file, failed_symbols, error FROM shards "
+                "WHERE run_id = ? ORDER BY shard", (run_id,)
+            ).fetchall()
+
+        frames, failed_symbols, incomplete, entries = [], [], [], {}
+        for shard, symbols, status, signals_file, shard_failed, error in rows:
+            # The bars of a shard that failed later on (e.g. while screening) are stored too
+            manifest_file = self.manifest_file(run_id, shard)
+            if os.path.exists(manifest_file):
+                with open(manifest_file) as f:
+                    entries.update(json.load(f))
+            if status != 'done':
+                logging.error(f"Shard {shard} of run {run_id} failed ({error}), its symbols are skipped.")
+                incomplete.extend(json.loads(symbols))
+                continue
+            failed_symbols.extend(json.loads(shard_failed or '[]'))
+            signals = pd.read_csv(signals_file, parse_dates=['Datetime'])
+            if not signals.empty:
+                frames.append(signals)
+
+        if entries:
+            StockFetch().merge_manifest(entries)
+        signals = StockScreener.save_signals(frames, output_file)
+        shutil.rmtree(os.path.join(self.shard_dir, run_id), ignore_errors=True)
+        return signals, failed_symbols, incomplete
+
+    def manifest_file(self, run_id, shard):
+        """File of a shard's fetch manifest entries, merged into the shared manifest with the signals."""
+        return os.path.join(self.shard_dir, run_id, f"manifest_{shard:03d}.json")
+
+    def run(self, indicators, output_file=None, symbols=None, shards=None, workers=None,
+            lookback_days=config.SIGNAL_LOOKBACK_DAYS, persist=None):
+        """
+        Run the pipeline over every symbol in shards, with local worker processes, and merge the results.
+
+        Local workers that exit while shards remain (e.g. after a crash) are
+        replaced, and the shards they held are reassigned right away; workers
+        on other hosts may join the run meanwhile. Only the symbols the workers
+        failed to download are removed from SYMBOLS_FILE; those of shards that
+        never completed are kept for the next run and listed in
+        `incomplete_symbols`.
+
+        Parameters:
+            indicators (list): Indicator functions to screen with.
+            output_file (str or SignalStore): Signal output receiving the merged signals, or None.
+            symbols (list): Symbols to run; defaults to SYMBOLS_FILE.
+            shards (int): Number of shards; defaults to SHARD_COUNT.
+            workers (int): Local worker processes; defaults to SHARD_WORKERS.
+            lookback_days (int): Signal window, or None for all signals.
+            persist (bool): Whether the workers write the bars they fetch; defaults to PIPELINE_PERSIST.
+
+        Returns:
+            pd.DataFrame: The merged signals.
+            list: Symbols that failed to download.
+        """
+        symbols = pd.read_csv(config.SYMBOLS_FILE)['Symbol'].tolist() if symbols is None else symbols
+        workers = workers or config.SHARD_WORKERS
+        persist = config.PIPELINE_PERSIST if persist is None else persist
+
+        with metrics.stage('shards') as stage:
+            run_id = self.create_run(symbols, indicators, shards, lookback_days, persist)
+            print(f"Sharded run {run_id}: {len(symbols)} symbols, {sum(self.status(run_id).values())} shards")
+
+            processes, crashes = {}, 0
+            while not self.finished(run_id):
+                for name, process in list(processes.items()):
+                    if not process.is_alive():
+                        if process.exitcode != 0:
+                            crashes += 1
+                            if self.release(run_id, name):
+                                print(f"Worker {name} exited with code {process.exitcode}, its shard is reassigned.")
+                        del processes[name]
+                if crashes > config.SHARD_MAX_ATTEMPTS * max(workers, 1):
+                    raise RuntimeError(f"Sharded run {run_id}: workers keep exiting, see the log.")
+                status = self.status(run_id)
+                wanted = min(workers, status.get('pending', 0) + status.get('running', 0))
+                while len(processes) < wanted:
+                    # The local workers share the download rate limit
+                    process = multiprocessing.Process(target=run_worker, daemon=True,
+                                                      args=(self.db_path, run_id, self.shard_dir, workers))
+                    process.start()
+                    processes[worker_name(process.pid)] = process
+                time.sleep(config.SHARD_POLL_INTERVAL)
+
+            for process in processes.values():
+                process.join()
+
+            with closing(self._connect()) as conn:
+                for shard, started, finished in conn.execute(
+                        "SELECT shard, started, finished FROM shards WHERE run_id = ? AND status = 'done'", (run_id,)):
+                    stage.add_timing(f"shard {shard}", finished - started)
+            stage.items = len(symbols)
+            signals, failed_symbols, self.incomplete_symbols = self.merge(run_id, output_file)
+            print(f"Shards: {self.status(run_id)}")
+        if self.incomplete_symbols:
+            get_file_logger(config.LOG_FILE).info(
+                f"Symbols of incomplete shards, kept for the next run: {', '.join(self.incomplete_symbols)}")
+
+        if failed_symbols:
+            remove_failed_symbols(failed_symbols)
+        return signals, failed_symbols
+
+
+def remove_failed_symbols(failed_symbols):
+    """Remove symbols that failed to download from SYMBOLS_FILE, as a single StockFetch run does."""
+    log = get_file_logger(config.LOG_FILE).info
+    log(f"Symbols that failed to download: {', '.join(failed_symbols)}")
+    symbols_df = pd.read_csv(config.SYMBOLS_FILE)
+    symbols_df = symbols_df[~symbols_df['Symbol'].isin(failed_symbols)]
+    symbols_df.to_csv(config.SYMBOLS_FILE, index=False)
+    log("Failed symbols removed from the symbols CSV file.")
+    flush_logs()
+
+
+def worker_name(pid=None):
+    """Name identifying a worker in the coordination table."""
+    return f"{socket.gethostname()}:{pid or os.getpid()}"
+
+
+class ShardWorker:
+    """
+    Runs shards of a sharded run until none is left.
+
+    A shard is fetched, prepared and screened like the 'memory' pipeline
+    mode, with a heartbeat thread keeping its lease while it runs.
+    """
+
+    def __init__(self, coordinator, run_id, name=None, rate_share=1):
+        """
+        Parameters:
+            coordinator (ShardCoordinator): Coordination table of the run.
+            run_id (str): The run to work on.
+            name (str): Worker name; defaults to host:pid.
+            rate_share (int): Workers fetching at once on this host, which share FETCH_RATE_LIMIT.
+        """
+        self.coordinator = coordinator
+        self.rate_share = rate_share
+        self.run_id, names, self.lookback_days, self.persist = coordinator.run_info(run_id)
+        self.indicators = resolve_indicators(names)
+        self.name = name or worker_name()
+
+    def run_shard(self, shard, symbols):
+        """
+        Fetch, prepare and screen one shard's symbols.
+
+        Returns:
+            str: CSV file with the shard's signals.
+            list: Symbols that failed to download.
+        """
+        directory = os.path.join(self.coordinator.shard_dir, self.run_id)
+        StockFetch.ensure_directory_exists(directory)
+        fetcher = StockFetch(symbols=symbols, manifest_output=self.coordinator.manifest_file(self.run_id, shard),
+                             rate_share=self.rate_share)
+        StockFetch.ensure_directory_exists(config.STOCK_POST_DIR)
+        screener = StockScreener(stock_dir=config.STOCK_POST_DIR)
+        window = screener.window(self.indicators, self.lookback_days)
+
+        all_signals = []
+        for symbol, data in fetcher.iter_stock_data(persist=self.persist):
+            data = StockPrep.prepare(symbol, data)
+            if data is not None:
+                all_signals.extend(screener.screen_symbol(self.indicators, symbol, data, window=window))
+        signals = StockScreener.save_signals(all_signals, None)
+
+        # Written under a temporary name, so a half-written file is never merged
+        signals_file = os.path.join(directory, f"shard_{shard:03d}.csv")
+        signals.to_csv(signals_file + '.tmp', index=False, columns=['Datetime', 'symbol', 'signal type'])
+        os.replace(signals_file + '.tmp', signals_file)
+        return signals_file, fetcher.failed_symbols
+
+    def _heartbeat(self, shard, done):
+        while not done.wait(config.SHARD_LEASE / 3):
+            if not self.coordinator.heartbeat(self.run_id, shard, self.name):
+                logging.warning(f"Shard {shard} was reassigned away from {self.name}.")
+                return
+
+    def run(self):
+        """
+        Claim and run shards until the run is finished.
+
+        Returns:
+            int: Number of shards this worker completed.
+        """
+        completed = 0
+        while True:
+            claim = self.coordinator.claim(self.run_id, self.name)
+            if claim is None:
+                if self.coordinator.finished(self.run_id):
+                    return completed
+                # Shards are still running elsewhere: wait in case one of their workers dies
+                time.sleep(config.SHARD_POLL_INTERVAL)
+                continue
+
+            shard, symbols = claim
+            done = threading.Event()
+            heartbeat = threading.Thread(target=self._heartbeat, args=(shard, done), daemon=True)
+            heartbeat.start()
+            try:
+                signals_file, failed_symbols = self.run_shard(shard, symbols)
+                if self.coordinator.complete(self.run_id, shard, self.name, signals_file, failed_symbols):
+                    completed += 1
+            except Exception as e:
+                logging.error(f"❌ Shard {shard} failed on {self.name}: {e}")
+                self.coordinator.fail(self.run_id, shard, self.name, str(e))
+            finally:
+                done.set()
+                heartbeat.join()
+
+
+def run_worker(db_path=None, run_id=None, shard_dir=None, rate_share=1):
+    """Entry point of a worker process: run shards of `run_id` (default: the latest run)."""
+    worker = ShardWorker(ShardCoordinator(db_path, shard_dir), run_id, rate_share=rate_share)
+    completed = worker.run()
+    print(f"Worker {worker.name} completed {completed} shard(s) of run {worker.run_id}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline in shards, or join a sharded run as a worker.")
+    parser.add_argument('command', choices=['run', 'worker', 'status'])
+    parser.add_argument('--run', dest='run_id', help="Run to join or inspect (default: the latest)")
+    parser.add_argument('--shards', type=int, default=config.SHARD_COUNT)
+    parser.add_argument('--workers', type=int, default=config.SHARD_WORKERS, help="Local worker processes")
+    args = parser.parse_args()
+
+    coordinator = ShardCoordinator()
+    if args.command == 'run':
+        from stock_signals import SignalStore
+        output = SignalStore(config.SIGNAL_DB_FILE) if config.SIGNAL_BACKEND == 'sqlite' else config.CONSOLIDATED_OUTPUT_FILE
+        signals, failed = coordinator.run(resolve_indicators(DEFAULT_INDICATORS), output, shards=args.shards,
+                                          workers=args.workers)
+        print(f"{len(signals)} signals saved to {output}, {len(failed)} failed symbols, "
+              f"{len(coordinator.incomplete_symbols)} in incomplete shards")
+    elif args.command == 'worker':
+        run_worker(run_id=args.run_id)
+    else:
+        run_id = coordinator.run_info(args.run_id)[0]
+        print(run_id, coordinator.status(run_id))
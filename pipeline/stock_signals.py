@@ -0,0 +1,186 @@
+import os
+import time
+import sqlite3
+from datetime import datetime, timedelta
+from contextlib import closing
+import pandas as pd
+import config  # Import only the config file, no other project modules
+
+# Indexed store for screener signals.
+#
+# Signals live in one SQLite table keyed by (datetime, symbol, signal type)
+# that persists across runs: re-running the screener over the same bars inserts
+# nothing new, and the lookback query of StockFilter is a range scan on the
+# leading datetime column instead of a parse of the whole CSV. Rotation renames
+# the live table to a timestamped snapshot (a metadata-only operation) rather
+# than moving files; it runs every SIGNAL_ROTATE_DAYS, not on every run, and
+# carries the signals of the lookback window over to the new live table, so
+# a run right after a rotation still recognizes the signals it already found.
+
+
+class SignalStore:
+    """
+    SQLite-backed signal table with idempotent upserts and snapshot rotation.
+
+    Rows hold the screener columns: Datetime, symbol, signal type. Datetimes
+    are stored as int64 nanoseconds since the epoch. The time of the last
+    rotation is kept in a `meta` table.
+    """
+    table = 'signals'
+    snapshot_prefix = 'signals_'
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or config.SIGNAL_DB_FILE
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with closing(self._connect()) as conn, conn:
+            self._create(conn)
+
+    def __str__(self):
+        return self.db_path
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+        return conn
+
+    def _create(self, conn):
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "datetime INTEGER NOT NULL, symbol TEXT NOT NULL, signal_type TEXT NOT NULL, "
+            "PRIMARY KEY (datetime, symbol, signal_type)) WITHOUT ROWID"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL)")
+        # A new store counts as just rotated
+        conn.execute("INSERT OR IGNORE INTO meta VALUES ('rotated', ?)", (time.time(),))
+
+    def upsert(self, signals):
+        """
+        Insert signals, ignoring rows that are already stored (live or in the latest snapshot).
+
+        Parameters:
+            signals (pd.DataFrame): Columns Datetime, symbol, signal type.
+
+        Returns:
+            int: Number of new rows.
+        """
+        records = list(zip(
+            pd.to_datetime(signals['Datetime']).to_numpy(dtype='datetime64[ns]').astype('int64').tolist(),
+            signals['symbol'].astype(str).tolist(),
+            signals['signal type'].astype(str).tolist(),
+        ))
+        latest = self.snapshots()[-1:]
+        with closing(self._connect()) as conn, conn:
+            before = conn.total_changes
+            if latest:
+                # Signals found before the last rotation (and older than what it carried over) are not new either
+                conn.executemany(
+                    f"INSERT OR IGNORE INTO {self.table} SELECT ?, ?, ? WHERE NOT EXISTS ("
+                    f'SELECT 1 FROM "{latest[0]}" WHERE datetime = ? AND symbol = ? AND signal_type = ?)',
+                    [record + record for record in records]
+                )
+            else:
+                conn.executemany(f"INSERT OR IGNORE INTO {self.table} VALUES (?, ?, ?)", records)
+            return conn.total_changes - before
+
+    def query(self, start=None, end=None):
+        """
+        Read signals in a date window (an index range scan).
+
+        Parameters:
+            start: Earliest signal to return (inclusive), anything `pd.Timestamp` accepts.
+            end: Latest signal to return (inclusive).
+
+        Returns:
+            pd.DataFrame: Columns Datetime, symbol, signal type, ordered by datetime.
+        """
+        query = f"SELECT datetime, symbol, signal_type FROM {self.table}"
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("datetime >= ?")
+            params.append(pd.Timestamp(start).value)
+        if end is not None:
+            clauses.append("datetime <= ?")
+            params.append(pd.Timestamp(end).value)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY datetime, symbol, signal_type"
+
+        with closing(self._connect()) as conn:
+            signals = pd.read_sql_query(query, conn, params=params)
+        signals.columns = ['Datetime', 'symbol', 'signal type']
+        signals['Datetime'] = pd.to_datetime(signals['Datetime'], unit='ns')
+        return signals
+
+    def count(self):
+        """Number of live signals."""
+        with closing(self._connect()) as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def snapshots(self):
+        """Names of the rotated snapshot tables, oldest first."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE ? ORDER BY name",
+                (f"{self.snapshot_prefix}%",)
+            )
+            return [row[0] for row in rows]
+
+    def last_rotation(self):
+        """Time of the last rotation (or of the store's creation), in seconds since the epoch."""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT value FROM meta WHERE key = 'rotated'").fetchone()[0]
+
+    def rotate_if_due(self, every_days=None, keep=None):
+        """
+        Rotate when the last rotation is at least `every_days` old (see `rotate`).
+
+        Parameters:
+            every_days (float): Rotation period in days (0 = never); defaults to SIGNAL_ROTATE_DAYS.
+            keep (int): Snapshots to retain, see `rotate`.
+
+        Returns:
+            str: Name of the new snapshot, or None if no rotation was due or there was nothing to rotate.
+        """
+        every_days = config.SIGNAL_ROTATE_DAYS if every_days is None else every_days
+        if not every_days or time.time() - self.last_rotation() < every_days * 86400:
+            return None
+        return self.rotate(keep)
+
+    def rotate(self, keep=None, carry_days=None):
+        """
+        Move the live signals to a timestamped snapshot table and start a new one.
+
+        The signals of the last `carry_days` days are copied into the new live
+        table, so the lookback query and the deduplication of the next runs
+        still see them.
+
+        Parameters:
+            keep (int): Number of snapshots to retain, oldest are dropped (0 = all); defaults to SIGNAL_SNAPSHOTS_KEEP.
+            carry_days (float): Days of signals carried over; defaults to SIGNAL_LOOKBACK_DAYS.
+
+        Returns:
+            str: Name of the new snapshot, or None if there were no signals to rotate.
+        """
+        keep = config.SIGNAL_SNAPSHOTS_KEEP if keep is None else keep
+        carry_days = config.SIGNAL_LOOKBACK_DAYS if carry_days is None else carry_days
+        if self.count() == 0:
+            return None
+
+        existing = set(self.snapshots())
+        base = f"{self.snapshot_prefix}{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        snapshot, suffix = base, 1
+        while snapshot in existing:  # Several rotations within a second
+            snapshot, suffix = f"{base}_{suffix}", suffix + 1
+
+        carry_since = pd.Timestamp(datetime.now() - timedelta(days=carry_days)).value  # Same cutoff as StockFilter
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f'ALTER TABLE {self.table} RENAME TO "{snapshot}"')
+            self._create(conn)
+            conn.execute(f'INSERT INTO {self.table} SELECT * FROM "{snapshot}" WHERE datetime >= ?', (carry_since,))
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('rotated', ?)", (time.time(),))
+            if keep:
+                for old in sorted(existing | {snapshot})[:-keep]:
+                    conn.execute(f'DROP TABLE "{old}"')
+        return snapshot
@@ -0,0 +1,170 @@
+import os
+import json
+import math
+
+# Streaming (one bar at a time) versions of the indicator recursions.
+#
+# Each state is a plain dict so it can be persisted as JSON between runs. The
+# update functions follow TA-Lib's seeding and arithmetic step for step (SMA
+# seed summed in order, leading NaNs skipped, same operation order), so feeding
+# a series bar by bar, across any number of runs, gives the same values as a
+# talib call on the whole series.
+
+NAN = float('nan')
+
+
+def ema_state(period):
+    """State of an EMA that has not seen any value yet."""
+    return {'period': period, 'count': 0, 'total': 0.0, 'value': NAN}
+
+
+def ema_update(state, value):
+    """
+    Feed one value to an EMA.
+
+    :param state: State from `ema_state`, updated in place.
+    :param value: Next input value.
+    :return: EMA after this value (NaN during the first `period - 1` values).
+    """
+    if state['count'] == 0 and math.isnan(value):
+        return NAN  # Leading NaNs are skipped, like talib does
+
+    period = state['period']
+    state['count'] += 1
+    if state['count'] <= period:
+        state['total'] += value
+        if state['count'] < period:
+            return NAN
+        state['value'] = state['total'] / period
+    else:
+        state['value'] = (value - state['value']) * (2.0 / (period + 1)) + state['value']
+    return state['value']
+
+
+def macd_state(fast_length, slow_length, signal_length):
+    """State of a MACD that has not seen any close yet."""
+    return {
+        'fast_length': fast_length,
+        'slow_length': slow_length,
+        'count': 0,
+        'slow_total': 0.0,
+        'window': [],  # Last `fast_length` closes, kept until both EMAs are seeded
+        'fast': NAN,
+        'slow': NAN,
+        'signal': ema_state(signal_length),
+    }
+
+
+def macd_update(state, close):
+    """
+    Feed one close to a MACD.
+
+    As in talib.MACD, both EMAs are seeded on the `slow_length`-th close; the
+    fast EMA uses the last `fast_length` closes of that window as its seed.
+
+    :return: (macd, signal) after this close, NaN until the signal line starts.
+    """
+    if state['count'] == 0 and math.isnan(close):
+        return NAN, NAN
+
+    fast_length, slow_length = state['fast_length'], state['slow_length']
+    state['count'] += 1
+    if state['count'] <= slow_length:
+        state['slow_total'] += close
+        state['window'] = (state['window'] + [close])[-fast_length:]
+        if state['count'] < slow_length:
+            return NAN, NAN
+        state['slow'] = state['slow_total'] / slow_length
+        state['fast'] = sum(state['window']) / fast_length
+        state['window'] = []
+    else:
+        state['fast'] = (close - state['fast']) * (2.0 / (fast_length + 1)) + state['fast']
+        state['slow'] = (close - state['slow']) * (2.0 / (slow_length + 1)) + state['slow']
+
+    line = state['fast'] - state['slow']
+    signal = ema_update(state['signal'], line)
+    if math.isnan(signal):
+        return NAN, NAN
+    return line, signal
+
+
+def rsi_state(period):
+    """State of an RSI that has not seen any close yet."""
+    return {'period': period, 'previous': NAN, 'count': 0, 'gain': 0.0, 'loss': 0.0}
+
+
+def rsi_update(state, close):
+    """
+    Feed one close to Wilder's RSI.
+
+    :return: RSI after this close (NaN until `period` changes have been seen).
+    """
+    if math.isnan(state['previous']) and state['count'] == 0:
+        state['previous'] = close
+        return NAN
+
+    period = state['period']
+    change = close - state['previous']
+    state['previous'] = close
+    state['count'] += 1
+
+    if state['count'] > period:
+        state['gain'] *= period - 1
+        state['loss'] *= period - 1
+    if change < 0:
+        state['loss'] -= change
+    else:
+        state['gain'] += change
+    if state['count'] < period:
+        return NAN
+    state['gain'] /= period
+    state['loss'] /= period
+
+    total = state['gain'] + state['loss']
+    return 0.0 if -1e-14 < total < 1e-14 else 100 * (state['gain'] / total)
+
+
+def tema_state(period):
+    """State of a triple EMA that has not seen any close yet."""
+    return {'ema1': ema_state(period), 'ema2': ema_state(period), 'ema3': ema_state(period)}
+
+
+def tema_update(state, close):
+    """
+    Feed one close to a triple EMA (each EMA is fed the previous one's output).
+
+    :return: TEMA after this close (NaN until the third EMA is seeded).
+    """
+    ema1 = ema_update(state['ema1'], close)
+    ema2 = ema_update(state['ema2'], ema1)
+    ema3 = ema_update(state['ema3'], ema2)
+    return 3 * (ema1 - ema2) + ema3
+
+
+class IndicatorStateStore:
+    """
+    JSON file holding the streaming indicator state of every symbol.
+
+    Layout: {symbol: {'last': ISO timestamp of the last bar fed, 'last_close':
+    its close, 'indicators': {indicator name: state}}}.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def load(self):
+        """Return the stored states, or an empty dict if there are none."""
+        if not os.path.exists(self.file_path):
+            return {}
+        with open(self.file_path) as f:
+            return json.load(f)
+
+    def save(self, states):
+        """Atomically replace the stored states."""
+        directory = os.path.dirname(self.file_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_file = self.file_path + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(states, f)  # Floats round-trip exactly, NaN included
+        os.replace(tmp_file, self.file_path)
@@ -0,0 +1,527 @@
+import os
+import sqlite3
+import logging
+import argparse
+from contextlib import closing
+import pandas as pd
+import config  # Import only the config file, no other project modules
+
+
+def normalize_bars(data):
+    """
+    Convert stock bars to the typed layout shared by every storage backend.
+
+    Parameters:
+        data (pd.DataFrame): Bars either as returned by `yf.download` (columns
+            MultiIndex of Price/Ticker) or already flat (one column per field).
+
+    Returns:
+        pd.DataFrame: Flat float64 columns (Open, High, Low, Close, Volume, ...) on a
+            naive datetime64 index named 'Datetime'. Unparseable datetimes become NaT
+            and are kept so callers can report them.
+    """
+    # Already in the stored layout (e.g., just normalized at fetch time): nothing to do
+    if (not isinstance(data.columns, pd.MultiIndex) and isinstance(data.index, pd.DatetimeIndex)
+            and data.index.tz is None and data.index.name == 'Datetime' and (data.dtypes == 'float64').all()):
+        return data
+
+    data = data.copy()
+
+    # Flatten the (Price, Ticker) header produced by yfinance
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+    data.columns.name = None
+
+    if 'Datetime' in data.columns:
+        data = data.set_index('Datetime')
+
+    # Parse timestamps; intraday bars carry UTC offsets, so compare everything as naive UTC
+    index = data.index
+    if not (isinstance(index, pd.DatetimeIndex) and index.tz is None):
+        index = pd.to_datetime(index, errors='coerce', utc=True).tz_localize(None)
+    data.index = pd.DatetimeIndex(index, name='Datetime')
+
+    return data.apply(pd.to_numeric, errors='coerce').astype('float64')
+
+
+def clean_bars(data):
+    """
+    Drop bars with invalid datetimes, de-duplicate on datetime (last wins) and sort.
+
+    Parameters:
+        data (pd.DataFrame): Normalized bars (see `normalize_bars`).
+
+    Returns:
+        pd.DataFrame: Cleaned bars.
+    """
+    if data.index.is_monotonic_increasing and data.index.is_unique and not data.index.hasnans:
+        return data  # Already clean
+    data = data[data.index.notna()]
+    data = data[~data.index.duplicated(keep='last')]
+    return data.sort_index()
+
+
+def tail_bars(data, bars, since):
+    """
+    Slice a series to the bars from `since` on plus `bars` bars before it.
+
+    :return: The slice, or None if the series has no bar at or after `since`.
+    """
+    window_start = data.index.searchsorted(pd.Timestamp(since))
+    if window_start >= len(data):
+        return None
+    return data.iloc[max(window_start - bars, 0):]
+
+
+def read_bar_file(file_path):
+    """
+    Read one stored bar file of any supported format.
+
+    Parameters:
+        file_path (str): Path to a .csv, .parquet or .feather file.
+
+    Returns:
+        pd.DataFrame: Normalized (not cleaned) bars.
+    """
+    extension = os.path.splitext(file_path)[1]
+    store_class = next(
+        (cls for cls in BACKENDS.values() if cls.extension == extension and not cls.consolidated), None
+    )
+    if store_class is None:
+        raise ValueError(f"Unsupported bar file format: {file_path}")
+    return store_class.read_file(file_path)
+
+
+class BarStore:
+    """
+    Base class for storing one bar series per symbol in a directory.
+
+    Subclasses set `extension` and implement `read_file`/`write_file`.
+    `bytes_read`/`bytes_written` count the I/O done through the store (file
+    sizes; row payload for consolidated stores), for the run report.
+    """
+    extension = None
+    consolidated = False  # True when all symbols live in a single file
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.bytes_read = 0
+        self.bytes_written = 0
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def path(self, symbol):
+        """Return the file path holding a symbol's bars."""
+        return os.path.join(self.directory, f"{symbol}{self.extension}")
+
+    def exists(self, symbol):
+        """Return True if bars are stored for the symbol."""
+        return os.path.exists(self.path(symbol))
+
+    def symbols(self):
+        """Return the sorted list of symbols stored in the directory."""
+        return sorted(
+            os.path.splitext(file_name)[0]
+            for file_name in os.listdir(self.directory)
+            if file_name.endswith(self.extension)
+        )
+
+    def read(self, symbol):
+        """Read a symbol's bars as a normalized DataFrame."""
+        file_path = self.path(symbol)
+        data = self.read_file(file_path)
+        self.bytes_read += os.path.getsize(file_path)
+        return data
+
+    def iter_bars(self, symbols=None, start=None, end=None):
+        """
+        Read many symbols, optionally restricted to a date window.
+
+        File backends read one file per symbol and filter in memory; consolidated
+        backends override this to push the predicates down to the store.
+
+        Parameters:
+            symbols (list): Symbols to read; defaults to every stored symbol.
+            start: Earliest bar to return (inclusive), anything `pd.Timestamp` accepts.
+            end: Latest bar to return (inclusive).
+
+        Yields:
+            tuple: (symbol, DataFrame) for each stored symbol with bars in the window.
+        """
+        for symbol in (self.symbols() if symbols is None else symbols):
+            if not self.exists(symbol):
+                continue
+            try:
+                data = self.read(symbol)
+            except Exception as e:
+                logging.error(f"Error reading bars for {symbol} from {self.path(symbol)}: {e}")
+                continue
+            if start is not None or end is not None:
+                data = data.loc[pd.Timestamp(start) if start is not None else None:
+                                pd.Timestamp(end) if end is not None else None]
+            if not data.empty:
+                yield symbol, data
+
+    def iter_tail(self, symbols=None, bars=0, since=None):
+        """
+        Read the end of many series: every bar from `since` on, plus `bars` bars before it.
+
+        Used to load only what indicators need to produce signals after `since`
+        (their warm-up plus the window itself). Symbols without any bar at or
+        after `since` are skipped. File backends read whole files and slice them
+        in memory; consolidated backends push the limit down to the store.
+
+        Parameters:
+            symbols (list): Symbols to read; defaults to every stored symbol.
+            bars (int): Number of bars to keep before `since`.
+            since: Start of the window, anything `pd.Timestamp` accepts.
+
+        Yields:
+            tuple: (symbol, DataFrame) for each symbol with bars in the window.
+        """
+        for symbol, data in self.iter_bars(symbols=symbols):
+            tail = tail_bars(data, bars, since)
+            if tail is not None:
+                yield symbol, tail
+
+    def write(self, symbol, data):
+        """
+        Normalize, clean and store a symbol's bars, replacing any stored series.
+
+        :return: Path to the written file.
+        """
+        file_path = self.path(symbol)
+        self.write_file(clean_bars(normalize_bars(data)), file_path)
+        self.bytes_written += os.path.getsize(file_path)
+        return file_path
+
+    def append(self, symbol, data):
+        """
+        Add bars newer than the stored ones to a symbol's series (a bar at the same time replaces the stored one).
+
+        This base implementation rewrites the file, for formats that can't be appended to.
+
+        :return: Path to the written file.
+        """
+        if self.exists(symbol):
+            data = pd.concat([self.read(symbol), normalize_bars(data)])
+        return self.write(symbol, data)
+
+    def write_many(self, items):
+        """
+        Store many symbols at once.
+
+        :param items: Iterable of (symbol, DataFrame) pairs.
+        :return: List of paths written; symbols that fail are logged and skipped.
+        """
+        written = []
+        for symbol, data in items:
+            try:
+                written.append(self.write(symbol, data))
+            except Exception as e:
+                logging.error(f"Error writing bars for {symbol} to {self.path(symbol)}: {e}")
+        return written
+
+    def delete(self, symbol):
+        """Remove a symbol's bars from the store."""
+        if self.exists(symbol):
+            os.remove(self.path(symbol))
+
+    @staticmethod
+    def read_file(file_path):
+        raise NotImplementedError
+
+    @staticmethod
+    def write_file(data, file_path):
+        raise NotImplementedError
+
+
+class CsvBarStore(BarStore):
+    """CSV backend; also reads the legacy three-row yfinance header layout."""
+    extension = '.csv'
+
+    @staticmethod
+    def read_file(file_path):
+        with open(file_path) as f:
+            f.readline()
+            second_line = f.readline()
+
+        if second_line.startswith('Ticker'):
+            # Raw yfinance layout: Price/Ticker header rows followed by a Date row
+            data = pd.read_csv(file_path, header=[0, 1], index_col=0)
+        else:
+            data = pd.read_csv(file_path, index_col=0)
+        return normalize_bars(data)
+
+    @staticmethod
+    def write_file(data, file_path):
+        data.to_csv(file_path, index_label='Datetime')
+
+    def append(self, symbol, data):
+        """Append the rows of bars newer than the stored ones to the end of the file."""
+        file_path = self.path(symbol)
+        if not os.path.exists(file_path):
+            return self.write(symbol, data)
+        with open(file_path) as f:
+            header = f.readline().rstrip('\n').split(',')
+            second_line = f.readline()
+        if second_line.startswith('Ticker') or header[0] != 'Datetime':
+            return super().append(symbol, data)  # Legacy layout: rewrite it in the normalized one
+        size = os.path.getsize(file_path)
+        clean_bars(normalize_bars(data)).reindex(columns=header[1:]).to_csv(file_path, mode='a', header=False)
+        self.bytes_written += os.path.getsize(file_path) - size
+        return file_path
+
+
+class ParquetBarStore(BarStore):
+    """Parquet backend (requires pyarrow); typed columns, no text parsing on load."""
+    extension = '.parquet'
+
+    @staticmethod
+    def read_file(file_path):
+        return normalize_bars(pd.read_parquet(file_path))
+
+    @staticmethod
+    def write_file(data, file_path):
+        data.to_parquet(file_path)
+
+
+class FeatherBarStore(BarStore):
+    """Arrow IPC (Feather) backend (requires pyarrow); fastest to load, uncompressed."""
+    extension = '.feather'
+
+    @staticmethod
+    def read_file(file_path):
+        return normalize_bars(pd.read_feather(file_path).set_index('Datetime'))
+
+    @staticmethod
+    def write_file(data, file_path):
+        data.reset_index().to_feather(file_path)
+
+
+class SqliteBarStore(BarStore):
+    """
+    Consolidated backend: every symbol in one SQLite file keyed by (symbol, datetime).
+
+    Bulk reads are a single query with the symbol subset and date window pushed
+    down to the primary key, instead of one open/parse per symbol file.
+    Datetimes are stored as int64 nanoseconds since the epoch, so loading
+    involves no text parsing.
+    """
+    extension = '.sqlite'
+    consolidated = True
+    file_name = 'bars.sqlite'
+    columns = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+    max_query_symbols = 500  # Symbols bound per query, below SQLITE_MAX_VARIABLE_NUMBER (999 before SQLite 3.32)
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.db_path = os.path.join(directory, self.file_name)
+        self.stored = None  # Set of stored symbols, read once for `exists`
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bars ("
+                "symbol TEXT NOT NULL, datetime INTEGER NOT NULL, "
+                "open REAL, high REAL, low REAL, close REAL, adj_close REAL, volume REAL, "
+                "PRIMARY KEY (symbol, datetime)) WITHOUT ROWID"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+        return conn
+
+    def path(self, symbol):
+        """Return a display path for a symbol's rows inside the database."""
+        return f"{self.db_path}#{symbol}"
+
+    def exists(self, symbol):
+        # Called once per symbol (e.g., by every incremental fetch): answered from the stored
+        # symbols, read with a single query and kept up to date by this store's writes
+        if self.stored is None:
+            self.symbols()
+        return symbol in self.stored
+
+    def symbols(self):
+        with closing(self._connect()) as conn:
+            symbols = [row[0] for row in conn.execute("SELECT DISTINCT symbol FROM bars ORDER BY symbol")]
+        self.stored = set(symbols)
+        return symbols
+
+    def read(self, symbol):
+        bars = dict(self.iter_bars(symbols=[symbol]))
+        if symbol not in bars:
+            raise KeyError(f"No bars stored for {symbol} in {self.db_path}")
+        return bars[symbol]
+
+    def iter_bars(self, symbols=None, start=None, end=None):
+        query = "SELECT symbol, datetime, open, high, low, close, adj_close, volume FROM bars"
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("datetime >= ?")
+            params.append(pd.Timestamp(start).value)
+        if end is not None:
+            clauses.append("datetime <= ?")
+            params.append(pd.Timestamp(end).value)
+
+        if symbols is None:
+            chunks = [None]
+        else:
+            # Sorted chunks of bound symbols keep the output ordered by symbol, like a single query
+            symbols = sorted(set(symbols))
+            chunks = [symbols[offset:offset + self.max_query_symbols]
+                      for offset in range(0, len(symbols), self.max_query_symbols)]
+
+        with closing(self._connect()) as conn:
+            for chunk in chunks:
+                chunk_clauses, chunk_params = list(clauses), list(params)
+                if chunk is not None:
+                    chunk_clauses.insert(0, f"symbol IN ({', '.join('?' * len(chunk))})")
+                    chunk_params[:0] = chunk
+                chunk_query = query
+                if chunk_clauses:
+                    chunk_query += " WHERE " + " AND ".join(chunk_clauses)
+                chunk_query += " ORDER BY symbol, datetime"
+                rows = pd.read_sql_query(chunk_query, conn, params=chunk_params)
+                yield from self._group_rows(rows)
+
+    def iter_tail(self, symbols=None, bars=0, since=None):
+        if bars <= 0:
+            return self.iter_bars(symbols=symbols, start=since)
+
+        # One indexed query per symbol: find the bar `bars` rows before `since`
+        # (NULL if the history is shorter), then read forward from it
+        query = (
+            "SELECT symbol, datetime, open, high, low, close, adj_close, volume FROM bars "
+            "WHERE symbol = ? AND datetime >= COALESCE(("
+            "SELECT datetime FROM bars WHERE symbol = ? AND datetime < ? "
+            "ORDER BY datetime DESC LIMIT 1 OFFSET ?), datetime) "
+            "ORDER BY datetime"
+        )
+        since = pd.Timestamp(since).value
+        records = []
+        with closing(self._connect()) as conn:
+            for symbol in (self.symbols() if symbols is None else symbols):
+                rows = conn.execute(query, (symbol, symbol, since, bars - 1)).fetchall()
+                if rows and rows[-1][1] >= since:
+                    records.extend(rows)
+
+        rows = pd.DataFrame.from_records(
+            records, columns=['symbol', 'datetime', 'open', 'high', 'low', 'close', 'adj_close', 'volume']
+        )
+        return self._group_rows(rows)
+
+    def _group_rows(self, rows):
+        """Split rows of the bars table (ordered by symbol, datetime) into per-symbol frames."""
+        rows.columns = ['symbol', 'Datetime'] + self.columns
+        self.bytes_read += int(rows.memory_usage(index=False).sum())
+        rows['Datetime'] = pd.to_datetime(rows['Datetime'], unit='ns')
+        for symbol, data in rows.groupby('symbol', sort=False):
+            data = data.drop(columns='symbol').set_index('Datetime').dropna(axis=1, how='all')
+            yield symbol, data.astype('float64')
+
+    def write(self, symbol, data):
+        return self.write_many([(symbol, data)])[0]
+
+    def _insert(self, conn, symbol, data, replace_series):
+        """Insert a symbol's bars, replacing either its whole stored series or only the rows at the same times."""
+        data = clean_bars(normalize_bars(data)).reindex(columns=self.columns)
+        self.bytes_written += int(data.memory_usage().sum())
+        records = zip(
+            [symbol] * len(data),
+            data.index.as_unit('ns').asi8.tolist(),
+            *(data[column].astype(object).where(data[column].notna(), None) for column in self.columns)
+        )
+        if replace_series:
+            # Replace the stored series, as the file backends do
+            conn.execute("DELETE FROM bars WHERE symbol = ?", (symbol,))
+        conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?)", records)
+        if self.stored is not None and not data.empty:
+            self.stored.add(symbol)
+        return self.path(symbol)
+
+    def append(self, symbol, data):
+        """Insert the new rows only; the rest of the series is not touched."""
+        with closing(self._connect()) as conn, conn:
+            return self._insert(conn, symbol, data, replace_series=False)
+
+    def write_many(self, items):
+        with closing(self._connect()) as conn, conn:
+            return [self._insert(conn, symbol, data, replace_series=True) for symbol, data in items]
+
+    def delete(self, symbol):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM bars WHERE symbol = ?", (symbol,))
+        if self.stored is not None:
+            self.stored.discard(symbol)
+
+
+BACKENDS = {
+    'csv': CsvBarStore,
+    'parquet': ParquetBarStore,
+    'feather': FeatherBarStore,
+    'sqlite': SqliteBarStore,
+}
+
+
+def get_bar_store(directory, backend=None):
+    """
+    Create the bar store for a directory.
+
+    Parameters:
+        directory (str): Directory holding one file per symbol.
+        backend (str): Backend name ('csv', 'parquet', 'feather', 'sqlite'); defaults to STORAGE_BACKEND.
+
+    Returns:
+        BarStore: Store instance for the backend.
+    """
+    backend = backend or config.STORAGE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown storage backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
+    return BACKENDS[backend](directory)
+
+
+def migrate(source_backend, target_backend, directories=None, delete_source=False):
+    """
+    Convert every stored symbol from one backend to another.
+
+    Parameters:
+        source_backend (str): Backend the files are currently stored in.
+        target_backend (str): Backend to convert to.
+        directories (list): Directories to migrate; defaults to the raw and processed directories.
+        delete_source (bool): Remove each source file once it has been converted.
+
+    Returns:
+        list: Symbols that could not be migrated, as (directory, symbol) tuples.
+    """
+    failed = []
+    for directory in directories or [config.STOCK_PRE_DIR, config.STOCK_POST_DIR]:
+        source = get_bar_store(directory, source_backend)
+        target = get_bar_store(directory, target_backend)
+        symbols = source.symbols()
+        target.write_many(source.iter_bars(symbols))
+
+        # Only symbols that made it into the target count as migrated
+        migrated = set(target.symbols())
+        for symbol in symbols:
+            if symbol not in migrated:
+                print(f"Failed to migrate {symbol} in {directory}")
+                failed.append((directory, symbol))
+            elif delete_source:
+                source.delete(symbol)
+        print(f"Migrated {len(symbols)} symbols in {directory} from {source_backend} to {target_backend}.")
+    return failed
+
+
+# Main Execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert stored stock bars between storage backends.")
+    parser.add_argument('command', choices=['migrate'])
+    parser.add_argument('--from', dest='source', default='csv', choices=list(BACKENDS))
+    parser.add_argument('--to', dest='target', default=config.STORAGE_BACKEND, choices=list(BACKENDS))
+    parser.add_argument('--delete', action='store_true', help="Delete source files after conversion")
+    args = parser.parse_args()
+
+    if args.source == args.target:
+        parser.error("Source and target backends are the same.")
+    migrate(args.source, args.target, delete_source=args.delete)
@@ -0,0 +1,214 @@
+import time
+import queue
+import itertools
+import logging
+import threading
+import config  # Import only the config file, no other project modules
+
+# Streaming stage executor.
+#
+# Items (one symbol each) flow from a source iterator through a chain of
+# stages, each running on its own thread(s) and connected by bounded queues.
+# A full queue blocks the stage feeding it, so a slow screener throttles the
+# fetch instead of letting downloaded bars pile up: memory is bounded by the
+# queue sizes, not by the size of the universe, and later stages work on the
+# first symbols while the source is still producing the rest. Results come out
+# in the order of the source whatever the number of workers: items carry their
+# position, a result that completes ahead of an earlier one waits for it, and
+# the source is held back once as many items as the queues hold are in flight,
+# so waiting results don't lift the memory bound.
+
+_DONE = object()  # End-of-stream marker
+
+
+class StageStats:
+    """
+    Throughput and input-queue occupancy of one stage.
+
+    Attributes:
+        items (int): Items the stage produced.
+        errors (int): Items dropped because the stage raised.
+        busy (float): Seconds spent inside the stage function.
+    """
+
+    def __init__(self, name, capacity):
+        self.name = name
+        self.capacity = capacity  # Size of the stage's input queue (0 for the source)
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.started = None
+        self.finished = None
+        self.occupancy_total = 0
+        self.occupancy_max = 0
+        self.samples = 0
+        self.lock = threading.Lock()
+
+    def record(self, started, finished, produced, occupancy=None):
+        """Account for one call of the stage function."""
+        with self.lock:
+            self.started = started if self.started is None else min(self.started, started)
+            self.finished = finished if self.finished is None else max(self.finished, finished)
+            self.busy += finished - started
+            if produced:
+                self.items += 1
+            else:
+                self.errors += 1
+            if occupancy is not None:
+                self.occupancy_total += occupancy
+                self.occupancy_max = max(self.occupancy_max, occupancy)
+                self.samples += 1
+
+    def throughput(self):
+        """Items per second between the stage's first and last item."""
+        if self.started is None:
+            return 0.0
+        return self.items / max(self.finished - self.started, 1e-9)
+
+    def summary(self):
+        """One-line report of the stage."""
+        line = (f"{self.name}: {self.items} items ({self.errors} errors), "
+                f"{self.throughput():.1f} items/s, busy {self.busy:.2f}s")
+        if self.capacity:
+            mean = self.occupancy_total / self.samples if self.samples else 0
+            line += f", input queue avg {mean:.1f}/{self.capacity} max {self.occupancy_max}"
+        return line
+
+
+class StreamExecutor:
+    """
+    Run a source iterator through a chain of stages over bounded queues.
+
+    Each stage is a (name, function, workers) tuple; the function takes one
+    item and returns the item for the next stage, or None to drop it. An
+    exception raised for an item is logged and the item dropped; an exception
+    raised by the source ends the stream and is re-raised to the consumer
+    after the results of the items before it. Results are yielded in the
+    order of the source.
+    """
+
+    def __init__(self, stages, queue_size=None):
+        self.stages = stages
+        self.queue_size = max(1, queue_size or config.STREAM_QUEUE_SIZE)
+        self.stats = []
+
+    def _put(self, target, item, stop):
+        """Blocking put that gives up once the consumer has stopped."""
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _feed(self, source, source_stats, target, stop, failure, slots):
+        iterator = iter(source)
+        try:
+            for position in itertools.count():
+                # Wait for a slot: at most `slots` items are in flight or waiting to be yielded in order
+                while not slots.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                started = time.monotonic()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                source_stats.record(started, time.monotonic(), True)
+                self._put(target, (position, item), stop)
+        except Exception as e:
+            failure.append(e)
+        finally:
+            self._put(target, _DONE, stop)
+
+    def _work(self, name, function, stats, source, target, remaining, stop):
+        while not stop.is_set():
+            try:
+                item = source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                self._put(source, _DONE, stop)  # Let sibling workers see it too
+                with stats.lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    self._put(target, _DONE, stop)
+                return
+
+            position, item = item
+            if item is None:
+                self._put(target, (position, None), stop)  # Dropped upstream: keep its place in the order
+                continue
+            occupancy = source.qsize()
+            started = time.monotonic()
+            try:
+                result = function(item)
+            except Exception as e:
+                logging.error(f"Stage {name} failed: {e}")
+                stats.record(started, time.monotonic(), False, occupancy)
+                result = None
+            else:
+                stats.record(started, time.monotonic(), True, occupancy)
+            self._put(target, (position, result), stop)
+
+    def run(self, source, source_name='source'):
+        """
+        Stream the source through the stages.
+
+        Parameters:
+            source (iterable): Items to process, consumed on a dedicated thread.
+            source_name (str): Name of the source in the report.
+
+        Yields:
+            Results of the last stage, in the order of the source.
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        stop = threading.Event()
+        failure = []
+        slots = threading.Semaphore(self.queue_size * len(queues))
+
+        self.stats = [StageStats(source_name, 0)]
+        threads = [threading.Thread(
+            target=self._feed, args=(source, self.stats[0], queues[0], stop, failure, slots), daemon=True
+        )]
+        for index, (name, function, workers) in enumerate(self.stages):
+            stats = StageStats(name, self.queue_size)
+            self.stats.append(stats)
+            remaining = [max(1, workers)]
+            threads.extend(
+                threading.Thread(
+                    target=self._work,
+                    args=(name, function, stats, queues[index], queues[index + 1], remaining, stop),
+                    daemon=True
+                )
+                for _ in range(remaining[0])
+            )
+
+        for thread in threads:
+            thread.start()
+        waiting, next_position = {}, 0  # Results that completed ahead of an earlier item
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _DONE:
+                    break
+                position, result = item
+                waiting[position] = result
+                while next_position in waiting:
+                    result = waiting.pop(next_position)
+                    next_position += 1
+                    slots.release()
+                    if result is not None:
+                        yield result
+        finally:
+            stop.set()  # Unblocks every thread if the consumer stopped early
+            for thread in threads:
+                thread.join()
+
+        if failure:
+            raise failure[0]
+
+    def report(self):
+        """Per-stage throughput and queue occupancy of the last run."""
+        return "\n".join(stats.summary() for stats in self.stats)
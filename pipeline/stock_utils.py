@@ -2,6 +2,7 @@ import os
 import shutil
 from datetime import datetime
 import config
+from stock_signals import SignalStore
 
 
 class DataUtils:
@@ -41,7 +42,21 @@ class DataUtils:
             print(f"Directory does not exist: {path}")
 
     def backup_and_rename_signals(self):
-        """Backup the consolidated signals file with a timestamp."""
+        """
+        Backup the consolidated signals with a timestamp.
+
+        The SQLite signal store keeps its signals across runs (so re-runs
+        don't report them again) and is only rotated into a snapshot table
+        every SIGNAL_ROTATE_DAYS.
+        """
+        if config.SIGNAL_BACKEND == 'sqlite':
+            snapshot = SignalStore(config.SIGNAL_DB_FILE).rotate_if_due()
+            if snapshot:
+                print(f"Backup created: {config.SIGNAL_DB_FILE} table {snapshot}")
+            else:
+                print(f"Signals kept in: {config.SIGNAL_DB_FILE} (no rotation due)")
+            return
+
         if not os.path.exists(self.signal_backup_folder):
             os.makedirs(self.signal_backup_folder)
 
@@ -58,6 +73,6 @@ class DataUtils:
             print(f"No consolidated output file found at: {self.consolidated_output_file}")
 
     def reset_signal_generator(self):
-        """Reset the signal generator by cleaning up files and backing up signals."""
+        """Reset the signal generator by backing up signals and cleaning up files."""
+        self.backup_and_rename_signals()  # First, so the consolidated file is backed up before the cleanup
         self.delete_files_in_directory(self.signals_dir)
-        self.backup_and_rename_signals()
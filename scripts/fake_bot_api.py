@@ -0,0 +1,136 @@
+"""
+Local stand-in for the Telegram Bot API, to exercise TelegramNotifier offline.
+
+Answers getMe and sendMessage for any token, enforces the 4096-character
+message limit, and can simulate flood control (HTTP 429 with retry_after)
+and transient server errors. Every accepted message is printed and, with
+--log, appended to a JSON-lines file.
+
+Usage:
+    python scripts/fake_bot_api.py --port 8081 --rate 1 --fail-rate 0.1
+    TELEGRAM_API_URL=http://127.0.0.1:8081/bot TELEGRAM_BOT_TOKEN=123:abc TELEGRAM_CHAT_ID=1 \\
+        python pipeline/run_pipeline.py
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MAX_MESSAGE_LENGTH = 4096
+
+
+class FakeBotAPI(BaseHTTPRequestHandler):
+    """Request handler; the server carries the settings and the counters."""
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so connection reuse by the client is visible
+
+    def log_message(self, format, *args):
+        pass  # Only accepted messages are printed
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, description, **parameters):
+        payload = {'ok': False, 'error_code': status, 'description': description}
+        if parameters:
+            payload['parameters'] = parameters
+        self._reply(status, payload)
+
+    def _params(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length).decode() if length else ''
+        if self.headers.get('Content-Type', '').startswith('application/json'):
+            return json.loads(raw or '{}')
+        return {key: values[0] for key, values in parse_qs(raw).items()}
+
+    def do_GET(self):
+        self.do_POST()
+
+    def do_POST(self):
+        server = self.server
+        # Paths look like /bot<token>/<method>
+        method = self.path.rstrip('/').rsplit('/', 1)[-1].split('?')[0]
+        params = self._params()
+
+        if method == 'getMe':
+            return self._reply(200, {'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'FakeBot', 'username': 'fake_bot',
+            }})
+        if method != 'sendMessage':
+            return self._error(404, 'Not Found: method not found')
+
+        if random.random() < server.fail_rate:
+            return self._error(502, 'Bad Gateway')
+
+        with server.lock:
+            now = time.monotonic()
+            if server.rate and now < server.next_allowed:
+                server.throttled += 1
+                retry_after = max(1, int(server.next_allowed - now + 0.999))
+                return self._error(429, f'Too Many Requests: retry after {retry_after}', retry_after=retry_after)
+            if server.rate:
+                server.next_allowed = now + 1 / server.rate
+
+        text = params.get('text', '')
+        if len(text.encode('utf-16-le')) // 2 > MAX_MESSAGE_LENGTH:
+            return self._error(400, 'Bad Request: message is too long')
+
+        with server.lock:
+            server.message_id += 1
+            message_id = server.message_id
+            if server.log_file:
+                with open(server.log_file, 'a') as f:
+                    f.write(json.dumps({'chat_id': params.get('chat_id'), 'text': text}) + '\n')
+        print(f"[{message_id}] chat {params.get('chat_id')}: {len(text)} chars, "
+              f"{text.count(chr(10))} lines (connection {self.client_address[1]})")
+
+        self._reply(200, {'ok': True, 'result': {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(params.get('chat_id') or 0), 'type': 'private'},
+            'text': text,
+        }})
+
+
+def make_server(host='127.0.0.1', port=8081, rate=0.0, fail_rate=0.0, log_file=None):
+    """Create the server; settings and counters are attributes of the returned server."""
+    server = ThreadingHTTPServer((host, port), FakeBotAPI)
+    server.rate = rate  # Messages per second before 429s (0 = unlimited)
+    server.fail_rate = fail_rate  # Share of sendMessage calls answered with a 502
+    server.log_file = log_file
+    server.lock = threading.Lock()
+    server.next_allowed = 0.0
+    server.message_id = 0
+    server.throttled = 0
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--rate', type=float, default=0.0, help="Messages per second allowed (0 = unlimited)")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="Share of sendMessage calls failing with 502")
+    parser.add_argument('--log', help="JSON-lines file receiving the accepted messages")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.rate, args.fail_rate, args.log)
+    print(f"Fake Bot API on http://{args.host}:{args.port}/bot (TELEGRAM_API_URL)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"{server.message_id} messages accepted, {server.throttled} throttled")
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+sys.path.insert(0, os.path.join(ROOT, 'pipeline'))
+
+# Without credentials the notifier fails fast instead of reaching the network
+for name in ('TELEGRAM_BOT_TOKEN', 'TELEGRAM_CHAT_ID'):
+    os.environ.pop(name, None)
+
+import config  # noqa: E402
+from synthetic import SyntheticUniverse  # noqa: E402
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Point every data path of the config at a temporary directory."""
+    data = tmp_path / 'data'
+    paths = {
+        'DATA_DIR': data,
+        'LOGS_DIR': tmp_path / 'logs',
+        'STOCK_PRE_DIR': data / 'raw_stock_data',
+        'STOCK_POST_DIR': data / 'processed_stock_data',
+        'SIGNALS_DIR': data / 'signals',
+        'BACKUP_FOLDER': data / 'signals_backup',
+        'INDICATOR_CACHE_DIR': data / 'indicator_cache',
+        'SHARD_DIR': data / 'shards',
+        'SYMBOLS_FILE': data / 'symbols' / 'symbols.csv',
+        'FETCH_MANIFEST_FILE': data / 'raw_stock_data' / 'manifest.json',
+        'CONSOLIDATED_OUTPUT_FILE': data / 'signals' / 'consolidated_signals.csv',
+        'SIGNAL_DB_FILE': data / 'signals.sqlite',
+        'OUTBOX_DB_FILE': data / 'outbox.sqlite',
+        'SHARD_DB_FILE': data / 'shards.sqlite',
+        'INDICATOR_STATE_FILE': data / 'indicator_state.json',
+        'LOG_FILE': tmp_path / 'logs' / 'test_log.txt',
+    }
+    for name, path in paths.items():
+        monkeypatch.setattr(config, name, str(path))
+    for directory in ('raw_stock_data', 'processed_stock_data', 'signals', 'signals_backup', 'symbols'):
+        (data / directory).mkdir(parents=True, exist_ok=True)
+    (tmp_path / 'logs').mkdir()
+    monkeypatch.setattr(config, 'FETCH_RATE_LIMIT', 0)  # The synthetic universe has no quota
+    return data
+
+
+@pytest.fixture
+def universe(data_dir):
+    """A small synthetic universe served in place of `yf.download`, with its symbols file written."""
+    universe = SyntheticUniverse(symbols=12, bars=300, interval='1d')
+    universe.write_symbols_file(config.SYMBOLS_FILE)
+    with universe.patch_download():
+        yield universe
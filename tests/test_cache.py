@@ -0,0 +1,12 @@
+from stock_cache import IndicatorCache
+
+
+def test_overwrite_does_not_grow_tracked_size(tmp_path):
+    cache = IndicatorCache(str(tmp_path), max_bytes=10 ** 6)
+    for _ in range(5):
+        cache.put('key', list(range(100)))
+    cache.put('other', list(range(100)))
+
+    on_disk = sum(path.stat().st_size for path in tmp_path.glob('*.pkl'))
+    assert cache.size == on_disk
+    assert cache.get('key') == list(range(100))
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import config
+from stock_daemon import PipelineDaemon
+from stock_indicators import MACD, StockIndicators, StockScreener
+from synthetic import SyntheticUniverse
+
+INDICATORS = [StockIndicators.calculate_macd, StockIndicators.calculate_rsi]
+FIRST_DAY = pd.Timestamp.today().normalize() - pd.offsets.BDay(5)  # Within PERIOD, so fetches are incremental
+SECOND_DAY = FIRST_DAY + pd.offsets.BDay(1)
+
+
+def universe(end, bars):
+    """The same random walks, one bar longer for a later `end`."""
+    universe = SyntheticUniverse(symbols=6, bars=bars, interval='1d', end=end)
+    universe.write_symbols_file(config.SYMBOLS_FILE)
+    return universe
+
+
+def sort(signals):
+    return signals.sort_values(['symbol', 'signal type', 'Datetime']).reset_index(drop=True)
+
+
+@pytest.fixture
+def daemon(data_dir, monkeypatch):
+    monkeypatch.setattr(config, 'DAEMON_DAILY_RESET', False)
+    daemon = PipelineDaemon(INDICATORS, interval='1d', period='1y')
+    daemon.start_day(FIRST_DAY.date())
+    return daemon
+
+
+def test_cycles_feed_only_closed_new_bars(daemon, monkeypatch):
+    # Cycle 1, during the session of FIRST_DAY: its bar is still forming and left out
+    with universe(FIRST_DAY, 300).patch_download():
+        first = daemon.run_cycle(now=FIRST_DAY + pd.Timedelta(hours=16))
+    symbol = 'SYM00000'
+    assert daemon.states[symbol]['last'] == (FIRST_DAY - pd.offsets.BDay(1)).isoformat()
+    assert daemon.fetcher.manifest[symbol]['rows'] == 299
+
+    # Cycle 2, after the close of SECOND_DAY: only the two newly closed bars are downloaded, stored and fed
+    fed = []
+    update = MACD.update
+    monkeypatch.setattr(MACD, 'update', staticmethod(lambda state, closes: fed.append(len(closes)) or update(state, closes)))
+    monkeypatch.setattr(daemon.fetcher.store, 'exists', lambda symbol: pytest.fail("store probed in a warm cycle"))
+    later = universe(SECOND_DAY, 301)
+    starts = []
+    download = later.download
+    later.download = lambda tickers, start=None, **kwargs: starts.append(start) or download(tickers, start=start, **kwargs)
+    with later.patch_download():
+        second = daemon.run_cycle(now=SECOND_DAY + pd.Timedelta(hours=23))
+
+    assert starts == [(FIRST_DAY - pd.offsets.BDay(1) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')]
+    assert fed == [2] * 6
+    assert daemon.states[symbol]['last'] == SECOND_DAY.isoformat()
+    stored = daemon.fetcher.store.read(symbol)
+    assert len(stored) == daemon.fetcher.manifest[symbol]['rows'] == 301
+    # The generator's cumulative sums differ in the last bit between universe lengths
+    np.testing.assert_allclose(stored['Close'].to_numpy(), later.frame(symbol)['Close'].to_numpy().ravel(), rtol=1e-12)
+
+    # Same signals as a single replay of the whole history
+    screener = StockScreener(stock_dir=config.STOCK_POST_DIR, interval='1d')
+    replay = screener.update_states(INDICATORS, screener.store.iter_bars(), {})
+    expected = sort(pd.concat(replay, ignore_index=True))
+    found = sort(pd.concat([first, second], ignore_index=True))
+    pd.testing.assert_frame_equal(found, expected, check_dtype=False)
+
+
+def test_unchanged_cycle_screens_nothing(daemon):
+    with universe(FIRST_DAY, 300).patch_download():
+        daemon.run_cycle(now=FIRST_DAY + pd.Timedelta(hours=23))
+        signals = daemon.run_cycle(now=FIRST_DAY + pd.Timedelta(hours=23, minutes=5))
+    assert daemon.screened == 0
+    assert signals.empty
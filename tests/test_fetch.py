@@ -0,0 +1,115 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+import config
+from stock_fetch import FetchEngine, StockFetch, Downloader
+from synthetic import SyntheticUniverse
+
+
+def test_timeout_is_per_attempt_and_excludes_backoff():
+    calls = {'slow': 0}
+
+    def fetch(job):
+        if job == 'slow':
+            calls['slow'] += 1
+            if calls['slow'] < 3:
+                time.sleep(0.3)
+                raise ConnectionError('reset')
+        return job
+
+    # Three attempts plus backoff take longer than the timeout, but each attempt is well within it
+    engine = FetchEngine(fetch, workers=2, rate_limit=0, max_retries=3, backoff_base=0.4, backoff_max=0.4, timeout=0.6)
+    results = {job: (result, error) for job, result, error in engine.run(['slow', 'fast'])}
+    assert results == {'slow': ('slow', None), 'fast': ('fast', None)}
+
+
+def test_local_errors_are_not_retried():
+    calls = []
+
+    def fetch(job):
+        calls.append(job)
+        raise PermissionError('denied')
+
+    engine = FetchEngine(fetch, workers=1, rate_limit=0, max_retries=3, backoff_base=0, timeout=5)
+    [(_, result, error)] = list(engine.run(['job']))
+    assert isinstance(error, PermissionError) and len(calls) == 1
+
+
+class HangingDownloader(Downloader):
+    """Serves the universe, except batches holding `hang`, which never return in time."""
+
+    def __init__(self, universe, hang):
+        self.universe, self.hang = universe, hang
+
+    def download(self, symbols, interval, period, start=None):
+        if self.hang in symbols:
+            time.sleep(3)
+        return {symbol: self.universe.frame(symbol) for symbol in symbols}
+
+
+def test_timed_out_symbols_are_kept(universe, monkeypatch):
+    monkeypatch.setattr(config, 'FETCH_TIMEOUT', 1)
+    monkeypatch.setattr(config, 'FETCH_MAX_RETRIES', 0)
+    hang = universe.symbols[0]
+    fetcher = StockFetch(downloader=HangingDownloader(universe, hang), batch_size=1)
+    failed = fetcher.download_stock_data()
+
+    assert failed == []
+    assert fetcher.deferred_symbols == [hang]
+    assert hang in pd.read_csv(config.SYMBOLS_FILE)['Symbol'].tolist()
+
+
+class FlakyDownloader(Downloader):
+    """Serves the universe; `garbled` gets a frame that doesn't normalize, batches holding `broken` raise."""
+
+    def __init__(self, universe, garbled, broken):
+        self.universe, self.garbled, self.broken = universe, garbled, broken
+
+    def download(self, symbols, interval, period, start=None):
+        if self.broken in symbols:
+            raise ValueError('provider error')
+        frames = {symbol: self.universe.frame(symbol) for symbol in symbols}
+        if self.garbled in frames:
+            frames[self.garbled] = pd.DataFrame([[1, 2]], columns=['Datetime', 'Datetime'])
+        return frames
+
+
+def test_errors_fail_single_symbols_not_batches(universe):
+    garbled, broken = universe.symbols[0], universe.symbols[-1]
+    fetcher = StockFetch(downloader=FlakyDownloader(universe, garbled, broken), batch_size=4)
+    fetched = dict(fetcher.iter_stock_data())
+
+    # The garbled frame fails its symbol only; its batch mates are stored
+    assert fetcher.failed_symbols == [garbled]
+    assert set(universe.symbols[1:4]) <= set(fetched)
+    # A failed request keeps its whole batch in the universe
+    assert fetcher.deferred_symbols == universe.symbols[-4:]
+    assert pd.read_csv(config.SYMBOLS_FILE)['Symbol'].tolist() == universe.symbols[1:]
+
+
+def test_incremental_fetch_downloads_only_new_bars(data_dir, monkeypatch):
+    first_day = pd.Timestamp.today().normalize() - pd.offsets.BDay(5)  # Within PERIOD
+    earlier = SyntheticUniverse(symbols=4, bars=300, interval='1d', end=first_day)
+    earlier.write_symbols_file(config.SYMBOLS_FILE)
+    with earlier.patch_download():
+        StockFetch(normalize=True).download_stock_data()
+
+    later = SyntheticUniverse(symbols=4, bars=302, interval='1d', end=first_day + pd.offsets.BDay(2))
+    starts = []
+    download = later.download
+    later.download = lambda tickers, start=None, **kwargs: starts.append(start) or download(tickers, start=start, **kwargs)
+    with later.patch_download():
+        fetcher = StockFetch(normalize=True)
+        fetcher.download_stock_data()
+
+    assert starts == [first_day.strftime('%Y-%m-%d')]  # One batch, from the last stored bar on
+    manifest = fetcher.load_manifest()
+    for symbol in later.symbols:
+        stored = fetcher.store.read(symbol)
+        assert len(stored) == manifest[symbol]['rows'] == 302 and stored.index.is_unique
+        assert pd.Timestamp(manifest[symbol]['last']) == stored.index[-1]
+        # The generator's cumulative sums differ in the last bit between universe lengths
+        np.testing.assert_allclose(stored['Close'].to_numpy(), later.frame(symbol)['Close'].to_numpy().ravel(),
+                                   rtol=1e-12)
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_prep import StockFilter
+
+
+def random_signals(rows, signal_types, seed=0):
+    """Signals of the last three days, with repeated signal types per symbol-date."""
+    rng = np.random.default_rng(seed)
+    today = pd.Timestamp.today().normalize()
+    return pd.DataFrame({
+        'Datetime': today - pd.to_timedelta(rng.integers(0, 3, rows), unit='D'),
+        'symbol': np.char.add('SYM', rng.integers(0, 50, rows).astype(str)),
+        'signal type': np.asarray(signal_types)[rng.integers(0, len(signal_types), rows)],
+    })
+
+
+def legacy_tally(data):
+    """The groupby/apply aggregation `tally_signals` replaced, with its labels sorted."""
+    data = data.rename(columns=str.lower)
+    return (
+        data.groupby(['symbol', 'datetime'])['signal type']
+        .apply(lambda x: ', '.join(sorted(set(x))))
+        .reset_index(name='signals')
+    )
+
+
+# Bitmask path, and the fallback for more signal types than bits
+@pytest.mark.parametrize('signal_types', [['MACD', 'RSI', 'TEMA', 'BBANDS'], [f"T{number:02d}" for number in range(70)]])
+def test_tally_matches_the_groupby_result(data_dir, signal_types):
+    signals = random_signals(3000, signal_types)
+    stock_filter = StockFilter(signals, lookback_days=3)
+    stock_filter.tally_signals()
+    tally = stock_filter.filtered_data
+
+    legacy = legacy_tally(signals)
+    pd.testing.assert_frame_equal(tally[['symbol', 'datetime', 'signals']], legacy)
+    assert (tally['signal_count'] == legacy['signals'].str.count(', ') + 1).all()
+    assert (tally['score'] == tally.groupby('symbol')['signal_count'].transform('sum')).all()
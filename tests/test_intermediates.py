@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+import talib
+
+import config
+import stock_state
+from stock_indicators import MACD, TEMA
+from stock_intermediates import Intermediates, PANEL_KERNELS, SERIES_KERNELS
+
+
+def closes(bars=300, seed=1):
+    return 100 + np.random.default_rng(seed).normal(0, 1, bars).cumsum()
+
+
+def test_shared_ema_node_is_computed_once(monkeypatch):
+    # A TEMA as long as the MACD's slow EMA reads the same ('ema', 26, 1) node
+    monkeypatch.setitem(config.TEMA_CONFIG, 'length', config.MACD_CONFIG['slow_length'])
+    calls = []
+
+    def ema(values, period):
+        calls.append(period)
+        return SERIES_KERNELS['ema'](values, period)
+
+    close = closes()
+    intermediates = Intermediates(close, dict(SERIES_KERNELS, ema=ema))
+    MACD.compute(close, intermediates)
+    TEMA.compute(close, intermediates)
+
+    # slow and signal EMAs of the MACD (its fast EMA has its own seed), then only the second and third EMA of the TEMA
+    assert calls.count(26) == 3
+    assert sorted(calls) == [9, 26, 26, 26]
+    assert ('ema', 26, 1) in intermediates.values
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_macd_matches_talib_over_the_whole_series(seed):
+    close = closes(seed=seed)
+    close[:7] = np.nan  # Leading NaNs are skipped, as talib does
+    expected = talib.MACD(close, 12, 26, 9)
+
+    series = Intermediates(close).get(MACD.requires()['macd'])
+    panel = Intermediates(np.column_stack([close, close]), PANEL_KERNELS).get(MACD.requires()['macd'])
+    state = stock_state.macd_state(12, 26, 9)
+    streamed = np.array([stock_state.macd_update(state, value) for value in close])
+
+    for values, wanted in zip(series, expected):
+        np.testing.assert_array_equal(values, wanted)  # Warm-up NaNs included
+    for values, wanted in zip(panel, expected):
+        np.testing.assert_allclose(values[:, 1], wanted, rtol=0, atol=1e-12)
+        assert (np.isnan(values[:, 0]) == np.isnan(wanted)).all()
+    np.testing.assert_allclose(streamed[:, 0], expected[0], rtol=0, atol=1e-12)
+    np.testing.assert_allclose(streamed[:, 1], expected[1], rtol=0, atol=1e-12)
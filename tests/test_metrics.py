@@ -0,0 +1,56 @@
+import os
+import json
+
+import config
+from stock_fetch import StockFetch
+from stock_indicators import StockIndicators, StockScreener
+from stock_metrics import RunMetrics, metrics, get_file_logger, flush_logs
+
+
+def test_stage_reports_items_bytes_and_slow_items(data_dir):
+    run = RunMetrics()
+    with run.stage('screen') as stage:
+        stage.items += 4
+        stage.bytes_read += 1000
+        for symbol, seconds in [('A', 0.01), ('B', 0.01), ('C', 0.01), ('SLOW', 0.5)]:
+            stage.add_timing(symbol, seconds)
+
+    with open(run.save()) as f:
+        report = json.load(f)
+    [screen] = report['stages']
+    assert (screen['name'], screen['items'], screen['bytes_read'], screen['bytes_written']) == ('screen', 4, 1000, 0)
+    assert screen['median_item_s'] == 0.01
+    assert screen['slow_items'] == [{'item': 'SLOW', 'seconds': 0.5}]
+    assert screen['wall_s'] >= 0 and report['wall_s'] >= screen['wall_s']
+
+
+def test_pipeline_stages_fill_the_run_report(universe):
+    metrics.reset()
+    StockFetch(normalize=True).download_stock_data()
+    screener = StockScreener(config.STOCK_POST_DIR, use_cache=False)
+    screener.screen_by_indicators([StockIndicators.calculate_macd], None, workers=1)
+
+    report_file = metrics.save()
+    assert report_file == os.path.splitext(config.LOG_FILE)[0] + '_report.json'
+    with open(report_file) as f:
+        stages = {stage['name']: stage for stage in json.load(f)['stages']}
+    assert stages['fetch']['items'] == len(universe.symbols) and stages['fetch']['bytes_written'] > 0
+    assert stages['screen']['items'] == len(universe.symbols) and stages['screen']['bytes_read'] > 0
+    assert stages['screen']['median_item_s'] is not None  # Every symbol is timed
+
+
+def test_log_lines_are_buffered_until_flushed(data_dir):
+    log_file = os.path.join(os.path.dirname(config.LOG_FILE), 'buffered.txt')
+    logger = get_file_logger(log_file)
+    logger.info('first')
+    logger.info('second')
+    assert not os.path.exists(log_file)  # Held in memory, the file isn't even opened
+
+    flush_logs()
+    with open(log_file) as f:
+        assert f.read() == 'first\nsecond\n'
+
+    logger.info('third')
+    logger.error('failure')  # Errors are written at once, with the lines before them
+    with open(log_file) as f:
+        assert f.read().splitlines() == ['first', 'second', 'third', 'failure']
@@ -0,0 +1,90 @@
+import re
+import asyncio
+
+from telegram.error import Forbidden
+
+import config
+from stock_notifier import TelegramNotifier, message_length, split_message
+
+
+def balanced(chunk):
+    """Whether every legacy Markdown entity of a chunk is closed."""
+    chunk = re.sub(r'\\[_*`\[]', '', chunk)  # Escapes
+    chunk = re.sub(r'\[[^\]\n]*\]\([^)\n]*\)', '', chunk)  # Links
+    if chunk.count('`') % 2:
+        return False
+    chunk = re.sub(r'`[^`]*`', '', chunk)  # Code spans
+    return chunk.count('*') % 2 == 0 and chunk.count('_') % 2 == 0
+
+
+def test_long_line_is_split_outside_entities():
+    line = ''.join(f"🔹 `SYM{i}` *MACD cross {i}* 5\\*3 [chart](https://example.com/{i}) _note {i}_ " for i in range(400))
+    chunks = split_message("Header\n" + line + "\n", limit=500)
+
+    assert len(chunks) > 1
+    assert all(message_length(chunk) <= 500 for chunk in chunks)
+    assert all(balanced(chunk) for chunk in chunks)
+    assert ''.join(chunks) == "Header\n" + line + "\n"  # Cut at whitespace between entities: nothing added
+
+
+def test_entity_longer_than_a_message_is_closed_and_reopened():
+    line = "*" + " ".join(["word"] * 200) + "*"
+    chunks = split_message(line, limit=100)
+
+    assert all(message_length(chunk) <= 100 for chunk in chunks)
+    assert all(chunk.startswith('*') and chunk.rstrip().endswith('*') for chunk in chunks)
+    assert all(balanced(chunk) for chunk in chunks)
+
+
+class FakeBot:
+    def __init__(self):
+        self.open = False
+        self.initialized = 0
+        self.sent = []
+
+    async def initialize(self):
+        await asyncio.sleep(0)
+        self.open = True
+        self.initialized += 1
+
+    async def shutdown(self):
+        await asyncio.sleep(0)
+        self.open = False
+
+    async def send_message(self, chat_id, text, parse_mode):
+        assert self.open, "sent outside a session"
+        await asyncio.sleep(0)
+        self.sent.append(text)
+
+
+def test_concurrent_batches_share_one_session(monkeypatch):
+    monkeypatch.setattr(config, 'TELEGRAM_MESSAGE_INTERVAL', 0)
+    notifier = TelegramNotifier(token='123:abc', chat_id='1')
+    notifier.bot = FakeBot()
+
+    async def main():
+        return await asyncio.gather(notifier.async_send_messages(['a', 'b', 'c']),
+                                    notifier.async_send_messages(['d', 'e']))
+
+    assert asyncio.run(main()) == [3, 2]
+    assert notifier.bot.initialized == 1
+    assert not notifier.bot.open and notifier.sessions == 0
+    assert sorted(notifier.bot.sent) == ['a', 'b', 'c', 'd', 'e']
+
+
+def test_rejected_message_is_not_retried(monkeypatch):
+    monkeypatch.setattr(config, 'TELEGRAM_MESSAGE_INTERVAL', 0)
+    notifier = TelegramNotifier(token='123:abc', chat_id='1')
+    notifier.bot = FakeBot()
+    send_message = notifier.bot.send_message
+    calls = []
+
+    async def reject_blocked(chat_id, text, parse_mode):
+        calls.append(text)
+        if text == 'b':
+            raise Forbidden('Forbidden: bot was blocked by the user')
+        await send_message(chat_id, text, parse_mode)
+
+    notifier.bot.send_message = reject_blocked
+    assert asyncio.run(notifier.async_send_messages(['a', 'b', 'c'])) == 2
+    assert calls == ['a', 'b', 'c']
@@ -0,0 +1,134 @@
+import time
+import asyncio
+
+import config
+from stock_outbox import NotificationOutbox, OutboxSender
+
+
+class FakeNotifier:
+    """Delivers through a callable instead of the Bot API."""
+
+    def __init__(self, deliver=lambda text: True):
+        self.deliver = deliver
+        self.sent = []
+
+    def session(self):
+        notifier = self
+
+        class Session:
+            async def __aenter__(self):
+                return notifier
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Session()
+
+    async def send_one(self, text, parse_mode="Markdown", chat_id=None):
+        if not self.deliver(text):
+            return False
+        self.sent.append(text)
+        return True
+
+
+def test_message_is_deduplicated_as_a_whole(data_dir):
+    outbox = NotificationOutbox()
+
+    assert outbox.enqueue(['part 1', 'part 2', 'part 3'], chat_id=1, alert='signals') == 3
+    assert outbox.enqueue(['part 1', 'part 2', 'part 3'], chat_id=1, alert='signals') == 0
+    # One chunk changed: the whole message goes out again, not just the changed fragment
+    assert outbox.enqueue(['part 1', 'part 2', 'part 3 (updated)'], chat_id=1, alert='signals') == 3
+    assert outbox.enqueue(['part 1', 'part 2', 'part 3'], chat_id=2, alert='signals') == 3
+    assert outbox.pending() == 9
+
+
+def test_claim_lease_keeps_rows_from_other_senders(data_dir, monkeypatch):
+    outbox = NotificationOutbox()
+    outbox.enqueue(['a', 'b'], chat_id=1)
+
+    assert [row[2] for row in outbox.claim(lease=60)] == ['a', 'b']
+    assert outbox.claim(lease=60) == []  # Leased to the first sender
+
+    # The first sender crashed: once its lease runs out, another sender gets the rows
+    monkeypatch.setattr(time, 'time', lambda now=time.time(): now + 61)
+    assert [row[2] for row in outbox.claim(lease=60)] == ['a', 'b']
+
+
+def test_failed_delivery_is_retried_with_backoff_then_dead(data_dir, monkeypatch):
+    monkeypatch.setattr(config, 'OUTBOX_BACKOFF_BASE', 0)
+    monkeypatch.setattr(config, 'OUTBOX_MAX_ATTEMPTS', 3)
+    outbox = NotificationOutbox()
+    outbox.enqueue(['flaky', 'broken'], chat_id=1)
+    failures = {'flaky': 1, 'broken': 10}
+
+    def deliver(text):
+        failures[text] -= 1
+        return failures[text] < 0
+
+    sender = OutboxSender(outbox, FakeNotifier(deliver))
+    for _ in range(4):
+        asyncio.run(sender.drain())
+
+    assert sender.notifier.sent == ['flaky']
+    assert outbox.status() == {'pending': 0, 'sent': 1, 'dead': 1}
+    assert sender.failed == 1 + 3
+
+
+def test_sender_purges_on_schedule(data_dir, monkeypatch):
+    outbox = NotificationOutbox()
+    outbox.enqueue(['old'], chat_id=1)
+    sender = OutboxSender(outbox, FakeNotifier(), purge_interval=3600)
+    asyncio.run(sender.drain())
+    monkeypatch.setattr(time, 'time', lambda now=time.time(): now + 40 * 86400)  # Past the retention
+
+    assert sender.purge_if_due() == 1
+    outbox.enqueue(['new'], chat_id=1)
+    asyncio.run(sender.drain())
+    assert sender.purge_if_due() == 0  # Not due again for an hour
+    assert outbox.status()['sent'] == 1
+
+
+def test_message_stops_at_its_first_failed_chunk(data_dir, monkeypatch):
+    monkeypatch.setattr(config, 'OUTBOX_BACKOFF_BASE', 60)
+    outbox = NotificationOutbox()
+    outbox.enqueue(['1/3', '2/3', '3/3'], chat_id=1)
+    outbox.enqueue(['other'], chat_id=1)
+    failures = {'2/3': 1}
+
+    def deliver(text):
+        failures[text] = failures.get(text, 0) - 1
+        return failures[text] < 0
+
+    sender = OutboxSender(outbox, FakeNotifier(deliver))
+    asyncio.run(sender.drain())
+    assert sender.notifier.sent == ['1/3', 'other']  # 3/3 waits for the retry of 2/3
+    assert outbox.claim() == []
+
+    monkeypatch.setattr(time, 'time', lambda now=time.time(): now + 61)
+    asyncio.run(sender.drain())
+    assert sender.notifier.sent == ['1/3', 'other', '2/3', '3/3']
+    assert outbox.status() == {'pending': 0, 'sent': 4, 'dead': 0}
+
+
+class Rejected(Exception):
+    pass
+
+
+def test_rejected_message_is_dead_at_once(data_dir):
+    outbox = NotificationOutbox()
+    outbox.enqueue(['1/3', '2/3', '3/3'], chat_id=1)
+    notifier = FakeNotifier()
+    notifier.PERMANENT_ERRORS = (Rejected,)
+
+    def deliver(text):
+        if text == '2/3':
+            raise Rejected('Bad Request: can\'t parse entities')
+        return True
+
+    notifier.deliver = deliver
+    sender = OutboxSender(outbox, notifier)
+    asyncio.run(sender.drain())
+
+    assert notifier.sent == ['1/3']
+    assert sender.failed == 1  # Not retried
+    assert outbox.status() == {'pending': 0, 'sent': 1, 'dead': 2}
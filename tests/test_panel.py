@@ -0,0 +1,22 @@
+import pandas as pd
+import pytest
+
+import config
+from stock_fetch import StockFetch
+from stock_indicators import StockIndicators, StockScreener
+
+INDICATORS = [StockIndicators.calculate_macd, StockIndicators.calculate_rsi, StockIndicators.calculate_tema]
+
+
+@pytest.mark.parametrize('backend', ['csv', 'sqlite'])
+def test_panel_matches_per_symbol_screen(universe, monkeypatch, backend):
+    monkeypatch.setattr(config, 'STORAGE_BACKEND', backend)
+    StockFetch(normalize=True).download_stock_data()
+    screener = StockScreener(config.STOCK_POST_DIR, use_cache=False)
+
+    per_symbol = screener.screen_by_indicators(INDICATORS, None, workers=1)
+    panel = screener.screen_panel(INDICATORS, None)
+
+    assert len(per_symbol) > 0
+    assert per_symbol.dtypes.equals(panel.dtypes)
+    assert per_symbol.equals(panel)
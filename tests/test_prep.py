@@ -0,0 +1,38 @@
+import os
+import logging
+
+import pandas as pd
+
+import config
+from stock_prep import StockPrep
+
+
+def preprocess(output_dir, workers, caplog):
+    caplog.clear()
+    prep = StockPrep(config.STOCK_PRE_DIR, str(output_dir), backend='csv')
+    files = prep.preprocess_all(workers=workers, chunk_size=3)
+    problems = sorted((record.levelname, record.getMessage()) for record in caplog.records
+                      if record.levelno >= logging.WARNING)
+    return prep, files, problems
+
+
+def test_parallel_preprocess_matches_sequential(universe, data_dir, caplog):
+    universe.write_raw_csv(config.STOCK_PRE_DIR)
+    with open(os.path.join(config.STOCK_PRE_DIR, f"{universe.symbols[3]}.csv"), 'a') as f:
+        f.write("not a date,1,1,1,1,1\n")
+    with open(os.path.join(config.STOCK_PRE_DIR, 'BROKEN.csv'), 'w') as f:
+        f.write("Price,Close\nTicker\n")
+
+    caplog.set_level(logging.INFO)
+    sequential, sequential_files, sequential_problems = preprocess(data_dir / 'sequential', 1, caplog)
+    parallel, parallel_files, parallel_problems = preprocess(data_dir / 'parallel', 3, caplog)
+
+    assert [os.path.basename(path) for path in parallel_files] == [f"{symbol}.csv" for symbol in universe.symbols]
+    assert [os.path.basename(path) for path in sequential_files] == [os.path.basename(path) for path in parallel_files]
+    for symbol in universe.symbols:
+        pd.testing.assert_frame_equal(parallel.processed_store.read(symbol), sequential.processed_store.read(symbol))
+    # The workers' warnings and errors are replayed in the parent's log, as a sequential run logs them
+    for problems in (sequential_problems, parallel_problems):
+        assert [level for level, _ in problems] == ['ERROR', 'WARNING']
+        assert 'BROKEN.csv' in problems[0][1]
+        assert f"{universe.symbols[3]}.csv contains 1 invalid dates" in problems[1][1]
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_resample import resample_bars
+
+# Thursday to the next Tuesday, across the switch to daylight saving time (Sunday 2024-03-10)
+DAYS = pd.bdate_range('2024-03-07', '2024-03-12')
+HOURS = ['09:30', '10:30', '11:30', '12:30', '13:30', '14:30', '15:30']  # The provider's hourly bars
+
+
+def hourly_bars(seed=0):
+    """Hourly bars of DAYS in the storage layout: naive UTC timestamps."""
+    wall = pd.DatetimeIndex([f"{day.date()} {hour}" for day in DAYS for hour in HOURS])
+    index = wall.tz_localize('America/New_York').tz_convert('UTC').tz_localize(None)
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, len(index)))
+    return pd.DataFrame({
+        'Open': close + rng.normal(0, 0.5, len(index)),
+        'High': close + 2,
+        'Low': close - 2,
+        'Close': close,
+        'Volume': rng.integers(1000, 5000, len(index)).astype('float64'),
+    }, index=pd.DatetimeIndex(index, name='Datetime'))
+
+
+def expected(bars, labels):
+    """The aggregation rules, with pandas: first open, highest high, lowest low, last close, total volume."""
+    groups = bars.groupby(labels)
+    return pd.DataFrame({
+        'Open': groups['Open'].first(), 'High': groups['High'].max(), 'Low': groups['Low'].min(),
+        'Close': groups['Close'].last(), 'Volume': groups['Volume'].sum(),
+    }), groups.apply(lambda group: group.index[-1])
+
+
+def utc(wall):
+    return pd.Timestamp(wall).tz_localize('America/New_York').tz_convert('UTC').tz_localize(None)
+
+
+@pytest.mark.parametrize('timeframe', ['4h', '1D', '1W'])
+def test_ohlcv_aggregation(timeframe):
+    bars = hourly_bars()
+    wall = bars.index.tz_localize('UTC').tz_convert('America/New_York').tz_localize(None)
+    if timeframe == '4h':
+        # Session-aligned: 09:30-13:30 and 13:30-16:00, exchange time
+        starts = wall.normalize() + pd.Timedelta(hours=9, minutes=30) + pd.Timedelta(hours=4) * (wall.hour >= 13)
+        labels = starts.tz_localize('America/New_York').tz_convert('UTC').tz_localize(None)
+    elif timeframe == '1D':
+        labels = wall.normalize()
+    else:
+        labels = wall.normalize() - pd.to_timedelta(wall.dayofweek, unit='D')
+    frame, ends = resample_bars(bars, timeframe)
+
+    aggregated, last_bars = expected(bars, labels)
+    pd.testing.assert_frame_equal(frame, aggregated, check_names=False, check_freq=False, check_index_type=False)
+    assert list(ends) == list(last_bars)
+
+
+def test_buckets_follow_the_session_across_daylight_saving():
+    frame, ends = resample_bars(hourly_bars(), '4h')
+    # Friday in standard time, Monday in daylight saving time: the same session hours
+    assert [utc('2024-03-08 09:30'), utc('2024-03-08 13:30')] == list(frame.index[2:4])
+    assert [utc('2024-03-11 09:30'), utc('2024-03-11 13:30')] == list(frame.index[4:6])
+    assert frame.index[4] - frame.index[2] == pd.Timedelta(days=3, hours=-1)
+    assert ends[3] == utc('2024-03-08 15:30')  # Last source bar of the shortened afternoon bar
+
+    daily, _ = resample_bars(hourly_bars(), '1D')
+    assert list(daily.index) == list(DAYS)
+    weekly, weekly_ends = resample_bars(hourly_bars(), '1W')
+    assert list(weekly.index) == [pd.Timestamp('2024-03-04'), pd.Timestamp('2024-03-11')]  # Mondays
+    assert weekly_ends[0] == utc('2024-03-08 15:30')
+
+
+def test_steps_give_the_same_bars_as_a_single_pass():
+    bars = hourly_bars()
+    direct, direct_ends = resample_bars(bars, '1W')
+    daily, daily_ends = resample_bars(bars, '1D')
+    stepped, stepped_ends = resample_bars(daily, '1W', daily_ends)
+
+    pd.testing.assert_frame_equal(stepped, direct)
+    assert list(stepped_ends) == list(direct_ends)
@@ -0,0 +1,116 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import config
+import stock_resample
+from stock_fetch import StockFetch
+from stock_indicators import MACD, RSI, TEMA, StockIndicators, StockScreener
+
+INDICATORS = [StockIndicators.calculate_macd, StockIndicators.calculate_rsi, StockIndicators.calculate_tema]
+
+
+@pytest.fixture
+def screener(universe, monkeypatch):
+    """Screener over the universe's bars, fetched into a SQLite store (the backend that reads only what it is asked)."""
+    monkeypatch.setattr(config, 'STORAGE_BACKEND', 'sqlite')
+    StockFetch(normalize=True).download_stock_data()
+    return StockScreener(config.STOCK_POST_DIR, use_cache=False)
+
+
+def sorted_signals(signals):
+    return signals.sort_values(['symbol', 'signal type', 'Datetime']).reset_index(drop=True)
+
+
+def test_warmup_fits_in_the_default_period():
+    warmup = StockScreener.warmup(INDICATORS, config.INTERVAL)
+    assert warmup < stock_resample.period_bars(config.PERIOD, config.INTERVAL)
+
+
+def test_pruned_screen_matches_full_history_and_reads_less(screener):
+    lookback_days = 45
+    pruned = screener.screen_by_indicators(INDICATORS, None, workers=1, lookback_days=lookback_days)
+    pruned_read = screener.store.bytes_read
+
+    full = screener.screen_by_indicators(INDICATORS, None, workers=1)
+    full_read = screener.store.bytes_read - pruned_read
+
+    since = screener.window(INDICATORS, lookback_days)[1]
+    expected = full[full['Datetime'] >= since]
+    assert len(pruned) > 0
+    pd.testing.assert_frame_equal(sorted_signals(pruned), sorted_signals(expected))
+    assert pruned_read < 0.8 * full_read
+
+
+def test_incremental_screen_matches_full_recompute_and_reads_only_new_bars(screener, universe):
+    store = screener.store
+    full_bars = {symbol: store.read(symbol) for symbol in universe.symbols}
+    for symbol, bars in full_bars.items():
+        store.write(symbol, bars.iloc[:-20])
+    first = screener.screen_incremental(INDICATORS, None)
+
+    # 20 new bars, and the last bar the first run saw is revised for one symbol
+    revised = universe.symbols[0]
+    full_bars[revised].iloc[-21, full_bars[revised].columns.get_loc('Close')] *= 1.01
+    for symbol, bars in full_bars.items():
+        store.write(symbol, bars)
+    read_before = store.bytes_read
+    second = screener.screen_incremental(INDICATORS, None)
+    incremental_read = store.bytes_read - read_before
+
+    expected = sorted_signals(screener.screen_by_indicators(INDICATORS, None, workers=1))
+    full_read = store.bytes_read - read_before - incremental_read
+    found = pd.concat([first[first['symbol'] != revised], second], ignore_index=True)
+    pd.testing.assert_frame_equal(sorted_signals(found), expected, check_dtype=False)
+    assert incremental_read < 0.5 * full_read  # Only the revised symbol is read in full
+
+
+@pytest.mark.parametrize('backend', ['csv', 'sqlite'])
+def test_parallel_screen_matches_sequential_row_for_row(universe, monkeypatch, backend):
+    monkeypatch.setattr(config, 'STORAGE_BACKEND', backend)
+    StockFetch(normalize=True).download_stock_data()
+    screener = StockScreener(config.STOCK_POST_DIR, use_cache=False)
+
+    sequential = screener.screen_by_indicators(INDICATORS, config.CONSOLIDATED_OUTPUT_FILE, workers=1)
+    with open(config.CONSOLIDATED_OUTPUT_FILE) as f:
+        sequential_file = f.read()
+    os.remove(config.CONSOLIDATED_OUTPUT_FILE)
+    parallel = screener.screen_by_indicators(INDICATORS, config.CONSOLIDATED_OUTPUT_FILE, workers=3, chunk_size=2)
+    with open(config.CONSOLIDATED_OUTPUT_FILE) as f:
+        parallel_file = f.read()
+
+    assert len(parallel) > 0
+    pd.testing.assert_frame_equal(parallel, sequential)  # Same order, not just the same rows
+    assert parallel_file == sequential_file
+
+
+@pytest.mark.parametrize('indicator', [MACD, RSI, TEMA])
+def test_compute_mask_matches_the_legacy_frame(screener, universe, indicator):
+    bars = screener.store.read(universe.symbols[0])
+    mask, columns = indicator.compute(bars['Close'].to_numpy(dtype='float64'))
+
+    data, last_buy_signal = indicator.calculate(bars.reset_index())
+    assert mask.dtype == bool and mask.any()
+    np.testing.assert_array_equal(data['Buy Signal'].to_numpy(), mask)
+    legacy_names = {'RSI': f"RSI_{config.RSI_CONFIG['res']}"}  # Daily bars: the daily RSI, under its timeframe's name
+    for name, values in columns.items():
+        np.testing.assert_array_equal(data[legacy_names.get(name, name)].to_numpy(), values)
+    assert last_buy_signal == bars.index[mask].max()
+
+
+def test_screening_keeps_plain_functions_and_the_callers_bars(screener, universe):
+    def calculate_macd(data):
+        # A plain function on the legacy DataFrame contract, with the label of the native MACD
+        return MACD.calculate(data)
+
+    symbol = universe.symbols[1]
+    bars = screener.store.read(symbol)
+    original = bars.copy()
+    native = screener.screen_symbol([StockIndicators.calculate_macd], symbol, bars)
+    plain = screener.screen_symbol([calculate_macd], symbol, bars)
+
+    assert len(native[0]) > 0
+    pd.testing.assert_frame_equal(plain[0], native[0], check_dtype=False)
+    pd.testing.assert_frame_equal(bars, original)  # Neither path adds columns to the bars
@@ -0,0 +1,93 @@
+import os
+
+import pandas as pd
+import pytest
+
+import config
+import stock_fetch
+from stock_fetch import FetchEngine, StockFetch
+from stock_shard import ShardCoordinator, ShardWorker, shard_of
+from stock_indicators import StockIndicators
+
+INDICATORS = [StockIndicators.calculate_macd, StockIndicators.calculate_rsi]
+SHARDS = 3
+
+
+@pytest.fixture
+def coordinator(universe, monkeypatch):
+    monkeypatch.setattr(config, 'SHARD_POLL_INTERVAL', 0.05)
+    return ShardCoordinator()
+
+
+def symbols_file():
+    return pd.read_csv(config.SYMBOLS_FILE)['Symbol'].tolist()
+
+
+def test_crashed_shard_is_reclaimed(coordinator, universe):
+    run_id = coordinator.create_run(universe.symbols, INDICATORS, shards=SHARDS)
+    shard, _ = coordinator.claim(run_id, 'crashed')
+    held, _ = coordinator.claim(run_id, 'other')
+    assert held != shard  # Leased to the first worker
+    coordinator.release(run_id, 'other')
+
+    # While its lease runs, the shard of the crashed worker waits; once released it is claimed again
+    coordinator.release(run_id, 'crashed')
+    assert ShardWorker(coordinator, run_id, name='survivor').run() == SHARDS
+
+    assert coordinator.status(run_id) == {'done': SHARDS}
+    signals, failed, incomplete = coordinator.merge(run_id)
+    assert failed == [] and incomplete == []
+    assert set(signals['symbol']) <= set(universe.symbols) and not signals.empty
+
+
+def test_crashing_shard_keeps_its_symbols(coordinator, universe, monkeypatch):
+    monkeypatch.setattr(config, 'SHARD_MAX_ATTEMPTS', 2)
+    crashing = shard_of(universe.symbols[0], SHARDS)
+    # A symbol the provider doesn't know, in a healthy shard: a genuine download failure
+    bogus = next(name for name in (f"BOGUS{number}" for number in range(100)) if shard_of(name, SHARDS) != crashing)
+    pd.DataFrame({'Symbol': universe.symbols + [bogus]}).to_csv(config.SYMBOLS_FILE, index=False)
+
+    run_shard = ShardWorker.run_shard
+
+    def crash(self, shard, symbols):
+        if shard == crashing:
+            os._exit(1)  # The worker process dies without reporting
+        return run_shard(self, shard, symbols)
+
+    monkeypatch.setattr(ShardWorker, 'run_shard', crash)
+    signals, failed = coordinator.run(INDICATORS, shards=SHARDS, workers=1)
+
+    lost = [symbol for symbol in universe.symbols if shard_of(symbol, SHARDS) == crashing]
+    assert failed == [bogus]
+    assert sorted(coordinator.incomplete_symbols) == sorted(lost)
+    assert symbols_file() == universe.symbols  # Only the genuine failure is removed
+    assert not set(signals['symbol']) & set(lost)
+
+
+def test_shards_share_the_manifest_and_the_rate_limit(coordinator, universe, monkeypatch):
+    monkeypatch.setattr(config, 'FETCH_RATE_LIMIT', 2.0)
+    monkeypatch.setattr(config, 'FETCH_RATE_BURST', 4)
+    limits = []
+    init = FetchEngine.__init__
+
+    def engine(self, fetch_fn, rate_limit=None, burst=None, **kwargs):
+        limits.append((rate_limit, burst))
+        init(self, fetch_fn, rate_limit=0, **kwargs)  # The synthetic universe has no quota
+
+    monkeypatch.setattr(FetchEngine, '__init__', engine)
+    run_id = coordinator.create_run(universe.symbols, INDICATORS, shards=SHARDS)
+    ShardWorker(coordinator, run_id, rate_share=4).run()
+    assert limits == [(0.5, 1.0)] * SHARDS  # Four workers together keep to the configured rate
+
+    coordinator.merge(run_id)
+    manifest = StockFetch().load_manifest()
+    assert sorted(manifest) == sorted(universe.symbols)
+
+    # Another shard count keeps the incremental state: every download resumes at the last stored bar
+    starts = []
+    download = stock_fetch.yf.download
+    monkeypatch.setattr(stock_fetch.yf, 'download',
+                        lambda tickers, start=None, **kwargs: starts.append(start) or download(tickers, start=start, **kwargs))
+    run_id = coordinator.create_run(universe.symbols, INDICATORS, shards=SHARDS + 2)
+    ShardWorker(coordinator, run_id).run()
+    assert starts and None not in starts
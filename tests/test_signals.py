@@ -0,0 +1,45 @@
+import time
+
+import pandas as pd
+
+import config
+from stock_signals import SignalStore
+from stock_utils import DataUtils
+
+
+def signals(*days_ago):
+    now = pd.Timestamp.now().normalize()
+    return pd.DataFrame({
+        'Datetime': [now - pd.Timedelta(days=days) for days in days_ago],
+        'symbol': 'AAA',
+        'signal type': 'MACD',
+    })
+
+
+def test_reruns_insert_nothing_new(data_dir):
+    store = SignalStore(config.SIGNAL_DB_FILE)
+    assert store.upsert(signals(1, 20)) == 2
+
+    DataUtils().reset_signal_generator()  # Start of the next run: no rotation due
+    assert SignalStore(config.SIGNAL_DB_FILE).upsert(signals(1, 20)) == 0
+    assert store.snapshots() == []
+
+
+def test_rotation_follows_the_schedule_and_keeps_deduplicating(data_dir, monkeypatch):
+    monkeypatch.setattr(config, 'SIGNAL_LOOKBACK_DAYS', 3)
+    store = SignalStore(config.SIGNAL_DB_FILE)
+    store.upsert(signals(1, 20))
+    assert store.rotate_if_due(every_days=7) is None
+
+    # A week later
+    monkeypatch.setattr(time, 'time', lambda real=time.time: real() + 7 * 86400)
+    snapshot = store.rotate_if_due(every_days=7)
+    assert store.snapshots() == [snapshot]
+    assert store.rotate_if_due(every_days=7) is None
+
+    # The lookback window was carried over; older signals are only in the snapshot
+    assert len(store.query(start=pd.Timestamp.now() - pd.Timedelta(days=3))) == 1
+    assert store.count() == 1
+    # Neither is new to a re-run after the rotation
+    assert store.upsert(signals(1, 20)) == 0
+    assert store.upsert(signals(0)) == 1
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_storage import BACKENDS, SqliteBarStore, get_bar_store, read_bar_file
+
+
+def bars(days, seed):
+    close = 100 + np.random.default_rng(seed).normal(0, 1, days).cumsum()
+    index = pd.DatetimeIndex(pd.bdate_range('2024-01-01', periods=days), name='Datetime')
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close, 'Volume': 1e6}, index=index)
+
+
+def test_iter_bars_chunks_large_symbol_lists(tmp_path, monkeypatch):
+    store = SqliteBarStore(str(tmp_path))
+    symbols = [f"S{number:04d}" for number in range(250)]
+    store.write_many((symbol, bars(3, number)) for number, symbol in enumerate(symbols))
+    monkeypatch.setattr(SqliteBarStore, 'max_query_symbols', 100)
+
+    read = list(store.iter_bars(symbols=list(reversed(symbols)) + ['MISSING']))
+    assert [symbol for symbol, _ in read] == symbols
+    pd.testing.assert_frame_equal(read[7][1], bars(3, 7), check_freq=False, check_like=True, check_index_type=False)
+
+
+def test_exists_reads_stored_symbols_once(tmp_path, monkeypatch):
+    store = SqliteBarStore(str(tmp_path))
+    store.write('AAA', bars(3, 0))
+    queries = []
+    connect = store._connect
+    monkeypatch.setattr(store, '_connect', lambda: queries.append(1) or connect())
+
+    assert [store.exists(symbol) for symbol in ('AAA', 'BBB', 'AAA')] == [True, False, True]
+    store.write('BBB', bars(3, 1))
+    store.delete('AAA')
+    assert (store.exists('AAA'), store.exists('BBB')) == (False, True)
+    assert len(queries) == 3  # One read of the stored symbols, one write, one delete
+
+
+@pytest.mark.parametrize('backend', ['csv', 'sqlite'])
+def test_append_adds_only_new_rows(tmp_path, backend):
+    store = get_bar_store(str(tmp_path), backend)
+    series = bars(10, 0)
+    store.write('SYM', series.iloc[:8])
+    written = store.bytes_written
+    store.append('SYM', series.iloc[8:])
+
+    pd.testing.assert_frame_equal(store.read('SYM'), series, check_index_type=False, check_freq=False)
+    assert store.bytes_written - written < written / 2
+
+
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+def test_round_trip(tmp_path, backend):
+    if backend in ('parquet', 'feather'):
+        pytest.importorskip('pyarrow')
+    store = get_bar_store(str(tmp_path), backend)
+    daily = bars(30, 0)
+    intraday = bars(30, 1).set_axis(pd.DatetimeIndex(
+        pd.date_range('2024-01-02 14:30', periods=30, freq='h'), name='Datetime'))  # Naive UTC, as stored
+    store.write_many([('DAY', daily), ('HOUR', intraday)])
+
+    assert store.symbols() == ['DAY', 'HOUR'] and store.exists('DAY')
+    for symbol, series in (('DAY', daily), ('HOUR', intraday)):
+        pd.testing.assert_frame_equal(store.read(symbol), series, check_freq=False, check_index_type=False)
+    window = dict(store.iter_bars(start='2024-01-10', end='2024-01-19'))
+    pd.testing.assert_frame_equal(window['DAY'], daily.loc['2024-01-10':'2024-01-19'], check_freq=False,
+                                  check_index_type=False)
+    assert 'HOUR' not in window
+    tail = dict(store.iter_tail(bars=2, since='2024-02-08'))  # The last two bars and two before
+    pd.testing.assert_frame_equal(tail['DAY'], daily.iloc[-4:], check_freq=False, check_index_type=False)
+
+    store.delete('HOUR')
+    assert store.symbols() == ['DAY']
+
+
+@pytest.mark.parametrize('timestamps, expected', [
+    (['2024-01-02 09:30:00-05:00', '2024-01-02 10:30:00-05:00'], ['2024-01-02 14:30', '2024-01-02 15:30']),
+    (['2024-01-02', '2024-01-03'], ['2024-01-02', '2024-01-03']),
+])
+def test_legacy_yfinance_csv_is_parsed(tmp_path, timestamps, expected):
+    file_path = tmp_path / 'AAPL.csv'
+    file_path.write_text(
+        "Price,Close,High,Low,Open,Volume\n"
+        "Ticker,AAPL,AAPL,AAPL,AAPL,AAPL\n"
+        f"{'Datetime' if ':' in timestamps[0] else 'Date'},,,,,\n"
+        f"{timestamps[0]},185.5,186.0,185.0,185.2,1000\n"
+        f"{timestamps[1]},186.0,186.5,185.4,185.5,2000\n"
+    )
+    data = read_bar_file(str(file_path))
+
+    assert list(data.index) == [pd.Timestamp(stamp) for stamp in expected]  # Naive UTC
+    assert data.index.name == 'Datetime' and (data.dtypes == 'float64').all()
+    assert data['Close'].tolist() == [185.5, 186.0] and data['Volume'].tolist() == [1000, 2000]
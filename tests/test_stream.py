@@ -0,0 +1,59 @@
+import time
+import random
+
+import pytest
+
+from stock_stream import StreamExecutor
+
+
+def test_results_keep_the_source_order():
+    def double(item):
+        time.sleep(random.random() / 1000)  # Workers finish out of order
+        return item * 2
+
+    def check(item):
+        if item == 14:
+            raise ValueError('bad item')
+        return None if item % 5 == 0 else item
+
+    executor = StreamExecutor([('double', double, 4), ('check', check, 3)], queue_size=4)
+    results = list(executor.run(range(200)))
+
+    assert results == [item * 2 for item in range(200) if item * 2 % 5 and item != 7]
+    source, doubled, checked = executor.stats
+    assert (source.items, doubled.items, checked.items, checked.errors) == (200, 200, 199, 1)
+
+
+def test_source_error_reaches_the_consumer_after_earlier_items():
+    def source():
+        yield from range(10)
+        raise ConnectionError('feed lost')
+
+    executor = StreamExecutor([('identity', lambda item: item, 2)], queue_size=2)
+    results = []
+    with pytest.raises(ConnectionError, match='feed lost'):
+        for item in executor.run(source()):
+            results.append(item)
+    assert results == list(range(10))
+
+
+def test_waiting_results_keep_memory_bounded():
+    produced = []
+
+    def source():
+        for item in range(100):
+            produced.append(item)
+            yield item
+
+    def stage(item):
+        if item % 10 == 0:
+            time.sleep(0.02)  # A slow item: later ones complete ahead of it and wait
+        return item
+
+    executor = StreamExecutor([('stage', stage, 4)], queue_size=3)
+    for item in executor.run(source()):
+        assert len(produced) - item - 1 <= 3 * 2  # In flight: at most the capacity of the two queues
+
+    stream = executor.run(source())
+    assert next(stream) == 0
+    stream.close()  # The consumer stops early: every thread exits